@@ -2,13 +2,13 @@ from dotenv import load_dotenv
 from llama_index.llms.openai import OpenAI
 from llama_index.core.agent.workflow import FunctionAgent, ReActAgent
 from llama_index.core.workflow import Context
-from llama_index.core.agent.workflow import AgentStream, ToolCallResult
+from llama_index.core.agent.workflow import AgentInput, AgentStream, ToolCallResult
 from llama_index.core.tools.types import ToolOutput
 from functions import (
     search_perplexity,
     fft,
-    file_meta_data,
     save_agent_output,
+    agent_output_path,
     stereo_fft,
     analyze_image,
     zero_crossing_rate,
@@ -16,13 +16,23 @@ from functions import (
     envelope_decay,
     spectral_flatness,
     fractal_dimension,
-    shannon_entropy
+    shannon_entropy,
+    analyze_features,
+    spectral_peaks
 )
+from tool_cache import tool_cache_info
+from async_tools import analysis_tool, async_tool, file_meta_data_async
+from encoding import CHARS_PER_TOKEN
+from plan import analysis_plan
+from preanalysis import PRE_ANALYSIS, pre_analysis
 from tracing import setup_tracing
-from prompts import system_prompt
+from prompts import system_prompt, function_system_prompt
 import os
+import json
+import time
 import logging
 import asyncio
+import openai
 from llama_index.core import PromptTemplate
 from rich.console import Console
 from rich.panel import Panel
@@ -36,46 +46,89 @@ setup_tracing()
 # Configure logging
 logging.basicConfig(level=logging.WARNING)
 
-# Available tools
+# Available tools. They run as coroutines (ffmpeg/ffprobe as asyncio subprocesses, the
+# analysis in a thread pool), so concurrent agents in one event loop never block each
+# other; deterministic analysis tools are memoized per file and arguments and their
+# results are encoded compactly within a token budget
 tools = [
-    search_perplexity,
-    fft,
-    file_meta_data,
-    save_agent_output,
-    stereo_fft,
-    analyze_image,
-    zero_crossing_rate,
-    autocorrelation,
-    envelope_decay,
-    spectral_flatness,
-    fractal_dimension,
-    shannon_entropy
+    async_tool(search_perplexity),
+    analysis_tool(fft),
+    file_meta_data_async,
+    async_tool(save_agent_output),
+    analysis_tool(stereo_fft),
+    async_tool(analyze_image),
+    analysis_tool(zero_crossing_rate),
+    analysis_tool(autocorrelation),
+    analysis_tool(envelope_decay),
+    analysis_tool(spectral_flatness),
+    analysis_tool(fractal_dimension),
+    analysis_tool(shannon_entropy),
+    analysis_tool(analyze_features),
+    analysis_tool(spectral_peaks),
+    analysis_plan
 ]
 
-async def run_agent(query: str, console: Console = Console()):
+# "react" reasons one tool call per step; "function" uses native function calling, so
+# the model can request several tools per turn and they run concurrently
+AGENT_MODE = os.getenv("AGENT_MODE", "react")
+
+# Models for each mode (the function mode needs one that supports parallel tool calls)
+REACT_MODEL = os.getenv("REACT_MODEL", "o3-mini")
+FUNCTION_MODEL = os.getenv("FUNCTION_MODEL", "gpt-4o")
+
+async def pre_analysis_context(file_path: str) -> str:
+    """Run the deterministic pre-analysis sweep off the event loop and phrase it for the agent."""
+    sweep = await async_tool(pre_analysis)(file_path)
+    return f"""
+    A deterministic pre-analysis of {file_path} has already been run, covering the file metadata,
+    broad and full-band fft scans, the energy envelope, spectral peaks with harmonic series and
+    the feature summary. Do not repeat these scans; start by drilling down on what they show.
+
+{sweep}
+"""
+
+async def run_agent(query: str, console: Console = Console(), mode: str = AGENT_MODE, file_path: str = None,
+                    pre_analyze: bool = PRE_ANALYSIS):
     """Run the agent with the given query.
     
     Args:
         query (str): The query or instructions for the agent to process.
+        console (Console): Where agent thoughts and tool results are printed.
+        mode (str): "react" or "function" (parallel tool calls), see AGENT_MODE.
+        file_path (str): Audio file the query is about; its pre-analysis is added to the query.
+        pre_analyze (bool): Whether to run the pre-analysis sweep for file_path.
         
     Returns:
-        The result of the agent's execution.
+        dict: Run statistics: llm_turns, tool_calls and prompt_tokens (approximate
+        total prompt size over all LLM calls).
     """
     load_dotenv()
     openai_api_key = os.getenv("OPENAI_API_KEY")
 
-    llm = OpenAI(model="o3-mini", api_key=openai_api_key, temperature=1.2)
-    agent = ReActAgent(tools=tools, llm=llm)
-    agent.update_prompts({"react_header": PromptTemplate(system_prompt)})
+    if file_path and pre_analyze:
+        query += await pre_analysis_context(file_path)
+
+    if mode == "function":
+        llm = OpenAI(model=FUNCTION_MODEL, api_key=openai_api_key, temperature=1.2)
+        agent = FunctionAgent(tools=tools, llm=llm, system_prompt=function_system_prompt)
+    else:
+        llm = OpenAI(model=REACT_MODEL, api_key=openai_api_key, temperature=1.2)
+        agent = ReActAgent(tools=tools, llm=llm)
+        agent.update_prompts({"react_header": PromptTemplate(system_prompt)})
 
     ctx = Context(agent)
     handler = agent.run(query, ctx=ctx)
     
     # Buffer for accumulating agent stream text
     agent_buffer = ""
+    llm_turns = tool_calls = prompt_chars = 0
 
     async for ev in handler.stream_events():
-        if isinstance(ev, ToolCallResult):
+        if isinstance(ev, AgentInput):
+            llm_turns += 1
+            prompt_chars += sum(len(message.content or "") for message in ev.input)
+        elif isinstance(ev, ToolCallResult):
+            tool_calls += 1
             # If we have accumulated agent text, print it in its own panel first
             if agent_buffer:
                 console.print(Panel(
@@ -121,6 +174,14 @@ async def run_agent(query: str, console: Console = Console()):
 
     response = await handler
 
+    prompt_tokens = prompt_chars // CHARS_PER_TOKEN
+    console.print(f"[dim]{llm_turns} LLM round-trips, {tool_calls} tool calls, "
+                  f"~{prompt_tokens} prompt tokens[/dim]")
+    stats = tool_cache_info()
+    console.print(f"[dim]Tool cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+                  f"{stats['misses']} misses[/dim]")
+    return {"llm_turns": llm_turns, "tool_calls": tool_calls, "prompt_tokens": prompt_tokens}
+
 if __name__ == "__main__" and os.getenv("EVAL_MODE") != "1":
     query = """
     Now analyze: ./data/audio1.mp3
@@ -132,24 +193,135 @@ if __name__ == "__main__" and os.getenv("EVAL_MODE") != "1":
     Throughout your analysis, use insights from one tool to guide deeper investigation with others. Describe all spectral content and temporal structure you observe. Based on this evidence, determine the most likely sources of the signal. Stay curious and keep an open mind while exploring the data, continuously question yourself and use the tools however you see fit to uncover the most interesting aspects of the audio.
     End by calling save_agent_output with your result.
     """
-    asyncio.run(run_agent(query))
+    asyncio.run(run_agent(query, file_path="./data/audio1.mp3"))
+
+# Batch evaluation settings (override with EVAL_CONCURRENCY, EVAL_TIMEOUT_SEC and EVAL_RETRIES)
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))
+EVAL_TIMEOUT_SEC = float(os.getenv("EVAL_TIMEOUT_SEC", "900"))
+EVAL_RETRIES = int(os.getenv("EVAL_RETRIES", "2"))
+MANIFEST_PATH = os.path.join("outputs", "manifest.json")
+
+# LLM errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+def output_mtime(audio_file):
+    """Modification time of the saved prediction for a file, or None if there is none."""
+    out_path = agent_output_path(audio_file)
+    return os.path.getmtime(out_path) if os.path.exists(out_path) else None
+
+def is_up_to_date(audio_file):
+    """Check whether the saved prediction for a file exists and is newer than the file."""
+    saved = output_mtime(audio_file)
+    return saved is not None and saved > os.path.getmtime(audio_file)
+
+async def run_file(audio_file, semaphore, timeout=EVAL_TIMEOUT_SEC, retries=EVAL_RETRIES):
+    """Run the agent on one file, retrying transient LLM errors with exponential backoff.
+
+    Args:
+        audio_file (str): Path to the audio file.
+        semaphore (asyncio.Semaphore): Limits how many files are analyzed at once.
+        timeout (float): Seconds allowed per attempt.
+        retries (int): Extra attempts after a transient LLM error.
+
+    Returns:
+        dict: Manifest entry with status, attempts, elapsed seconds, any error and, when
+        the run finished, its statistics from run_agent.
+    """
+    query = f"""
+    You are an audio evaluation assistant.
+
+    Analyze the file: {audio_file}
+
+    Do not write out agent thoughts or tool results in the console. Only return the final result. 
+
+    Call save_agent_output() once with your result at the end.
+    """
+    async with semaphore:
+        start = time.monotonic()
+        # A prediction saved by an earlier run (kept when re-running with force) does not count
+        previous_output = output_mtime(audio_file)
+        run_stats = {}
+        for attempt in range(1, retries + 2):
+            print(f"=== Analyzing {audio_file} (attempt {attempt}) ===")
+            try:
+                # Parallel runs would interleave their panels, so keep the console quiet
+                run_stats = await asyncio.wait_for(
+                    run_agent(query, console=Console(quiet=True), file_path=audio_file), timeout)
+                status, error = "done", None
+                break
+            except asyncio.TimeoutError:
+                status, error = "timeout", f"exceeded {timeout:.0f}s"
+                break
+            except TRANSIENT_ERRORS as e:
+                status, error = "failed", str(e)
+                if attempt <= retries:
+                    await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                status, error = "failed", str(e)
+                break
+
+        if status == "done" and (not is_up_to_date(audio_file) or output_mtime(audio_file) == previous_output):
+            status, error = "failed", "agent did not call save_agent_output"
+
+        elapsed = time.monotonic() - start
+        print(f"=== {audio_file}: {status} in {elapsed:.1f}s{f' ({error})' if error else ''} ===")
+        return {"status": status, "attempts": attempt, "elapsed_sec": round(elapsed, 1), "error": error,
+                "pre_analysis": PRE_ANALYSIS, "mode": AGENT_MODE, **run_stats}
 
 # Batch evaluation mode for scoring multiple audio files
-async def run_all_files():
+async def run_all_files(concurrency=EVAL_CONCURRENCY, timeout=EVAL_TIMEOUT_SEC, retries=EVAL_RETRIES, force=False):
+    """Analyze every clip in data/ concurrently, skipping clips whose prediction is up to date.
+
+    Progress is written to outputs/manifest.json after each file, so an interrupted
+    batch can be re-run and only the remaining files are analyzed.
+
+    Args:
+        concurrency (int): Maximum number of files analyzed at once.
+        timeout (float): Seconds allowed per attempt on one file.
+        retries (int): Extra attempts after a transient LLM error.
+        force (bool): Re-analyze files even if their prediction is up to date.
+
+    Returns:
+        dict: The manifest, keyed by audio file.
+    """
     audio_files = sorted(glob.glob("./data/*.mp3") + glob.glob("./data/*.m4a"))
 
+    manifest = {}
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, "r") as f:
+            manifest = json.load(f)
+
+    pending = [f for f in audio_files if force or not is_up_to_date(f)]
     for audio_file in audio_files:
-        query = f"""
-        You are an audio evaluation assistant.
+        if audio_file not in pending:
+            print(f"Skipping {audio_file}: prediction is up to date")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.monotonic()
 
-        Analyze the file: {audio_file}
+    async def run_and_record(audio_file):
+        manifest[audio_file] = await run_file(audio_file, semaphore, timeout=timeout, retries=retries)
+        os.makedirs("outputs", exist_ok=True)
+        with open(MANIFEST_PATH, "w") as f:
+            json.dump(manifest, f, indent=2)
 
-        Do not write out agent thoughts or tool results in the console. Only return the final result. 
+    await asyncio.gather(*(run_and_record(f) for f in pending))
 
-        Call save_agent_output() once with your result at the end.
-        """
-        print(f"\n=== Analyzing {audio_file} ===")
-        await run_agent(query)
+    done = [manifest[f] for f in pending if manifest[f]["status"] == "done"]
+    print(f"\nBatch finished: {len(done)}/{len(pending)} analyzed, {len(audio_files) - len(pending)} skipped, "
+          f"{time.monotonic() - start:.1f}s wall clock")
+    if done:
+        # Per-clip averages, to compare settings such as PRE_ANALYSIS=0/1 or AGENT_MODE across batches
+        averages = {key: sum(entry.get(key, 0) for entry in done) / len(done)
+                    for key in ("llm_turns", "tool_calls", "prompt_tokens", "elapsed_sec")}
+        print(f"Per clip: {averages['llm_turns']:.1f} LLM round-trips, {averages['tool_calls']:.1f} tool calls, "
+              f"~{averages['prompt_tokens']:.0f} prompt tokens, {averages['elapsed_sec']:.1f}s")
+    return manifest
 
 if __name__ == "__main__" and os.getenv("EVAL_MODE") == "1":
     asyncio.run(run_all_files())
@@ -1,35 +1,15 @@
-import numpy as np
-import time
-from functions import record_audio, fft
+from functions import fft
+from monitor import MONITOR_PREROLL_SEC, SpectralMonitor, open_input_stream, save_wav
+from triage import triage, triage_info
 from agent import run_agent
 from openai import OpenAI
 from rich.console import Console
-import io
-import csv
+import json
 import os
 import asyncio
 
 console = Console()
 
-# Check to see if audio is interesting
-def compute_avg_energy(fft_csv):
-    reader = csv.reader(io.StringIO(fft_csv))
-    header = next(reader)
-    rows = list(reader)
-
-    if not rows:
-        return 0
-
-    energy_vals = []
-    for row in rows:
-        try:
-            values = [float(x) for x in row[1:]]
-            energy_vals.append(sum(values))
-        except:
-            pass
-
-    return np.mean(energy_vals)
-
 # First pass using GPT-4o to check if the audio is interesting
 def prelim_gpt4o(clip_path, summary_text):
     openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -47,69 +27,106 @@ def prelim_gpt4o(clip_path, summary_text):
     return "yes" in response.choices[0].message.content.lower()
 
 async def ambient_loop(
-    threshold=1.2, # % of baseline to trigger event
-    monitor_duration=10, # short clip to determine if interesting (sec)
+    threshold=3.0, # ratio of block energy to the noise floor that triggers an event
+    release=1.5, # ratio below which the event is over
     analysis_duration=300, # if interesting, long clip to analyze (sec)
     freq_range=(0, 2000), # frequency range for analysis
-    check_interval=10, # seconds between checks
+    floor_sec=10, # time constant of the noise-floor estimate (sec)
+    preroll_sec=MONITOR_PREROLL_SEC, # audio kept from before the spike (sec)
+    source=None, # optional WAV file to monitor instead of the microphone
 ):
     console.print("[bold blue] Entering Ambient Monitoring Mode... (Escape using Ctrl+C)[/bold blue]")
-    history = []
-
-    while True:
-        # Step 1: Short recording
-        clip_path = record_audio(duration=monitor_duration)
-        fft_csv = fft(
-            file_path=clip_path,
-            cutoff_lo=freq_range[0],
-            cutoff_hi=freq_range[1],
-            time_bins=4,
-            freq_bins=1
-        )
-
-        # Step 2: Rolling average change detection
-        energy = compute_avg_energy(fft_csv)
-        history.append(energy)
-        if len(history) > 5:
-            history.pop(0)
-
-        avg_prev = np.mean(history[:-1]) if len(history) > 1 else 0
-        ratio = energy / avg_prev if avg_prev else 1
-
-        console.print(f"[dim]Rolling energy ratio: {ratio:.2f}[/dim]")
-
-        if ratio > threshold:
-            console.print("[bold yellow] Intensity spike detected. Recording longer clip...")
-            # Step 3: Longer clip
-            clip_path = record_audio(duration=analysis_duration)
-
-            # Step 4: Quick summary check (bypass full agent)
-            summary_csv = fft(
-                file_path=clip_path,
-                cutoff_lo=freq_range[0],
-                cutoff_hi=freq_range[1],
-                time_bins=6,
-                freq_bins=20
-            )
-
-            # Wrap for GPT-4o analysis
-            short_summary = f"The signal summary from this 5-min segment: \n{summary_csv[:300]}..."
-            interesting = prelim_gpt4o(clip_path, short_summary)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    # Step 1: Continuous monitoring; every block is checked as it arrives from the stream
+    stream = open_input_stream(lambda data: feed(data), source=source)
+    monitor = SpectralMonitor(
+        sample_rate=stream.sample_rate,
+        freq_range=freq_range,
+        threshold=threshold,
+        release=release,
+        floor_sec=floor_sec,
+        buffer_sec=preroll_sec + analysis_duration + 60
+    )
+    feed = monitor.callback(lambda event: loop.call_soon_threadsafe(events.put_nowait, event),
+                            channels=stream.channels)
+    stream.start_stream()
+    analyzed_until = 0
+
+    try:
+        while stream.is_active() or not events.empty():
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if event["position"] < analyzed_until:
+                continue  # Part of a clip that was already analyzed
+
+            console.print(f"[bold yellow] Intensity spike detected at {event['time_sec']:.1f}s "
+                          f"(energy ratio {event['ratio']:.2f}). Recording longer clip...")
+
+            # Step 2: Longer clip from the monitored stream: pre-roll plus the audio after the onset
+            end = event["position"] + int(analysis_duration * monitor.sample_rate)
+            while monitor.buffer.written < end and stream.is_active():
+                await asyncio.sleep(0.1)
+            try:
+                clip, trigger_offset = monitor.capture(event, analysis_duration, preroll_sec)
+            except ValueError:
+                console.print("[bold dim]Spike is no longer buffered. Returning to monitoring...")
+                continue
+            clip_path = save_wav(clip, monitor.sample_rate)
+            analyzed_until = end
+
+            # Keep the trigger position next to the clip for targeted analysis
+            trigger_sec = trigger_offset / monitor.sample_rate
+            with open(os.path.splitext(clip_path)[0] + ".json", "w") as f:
+                json.dump({
+                    "trigger_offset_samples": int(trigger_offset),
+                    "trigger_offset_sec": trigger_sec,
+                    "stream_time_sec": event["time_sec"],
+                    "energy_ratio": event["ratio"],
+                    "sample_rate": monitor.sample_rate
+                }, f, indent=2)
+
+            # Step 3: Local triage; only uncertain clips get the LLM check. Without a trained
+            # model (python src/triage.py) every clip is uncertain and goes to the LLM check
+            interesting = triage(clip, monitor.sample_rate)
+            if interesting is None:
+                # Quick summary check (bypass full agent)
+                summary_csv = fft(
+                    file_path=clip_path,
+                    cutoff_lo=freq_range[0],
+                    cutoff_hi=freq_range[1],
+                    time_bins=6,
+                    freq_bins=20
+                )
+
+                # Wrap for GPT-4o analysis
+                short_summary = (f"The signal summary from this segment (a loudness spike starts at {trigger_sec:.2f}s): "
+                                 f"\n{summary_csv[:300]}...")
+                interesting = prelim_gpt4o(clip_path, short_summary)
+            stats = triage_info()
+            console.print(f"[dim]Triage: {stats['llm_calls_avoided']} LLM checks avoided, "
+                          f"{stats['escalated']} escalated[/dim]")
 
             if interesting:
                 console.print("[bold green] Triggering full spectral analysis...")
                 try:
                     await run_agent(
-                        query=f"Analyze the audio file at {clip_path} and identify key spectral features. Use FFT and Perplexity.",
-                        console=console
+                        query=f"Analyze the audio file at {clip_path} and identify key spectral features. Use FFT and Perplexity. "
+                              f"The event that triggered this recording starts at {trigger_sec:.2f}s into the clip.",
+                        console=console,
+                        file_path=clip_path
                     )
                 except asyncio.CancelledError:
                     console.print("\n[!] Agent analysis cancelled by user.", style="bold red")
                     return
             else:
                 console.print("[bold dim]No significant patterns. Returning to monitoring...")
-
-        time.sleep(check_interval)  # wait before next round
+    finally:
+        stream.stop_stream()
+        stream.close()
 
 if __name__ == "__main__":
         try:
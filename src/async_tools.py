@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import inspect
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from audio_io import to_wav_async
+from encoding import compact_tool
+from functions import file_meta_data, meta_data_command, meta_data_csv
+from tool_cache import cached_tool
+
+# Threads running tool computations off the event loop (override with TOOL_EXECUTOR_WORKERS)
+TOOL_EXECUTOR_WORKERS = int(os.getenv("TOOL_EXECUTOR_WORKERS", "4"))
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="tool")
+    return _executor
+
+
+async def run_subprocess(command):
+    """
+    Runs a command without blocking the event loop.
+
+    Args:
+        command: Argument list, e.g. an ffprobe invocation.
+
+    Returns:
+        The command's standard output as text.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with a non-zero status; its
+            stderr is attached.
+    """
+    process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout.decode(), stderr.decode())
+    return stdout.decode()
+
+
+def async_tool(fn):
+    """
+    Wraps a synchronous tool as a coroutine so agents sharing one event loop do not
+    block each other. A `file_path` argument is first decoded with to_wav_async (ffmpeg
+    as an asyncio subprocess), then the tool itself runs in a shared thread pool,
+    where it finds the decoded WAV in the cache. The wrapper keeps the tool's name,
+    signature and docstring, and can wrap a cached_tool.
+
+    Args:
+        fn: Tool function.
+
+    Returns:
+        The async wrapper.
+    """
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        file_path = signature.bind_partial(*args, **kwargs).arguments.get("file_path")
+        if isinstance(file_path, str) and os.path.isfile(file_path):
+            await to_wav_async(file_path)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+
+def analysis_tool(fn):
+    """
+    Prepares a deterministic analysis tool for the agent: memoized with cached_tool,
+    its result encoded within a token budget by compact_tool, and run as a coroutine
+    by async_tool.
+    """
+    return async_tool(compact_tool(cached_tool(fn)))
+
+
+@functools.wraps(file_meta_data)
+async def file_meta_data_async(file_path: str) -> str:
+    return meta_data_csv(await run_subprocess(meta_data_command(file_path)))
@@ -0,0 +1,517 @@
+import asyncio
+import functools
+import hashlib
+import os
+import struct
+import subprocess
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from audio2numpy import open_audio
+import numpy as np
+
+# Memory budget for decoded signals kept in-process (override with SIGNAL_CACHE_MAX_MB)
+CACHE_MAX_BYTES = int(float(os.getenv("SIGNAL_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+# Directory holding decoded copies of non-WAV inputs (and data derived from them),
+# shared across runs and processes
+DECODE_CACHE_DIR = os.getenv("SIGNAL_DECODE_CACHE_DIR", os.path.join("tmp", "decoded"))
+
+# Disk budget for DECODE_CACHE_DIR; least recently used files are deleted beyond it
+DECODE_CACHE_MAX_BYTES = int(float(os.getenv("SIGNAL_DECODE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_hits = 0
+_cache_misses = 0
+_hashes = {}
+_durations = {}
+_lock = threading.Lock()
+
+
+def file_fingerprint(file_path):
+    """
+    Identifies a file by its resolved path, modification time and size, so that
+    edits to the file invalidate anything cached for it.
+
+    Args:
+        file_path: Path to the audio file.
+
+    Returns:
+        Tuple of (path, mtime_ns, size).
+    """
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def content_hash(file_path):
+    """
+    Hashes the bytes of a file, memoized per (path, mtime, size) so each version of
+    a file is only read once per process.
+
+    Args:
+        file_path: Path to the file.
+
+    Returns:
+        Hex SHA-256 digest of the file contents.
+    """
+    fingerprint = file_fingerprint(file_path)
+    with _lock:
+        if fingerprint in _hashes:
+            return _hashes[fingerprint]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    with _lock:
+        _hashes[fingerprint] = digest.hexdigest()
+    return _hashes[fingerprint]
+
+
+def evict_decoded(keep=None):
+    """
+    Deletes the least recently used files in DECODE_CACHE_DIR (decoded WAVs and
+    anything derived from them) until it fits DECODE_CACHE_MAX_BYTES.
+
+    Args:
+        keep: Path that must not be deleted, e.g. the file just written.
+    """
+    entries = []
+    for path in Path(DECODE_CACHE_DIR).glob("[!.]*"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # Removed by another process
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= DECODE_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _decoded_path(file_path):
+    """
+    Returns where the WAV conversion of a file is cached, or None if it is already WAV.
+    """
+    input_file_path = Path(file_path)
+    if input_file_path.suffix.lower() == ".wav":
+        return None
+    return Path(DECODE_CACHE_DIR) / f"{content_hash(input_file_path)[:32]}.wav"
+
+
+def _reuse_decoded(wav_path):
+    """
+    True if a cached conversion exists; its modification time is bumped so eviction
+    treats it as recently used.
+    """
+    try:
+        os.utime(wav_path)
+        return True
+    except FileNotFoundError:
+        return False  # Not decoded yet, or evicted by another process in the meantime
+
+
+def _decode_tmp_path(wav_path):
+    # Decode to a private temporary file and rename it into place, so concurrent
+    # workers never see a partially written WAV
+    wav_path.parent.mkdir(parents=True, exist_ok=True)
+    return wav_path.parent / f".{wav_path.stem}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+def _ffmpeg_command(file_path, tmp_path):
+    return ['ffmpeg', '-y', '-i', str(file_path), '-acodec', 'pcm_s16le', '-f', 'wav', str(tmp_path)]
+
+
+def to_wav(file_path, verbose=False):
+    """
+    Converts an audio file to 16-bit PCM WAV with ffmpeg, skipping conversion if it is
+    already WAV. Conversions are stored once in DECODE_CACHE_DIR under the hash of the
+    source contents and reused across runs and processes; the source directory is
+    never written to.
+
+    Args:
+        file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        verbose: Show ffmpeg output.
+
+    Returns:
+        Path to the WAV file.
+    """
+    wav_path = _decoded_path(file_path)
+    if wav_path is None:
+        return Path(file_path)
+    if _reuse_decoded(wav_path):
+        return wav_path
+
+    tmp_path = _decode_tmp_path(wav_path)
+    stdout = None if verbose else subprocess.DEVNULL
+    stderr = None if verbose else subprocess.DEVNULL
+    try:
+        subprocess.run(_ffmpeg_command(file_path, tmp_path), stdout=stdout, stderr=stderr, check=True)
+        os.replace(tmp_path, wav_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    evict_decoded(keep=wav_path)
+    return wav_path
+
+
+async def to_wav_async(file_path, verbose=False):
+    """
+    Awaitable to_wav: ffmpeg runs through asyncio.create_subprocess_exec and hashing
+    the source happens in the default executor, so the event loop is never blocked.
+    Shares the decode cache with to_wav.
+
+    Args:
+        file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        verbose: Show ffmpeg output.
+
+    Returns:
+        Path to the WAV file.
+    """
+    loop = asyncio.get_running_loop()
+    wav_path = await loop.run_in_executor(None, _decoded_path, file_path)
+    if wav_path is None:
+        return Path(file_path)
+    if _reuse_decoded(wav_path):
+        return wav_path
+
+    tmp_path = _decode_tmp_path(wav_path)
+    stdout = None if verbose else asyncio.subprocess.DEVNULL
+    stderr = None if verbose else asyncio.subprocess.DEVNULL
+    command = _ffmpeg_command(file_path, tmp_path)
+    try:
+        process = await asyncio.create_subprocess_exec(*command, stdout=stdout, stderr=stderr)
+        if await process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+        os.replace(tmp_path, wav_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    await loop.run_in_executor(None, functools.partial(evict_decoded, keep=wav_path))
+    return wav_path
+
+
+def _parse_wav_header(wav_path):
+    """
+    Walks the RIFF chunks of a WAV file to find its format and the byte range of its samples.
+
+    Returns:
+        Tuple of (format_tag, channels, sample_rate, bits_per_sample, data_offset, data_size).
+    """
+    with open(wav_path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{wav_path} is not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{wav_path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+            if chunk_id == b'fmt ':
+                body = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                # WAVE_FORMAT_EXTENSIBLE stores the real format in the sub-format GUID
+                if format_tag == 0xFFFE and len(body) >= 26:
+                    format_tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{wav_path} has data before its fmt chunk")
+                data_offset = f.tell()
+                # Streamed WAVs (e.g. ffmpeg to a pipe) may leave the size unset
+                file_size = os.fstat(f.fileno()).st_size
+                if chunk_size in (0, 0xFFFFFFFF) or data_offset + chunk_size > file_size:
+                    chunk_size = file_size - data_offset
+                return fmt + (data_offset, chunk_size)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+@lru_cache(maxsize=32)
+def _map_wav(fingerprint):
+    path = fingerprint[0]
+    format_tag, channels, sample_rate, bits, data_offset, data_size = _parse_wav_header(path)
+
+    if format_tag == 1 and bits in (8, 16, 32):
+        dtype = {8: np.uint8, 16: np.dtype('<i2'), 32: np.dtype('<i4')}[bits]
+    elif format_tag == 1 and bits == 24:
+        dtype = np.dtype((np.void, 3))
+    elif format_tag == 3 and bits in (32, 64):
+        dtype = np.dtype('<f4') if bits == 32 else np.dtype('<f8')
+    else:
+        raise ValueError(f"Unsupported WAV encoding in {path}: format {format_tag}, {bits} bits")
+
+    n_frames = data_size // (channels * (bits // 8))
+    frames = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(n_frames, channels))
+    return frames, sample_rate
+
+
+def map_wav(wav_path):
+    """
+    Memory-maps the samples of a PCM or float WAV file without reading or converting them.
+
+    Args:
+        wav_path: Path to the WAV file.
+
+    Returns:
+        Tuple of (frames, sample_rate), where frames is a read-only (n_frames, channels)
+        np.memmap in the file's stored sample type (e.g. int16). Slicing it only touches
+        the pages that are read.
+    """
+    return _map_wav(file_fingerprint(wav_path))
+
+
+def pcm_to_float(frames):
+    """
+    Converts stored WAV samples to float32 in [-1, 1), scaling integers the same way
+    audio2numpy does. float32 input is returned as-is, without a copy.
+
+    Args:
+        frames: Array of samples as returned by slicing map_wav().
+
+    Returns:
+        float32 array of the same shape.
+    """
+    if frames.dtype == np.float32:
+        return frames
+    if frames.dtype.kind == 'f':
+        return frames.astype(np.float32)
+    if frames.dtype == np.uint8:
+        return (frames.astype(np.float32) - 128) / 128
+    if frames.dtype.kind == 'V':
+        # 24-bit samples: place the three bytes in the top of an int32
+        raw = np.frombuffer(np.ascontiguousarray(frames).tobytes(), dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(raw), 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        return (padded.view('<i4').reshape(frames.shape).astype(np.float32) / 2 ** 31)
+    return frames.astype(np.float32) / 2 ** (8 * frames.dtype.itemsize - 1)
+
+
+def read_wav(wav_path, start_sec=0, end_sec=None, mono=False):
+    """
+    Reads a time range of a WAV file through its memory map, converting only that
+    range to float.
+
+    Args:
+        wav_path: Path to the WAV file.
+        start_sec: Start time in seconds.
+        end_sec: End time in seconds (None = end of file).
+        mono: Downmix to mono.
+
+    Returns:
+        Tuple of (signal, sample_rate). Like audio2numpy, single-channel audio is 1-D
+        and multichannel audio is (n_samples, channels) unless mono is set.
+    """
+    frames, sample_rate = map_wav(wav_path)
+    start = int(start_sec * sample_rate)
+    end = len(frames) if end_sec is None else int(end_sec * sample_rate)
+    signal = pcm_to_float(frames[start:end])
+
+    if signal.shape[1] == 1:
+        return signal[:, 0], sample_rate
+    if mono:
+        return signal.mean(axis=1), sample_rate
+    return signal, sample_rate
+
+
+def probe_duration(file_path):
+    """
+    Reads the duration of an audio file without decoding it: from the WAV header of
+    the file or of its cached conversion, or else with ffprobe. Results are memoized
+    per file version, so repeated calls do not start a subprocess.
+
+    Args:
+        file_path: Path to the audio file.
+
+    Returns:
+        Duration in seconds.
+    """
+    wav_path = _decoded_path(file_path)
+    if wav_path is None:
+        frames, sample_rate = map_wav(file_path)
+        return len(frames) / sample_rate
+
+    fingerprint = file_fingerprint(file_path)
+    with _lock:
+        if fingerprint in _durations:
+            return _durations[fingerprint]
+
+    if _reuse_decoded(wav_path):
+        frames, sample_rate = map_wav(wav_path)
+        duration = len(frames) / sample_rate
+    else:
+        result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                                 '-of', 'default=noprint_wrappers=1:nokey=1', str(file_path)],
+                                capture_output=True, text=True, check=True)
+        duration = float(result.stdout.strip())
+
+    with _lock:
+        _durations[fingerprint] = duration
+    return duration
+
+
+def is_cached(file_path):
+    """
+    Checks whether a decoded signal for the file is already held in memory.
+    """
+    key = file_fingerprint(file_path)
+    with _lock:
+        return key in _cache
+
+
+def _downmix(signal):
+    # Mono view of a cached signal; derived on each call instead of caching a second copy
+    if signal.ndim == 1:
+        return signal
+    mono = signal.mean(axis=1)
+    mono.setflags(write=False)
+    return mono
+
+
+def _evict(budget):
+    global _cache_bytes
+    while _cache and _cache_bytes > budget:
+        _, (signal, _) = _cache.popitem(last=False)
+        _cache_bytes -= signal.nbytes
+
+
+def load_audio(file_path, mono=False, verbose=False):
+    """
+    Decodes an audio file into a float array, reusing a process-wide LRU cache so
+    repeated tool calls on the same clip do not re-run ffmpeg or re-decode it. Only
+    the decoded channels are cached; mono is derived from them.
+
+    Args:
+        file_path: Path to the input audio file (e.g., .m4a, .mp3 or .wav).
+        mono: Downmix stereo to mono before returning.
+        verbose: Show ffmpeg output when a conversion is needed.
+
+    Returns:
+        Tuple of (signal, sample_rate). The signal is read-only and shared between
+        callers, so copy it before modifying in place.
+    """
+    global _cache_bytes, _cache_hits, _cache_misses
+    key = file_fingerprint(file_path)
+
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _cache_hits += 1
+            signal, sample_rate = _cache[key]
+            return (_downmix(signal) if mono else signal), sample_rate
+
+    wav_path = to_wav(file_path, verbose=verbose)
+    try:
+        signal, sample_rate = read_wav(wav_path)
+        # Hold a private float copy so the cache does not pin the file mapping
+        signal = np.array(signal, dtype=np.float32)
+    except ValueError:
+        signal, sample_rate = open_audio(str(wav_path))
+    signal.setflags(write=False)
+
+    with _lock:
+        _cache_misses += 1
+        if key not in _cache and signal.nbytes <= CACHE_MAX_BYTES:
+            _cache[key] = (signal, sample_rate)
+            _cache_bytes += signal.nbytes
+            _evict(CACHE_MAX_BYTES)
+
+    return (_downmix(signal) if mono else signal), sample_rate
+
+
+def load_window(file_path, start_sec=0, end_sec=None, mono=False, verbose=False):
+    """
+    Loads only the samples between start_sec and end_sec. An already decoded signal is
+    sliced from the cache; otherwise the WAV (or its decoded copy from to_wav) is
+    sliced from its memory map, so zoomed-in calls on long recordings never read or
+    convert the rest of the file.
+
+    Args:
+        file_path: Path to the input audio file.
+        start_sec: Start time in seconds.
+        end_sec: End time in seconds (None or 0 = end of file).
+        mono: Downmix to mono.
+        verbose: Show ffmpeg output when a conversion is needed.
+
+    Returns:
+        Tuple of (signal, sample_rate, end_sec) with end_sec resolved to the file
+        duration when it was not given.
+    """
+    if not is_cached(file_path):
+        wav_path = to_wav(file_path, verbose=verbose)
+        try:
+            frames, sample_rate = map_wav(wav_path)
+            if not end_sec:
+                end_sec = len(frames) / sample_rate
+            signal, sample_rate = read_wav(wav_path, start_sec, end_sec, mono=mono)
+            return signal, sample_rate, end_sec
+        except ValueError:
+            pass
+
+    signal, sample_rate = load_audio(file_path, verbose=verbose)
+    if not end_sec:
+        end_sec = len(signal) / sample_rate
+    window = signal[int(start_sec * sample_rate):int(end_sec * sample_rate)]
+    return (_downmix(window) if mono else window), sample_rate, end_sec
+
+
+def set_cache_limit(max_bytes):
+    """
+    Changes the memory budget of the decoded-signal cache, evicting least recently
+    used entries if the cache is now over budget.
+
+    Args:
+        max_bytes: New budget in bytes (0 disables caching).
+    """
+    global CACHE_MAX_BYTES
+    with _lock:
+        CACHE_MAX_BYTES = int(max_bytes)
+        _evict(CACHE_MAX_BYTES)
+
+
+def clear_cache():
+    """
+    Drops every decoded signal from the cache and resets the counters.
+    """
+    global _cache_bytes, _cache_hits, _cache_misses
+    with _lock:
+        _cache.clear()
+        _durations.clear()
+        _cache_bytes = 0
+        _cache_hits = 0
+        _cache_misses = 0
+
+
+def cache_info():
+    """
+    Reports decoded-signal cache usage.
+
+    Returns:
+        Dict with entries, bytes, max_bytes, hits and misses.
+    """
+    with _lock:
+        return {
+            "entries": len(_cache),
+            "bytes": _cache_bytes,
+            "max_bytes": CACHE_MAX_BYTES,
+            "hits": _cache_hits,
+            "misses": _cache_misses,
+        }
@@ -0,0 +1,112 @@
+import numpy as np
+
+# Band energy of a block relative to the noise floor that starts an event
+ON_RATIO = 3.0
+
+# Ratio below which an event ends (hysteresis, so events do not flicker on and off)
+OFF_RATIO = 1.5
+
+# Mean per-band log-energy rise between consecutive blocks that starts an event early,
+# as long as the level is also above OFF_RATIO
+FLUX_THRESHOLD = 0.5
+
+# Guard against log(0) and division by zero in silent bands
+EPSILON = 1e-12
+
+
+def band_layout(sample_rate, block_size, freq_range=(0, 2000), bands=8):
+    """
+    Precomputes which rfft bins of a block fall in each of `bands` equal-width bands.
+
+    Args:
+        sample_rate: Sample rate in Hz.
+        block_size: Samples per block.
+        freq_range: (low, high) frequency range in Hz.
+        bands: Number of equal-width bands.
+
+    Returns:
+        Tuple of (mask, indices): a boolean mask of the used rfft bins and the band index of each.
+    """
+    frequency = np.fft.rfftfreq(block_size, d=1/sample_rate)
+    edges = np.linspace(freq_range[0], freq_range[1], bands + 1)
+    indices = np.clip(np.digitize(frequency, edges) - 1, 0, bands - 1)
+    mask = (frequency >= freq_range[0]) & (frequency <= freq_range[1])
+    return mask, indices[mask]
+
+
+def band_energies(block, layout, bands):
+    """
+    Computes the spectral energy (|FFT|²) of one block in each band.
+
+    Args:
+        block: 1-D block of samples.
+        layout: Tuple returned by band_layout for this block size.
+        bands: Number of bands.
+
+    Returns:
+        Array of `bands` energies.
+    """
+    mask, indices = layout
+    power = np.abs(np.fft.rfft(block)[mask]) ** 2
+    return np.bincount(indices, weights=power, minlength=bands)
+
+
+class EventDetector:
+    """
+    Detects sound events from per-block band energies in O(bands) time per block.
+
+    Each band keeps an exponential moving estimate of its noise floor, which follows
+    drops quickly, rises slowly and is nearly frozen during an event. An event starts
+    when the total energy reaches on_ratio times the floor, or earlier when the
+    spectral flux (mean positive log-energy change since the previous block) jumps
+    while the level is above off_ratio; it ends when the level falls below off_ratio.
+    """
+
+    def __init__(self, block_sec, floor_sec=10.0, on_ratio=ON_RATIO, off_ratio=OFF_RATIO,
+                 flux_threshold=FLUX_THRESHOLD):
+        self.alpha = 1 - np.exp(-block_sec / floor_sec)
+        self.on_ratio = on_ratio
+        self.off_ratio = min(off_ratio, on_ratio)
+        self.flux_threshold = flux_threshold
+        self.floor = None
+        self.previous = None
+        self.active = False
+        self.level = 1.0
+        self.flux = 0.0
+
+    def update(self, energies):
+        """
+        Feeds the band energies of the next block.
+
+        Args:
+            energies: Array of band energies.
+
+        Returns:
+            "onset" when an event starts, "offset" when it ends, otherwise None.
+        """
+        energies = np.maximum(energies, EPSILON)
+        log_energies = np.log(energies)
+        if self.floor is None:
+            self.floor = energies.astype(float)
+            self.previous = log_energies
+            return None
+
+        self.level = float(energies.sum() / self.floor.sum())
+        self.flux = float(np.mean(np.maximum(log_energies - self.previous, 0)))
+        self.previous = log_energies
+
+        change = None
+        if not self.active and (self.level >= self.on_ratio or
+                                (self.flux >= self.flux_threshold and self.level >= self.off_ratio)):
+            self.active = True
+            change = "onset"
+        elif self.active and self.level < self.off_ratio:
+            self.active = False
+            change = "offset"
+
+        # Drops are followed quickly and rises slowly; during an event the floor barely moves
+        rate = np.where(energies < self.floor, 4 * self.alpha, self.alpha)
+        if self.active:
+            rate = rate * 0.05
+        self.floor += np.minimum(rate, 1) * (energies - self.floor)
+        return change
@@ -0,0 +1,319 @@
+import numpy as np
+from scipy.fft import next_fast_len, rfft
+from scipy.signal import find_peaks
+
+
+def binned_spectrogram(signal, sample_rate, cutoff_lo, cutoff_hi, time_bins, freq_bins, workers=None):
+    """
+    Computes spectral power summed into equal-width frequency bins for equal-width
+    time windows, processing every window in one batched real FFT.
+
+    Args:
+        signal: Mono signal (1-D array).
+        sample_rate: Sample rate in Hz.
+        cutoff_lo: Lower bound of the frequency range (in Hz).
+        cutoff_hi: Upper bound of the frequency range (in Hz).
+        time_bins: Number of equal-width time windows.
+        freq_bins: Number of equal-width frequency bins.
+        workers: Threads used for the batched FFT (default: 1).
+
+    Returns:
+        Array of shape (time_bins, freq_bins) with the un-normalized binned power (|FFT|²).
+    """
+    window_size = int(len(signal) / time_bins)
+    frames = np.asarray(signal[:window_size * time_bins]).reshape(time_bins, window_size)
+
+    # Real FFT of all windows at once (the signal is real, so only non-negative bins are needed)
+    power = np.abs(rfft(frames, axis=1, workers=workers)) ** 2
+    frequency = np.fft.rfftfreq(window_size, d=1/sample_rate)
+
+    # fftfreq places the Nyquist bin of an even-length window at -fs/2, so it was never in range
+    if window_size % 2 == 0:
+        power = power[:, :-1]
+        frequency = frequency[:-1]
+
+    bin_edges = np.linspace(cutoff_lo, cutoff_hi, freq_bins + 1)
+    mask = (frequency >= cutoff_lo) & (frequency <= cutoff_hi)
+    indices = np.digitize(frequency, bin_edges) - 1
+    mask &= (indices >= 0) & (indices < freq_bins)
+
+    # Offset each window's bin indices so a single bincount sums every window
+    flat_indices = indices[mask] + freq_bins * np.arange(time_bins)[:, None]
+    binned = np.bincount(flat_indices.ravel(), weights=power[:, mask].ravel(),
+                         minlength=time_bins * freq_bins)
+    return binned.reshape(time_bins, freq_bins)
+
+
+def autocorrelation_fft(x, max_lag=None):
+    """
+    Computes the normalized autocorrelation of a signal via the Wiener–Khinchin
+    theorem (inverse FFT of the power spectrum), which is O(n log n) instead of
+    the O(n²) of direct correlation.
+
+    Args:
+        x: 1-D signal, assumed already mean-centred.
+        max_lag: Largest lag to return in samples (None = len(x) - 1).
+
+    Returns:
+        Array of autocorrelation values for lags 0..max_lag, normalized so lag 0 is 1.
+    """
+    n = len(x)
+    if max_lag is None or max_lag > n - 1:
+        max_lag = n - 1
+
+    # Zero-pad past n + max_lag so the circular correlation does not wrap into the kept lags
+    nfft = next_fast_len(n + max_lag + 1)
+    spectrum = np.fft.rfft(x, n=nfft)
+    corr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=nfft)[:max_lag + 1]
+
+    if corr[0] > 0:
+        corr /= corr[0]
+    return corr
+
+
+def top_peaks(values, top_n):
+    """
+    Finds the most prominent local maxima of a 1-D array. Ranking by prominence
+    rather than height keeps small ripples on a decaying slope from crowding out
+    genuine peaks.
+
+    Args:
+        values: 1-D array.
+        top_n: Maximum number of peaks to return.
+
+    Returns:
+        Indices of up to top_n local maxima, most prominent first.
+    """
+    peaks, properties = find_peaks(values, prominence=0)
+    order = np.argsort(properties["prominences"])[::-1]
+    return peaks[order[:top_n]]
+
+
+def welch_spectrogram(signal, sample_rate, bounds, nperseg=8192, batch=256, workers=None):
+    """
+    Welch power spectral density of every analysis window: each window is cut into
+    half-overlapping Hann-windowed segments and their periodograms are averaged.
+    Segments of all windows go through batched real FFTs, and a (segments, windows)
+    indicator matrix sums them per window, so there is no Python loop per segment.
+
+    Args:
+        signal: Mono signal (1-D array).
+        sample_rate: Sample rate in Hz.
+        bounds: Tuple of (starts, ends) of the analysis windows (see framing.frame_bounds).
+        nperseg: Segment length in samples (reduced to the shortest window if needed).
+        batch: Segments transformed per FFT call, bounding the memory used.
+        workers: Threads used for the batched FFT (default: 1).
+
+    Returns:
+        Tuple of (frequency, psd, counts): psd has one row per window and counts is the
+        number of segments averaged in each (windows shorter than nperseg get none).
+    """
+    starts, ends = (np.asarray(b) for b in bounds)
+    nperseg = int(max(min(nperseg, np.max(ends - starts)), 1))
+    hop = max(nperseg // 2, 1)
+
+    # Segment starts of every window, in window order
+    counts = np.maximum((ends - starts - nperseg) // hop + 1, 0)
+    owner = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    seg_starts = starts[owner] + offsets * hop
+
+    taper = np.hanning(nperseg + 1)[:-1]  # Periodic Hann, as scipy.signal.welch
+    scale = 1.0 / (sample_rate * np.sum(taper ** 2))
+    frequency = np.fft.rfftfreq(nperseg, d=1/sample_rate)
+    psd = np.zeros((len(starts), len(frequency)))
+    view = np.lib.stride_tricks.sliding_window_view(np.asarray(signal, dtype=np.float32), nperseg)
+    for lo in range(0, len(seg_starts), batch):
+        segments = view[seg_starts[lo:lo + batch]]
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * taper
+        power = np.abs(rfft(segments, axis=1, workers=workers)) ** 2
+        indicator = owner[lo:lo + batch, None] == np.arange(len(starts))[None, :]
+        psd += indicator.T.astype(power.dtype) @ power
+
+    # One-sided density: every bin but DC (and Nyquist for even lengths) appears twice
+    psd *= scale
+    psd[:, 1:(nperseg + 1) // 2] *= 2
+    psd /= np.maximum(counts, 1)[:, None]
+    return frequency, psd, counts
+
+
+def spectral_peaks(frequency, power, max_peaks=10, min_prominence_db=6.0, freq_range=None):
+    """
+    Finds the most prominent peaks of a power spectrum on a dB scale, so a quiet
+    tone standing well above its neighbourhood ranks like a loud one.
+
+    Args:
+        frequency: Frequencies of the spectrum bins (in Hz).
+        power: Power spectrum, e.g. a Welch average.
+        max_peaks: Maximum number of peaks to return.
+        min_prominence_db: Smallest prominence (dB above the surrounding spectrum) kept.
+        freq_range: Optional (low, high) range in Hz; peaks are found on the whole
+            spectrum, so the range edges never create spurious peaks.
+
+    Returns:
+        Tuple of (indices, prominence_db, bandwidth_hz) arrays sorted by frequency,
+        where bandwidth is the peak width at half its prominence.
+    """
+    level_db = 10 * np.log10(np.asarray(power) + 1e-20)
+    peaks, properties = find_peaks(level_db, prominence=min_prominence_db, width=0, rel_height=0.5)
+    candidates = np.arange(len(peaks))
+    if freq_range is not None:
+        candidates = np.flatnonzero((frequency[peaks] >= freq_range[0]) & (frequency[peaks] <= freq_range[1]))
+    keep = np.sort(candidates[np.argsort(properties["prominences"][candidates])[::-1][:max_peaks]])
+    bin_width = frequency[1] - frequency[0] if len(frequency) > 1 else 0.0
+    return peaks[keep], properties["prominences"][keep], properties["widths"][keep] * bin_width
+
+
+def harmonic_series(frequencies, tolerance=0.01, resolution=0.0, min_harmonics=3, max_harmonic=16,
+                    max_lowest=3, max_series=3):
+    """
+    Groups peak frequencies into harmonic series. Every peak and every spacing
+    between two peaks is tried as the fundamental at once (so a missing fundamental
+    is still found); the candidate explaining the most harmonic numbers wins, its
+    fundamental is refined by least squares, and the search repeats on the
+    remaining peaks.
+
+    Args:
+        frequencies: Peak frequencies (in Hz).
+        tolerance: Largest deviation of a peak from n × fundamental, as a fraction of the fundamental.
+        resolution: Frequency resolution of the peaks (in Hz); deviations up to it are always accepted.
+        min_harmonics: Fewest distinct harmonics that make a series.
+        max_harmonic: Highest harmonic number considered (higher ones fit almost any peak).
+        max_lowest: A series must include one of its first max_lowest harmonics, so a few
+            high peaks that happen to be near multiples of a low frequency do not count.
+        max_series: Maximum number of series to return.
+
+    Returns:
+        List of (fundamental, harmonic_numbers, peak_indices) tuples, strongest series first.
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    remaining = np.arange(len(frequencies))
+    series = []
+    while len(series) < max_series and len(remaining) >= min_harmonics:
+        f = frequencies[remaining]
+        candidates = np.concatenate([f, np.abs(f[:, None] - f[None, :])[np.triu_indices(len(f), 1)]])
+        candidates = np.unique(candidates[candidates > 0])
+
+        # (candidates, peaks) grids of harmonic numbers, deviations and whether each peak fits
+        number = np.round(f[None, :] / candidates[:, None])
+        deviation = np.abs(f[None, :] - number * candidates[:, None])
+        fits = (number >= 1) & (number <= max_harmonic) & \
+               (deviation <= np.maximum(tolerance * candidates, resolution)[:, None])
+
+        # Count distinct harmonic numbers, so two peaks next to one harmonic count once
+        fitted = np.sort(np.where(fits, number, 0), axis=1)
+        count = (fitted[:, :1] > 0).sum(axis=1) + ((np.diff(fitted, axis=1) != 0) & (fitted[:, 1:] > 0)).sum(axis=1)
+        count[np.where(fits, number, np.inf).min(axis=1) > max_lowest] = 0
+        if count.max() < min_harmonics:
+            break
+
+        # Most harmonics explained first; among those, the highest fundamental (not a subharmonic)
+        best = np.lexsort((candidates, count))[-1]
+        used = np.flatnonzero(fits[best])
+        used = used[np.lexsort((deviation[best, used], number[best, used]))]
+        used = used[np.r_[True, np.diff(number[best, used]) != 0]]  # Closest peak to each harmonic
+        matched, n = remaining[used], number[best, used]
+        fundamental = float(np.sum(n * frequencies[matched]) / np.sum(n ** 2))
+        series.append((fundamental, n.astype(int), matched))
+        remaining = np.delete(remaining, used)
+    return series
+
+
+def peak_persistence(psd, peaks, threshold_db=6.0, neighbourhood=25):
+    """
+    Measures in which analysis windows each spectral peak is present: a peak counts
+    in a window when its level (the strongest of its bin and the two adjacent ones)
+    exceeds the median of the surrounding bins by threshold_db.
+
+    Args:
+        psd: Array of shape (windows, bins), e.g. from welch_spectrogram.
+        peaks: Bin indices of the peaks.
+        threshold_db: Required rise above the local background (in dB).
+        neighbourhood: Bins on each side used for the local background.
+
+    Returns:
+        Boolean array of shape (windows, peaks).
+    """
+    level_db = 10 * np.log10(np.asarray(psd) + 1e-20)
+    bins = level_db.shape[1]
+    peaks = np.asarray(peaks, dtype=int)
+    around = np.clip(peaks[:, None] + np.arange(-neighbourhood, neighbourhood + 1)[None, :], 0, bins - 1)
+    nearby = np.clip(peaks[:, None] + np.arange(-1, 2)[None, :], 0, bins - 1)
+    background = np.median(level_db[:, around], axis=2)
+    return level_db[:, nearby].max(axis=2) - background >= threshold_db
+
+
+def zero_crossing_rate(segment):
+    """
+    Fraction of consecutive samples whose sign differs.
+    """
+    return np.sum(np.diff(np.sign(segment)) != 0) / len(segment)
+
+
+def spectral_flatness(segment):
+    """
+    Ratio of the geometric to the arithmetic mean of the power spectrum: near 0 for
+    tonal signals, near 1 for noise.
+    """
+    spectrum = np.fft.fft(segment)
+    power = np.abs(spectrum) ** 2 + 1e-12  # avoid log(0)
+    geom_mean = np.exp(np.mean(np.log(power)))
+    arith_mean = np.mean(power)
+    return geom_mean / arith_mean
+
+
+def shannon_entropy(segment, bins=64):
+    """
+    Shannon entropy (bits) of the density histogram of the sample values.
+    """
+    hist, _ = np.histogram(segment, bins=bins, density=True)
+    hist = hist[hist > 0]  # Remove zero entries to avoid log(0)
+    return -np.sum(hist * np.log2(hist))
+
+
+def higuchi_fd(x, kmax, max_samples=None):
+    """
+    Estimates the fractal dimension of a waveform with the Higuchi method.
+
+    For each interval k the absolute k-step differences are computed once; the curve
+    length of every offset m is then a column sum of a (rows, k) reshaped view of
+    those differences, so no index arrays are built or gathered per (k, m).
+
+    Args:
+        x: 1-D signal.
+        kmax: Largest time interval k.
+        max_samples: If set and x is longer, estimate on a strided view of x with
+            at most this many samples (faster, approximate).
+
+    Returns:
+        Slope of log curve length against log(1/k).
+    """
+    x = np.asarray(x)
+    if not np.issubdtype(x.dtype, np.floating):
+        x = x.astype(np.float64)
+    if max_samples and len(x) > max_samples:
+        x = x[::-(-len(x) // max_samples)]
+    N = len(x)
+
+    L = np.empty(kmax)
+    buffer = np.empty(N, dtype=x.dtype)
+    for k in range(1, kmax+1):
+        diffs = buffer[:N - k]
+        np.subtract(x[k:], x[:-k], out=diffs)
+        np.abs(diffs, out=diffs)
+
+        m = np.arange(k)
+        # Offset m sums diffs[m], diffs[m + k], ... over floor((N - m) / k) - 1 steps
+        steps = (N - m) // k - 1
+        full = steps.min()
+        lengths = diffs[:full * k].reshape(full, k).sum(axis=0, dtype=np.float64)
+        longer = steps > full
+        lengths[longer] += diffs[full * k + m[longer]]
+
+        lengths *= (N - 1) / (steps * k)
+        L[k - 1] = np.mean(lengths)
+
+    lnL = np.log(L)
+    lnk = np.log(1.0 / np.arange(1, kmax+1))
+    coeffs = np.polyfit(lnk, lnL, 1)
+    return coeffs[0]  # slope = fractal dimension estimate
@@ -0,0 +1,307 @@
+import functools
+import inspect
+import io
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+# Default size limit of one tool result in the agent's context (override with TOOL_TOKEN_BUDGET)
+TOOL_TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", "300"))
+
+# Rough characters per token, used to estimate sizes without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Significant digits kept for non-integer values
+SIGNIFICANT_DIGITS = 3
+
+# How each tool's table can be shrunk: "grid" tables (spectrograms) merge adjacent time
+# rows and frequency columns, "series" tables (one row per time window) merge adjacent
+# windows, and "ranked" tables keep their highest rows by RANK_COLUMNS
+TOOL_LAYOUTS = {
+    "fft": "grid",
+    "stereo_fft": "grid",
+    "zero_crossing_rate": "series",
+    "envelope_decay": "series",
+    "spectral_flatness": "series",
+    "fractal_dimension": "series",
+    "shannon_entropy": "series",
+    "analyze_features": "series",
+    "file_meta_data": "series",
+    "autocorrelation": "ranked",
+    "spectral_peaks": "ranked",
+}
+RANK_COLUMNS = {
+    "autocorrelation": "Autocorrelation",
+    "spectral_peaks": "Prominence (dB)",
+}
+
+# Consecutive windows whose values all stay within this fraction of each column's range
+# are merged into one row when a table is over budget
+STABLE_TOLERANCE = 0.1
+
+# Row labels of the per-window rows; any other row (Overall, Decay Rate, ...) is a summary kept as is
+WINDOW_LABEL = re.compile(r"^(Window \d+(-\d+)?|-?[\d.]+-[\d.]+sec)$")
+NUMBERED_LABEL = re.compile(r"^(Window|Segment) (\d+(?:-\d+)?)$")
+BIN_LABEL = re.compile(r"^(.*?)(-?[\d.]+)-(-?[\d.]+)Hz$")
+
+
+def estimate_tokens(text):
+    """
+    Approximate token count of a text.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def format_number(value):
+    """
+    Formats a table value compactly: integers in full, other numbers to SIGNIFICANT_DIGITS
+    significant digits (without exponent above 1000), missing values as empty.
+    """
+    if isinstance(value, str):
+        return value
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    if abs(value) >= 10 ** SIGNIFICANT_DIGITS:
+        return f"{value:.0f}"
+    return f"{value:.{SIGNIFICANT_DIGITS}g}"
+
+
+def _render(df, notes):
+    # "Window 3" / "Segment 3" labels become "3" under a "Window" / "Segment" header
+    columns = [str(c) for c in df.columns]
+    labels = df.iloc[:, 0].astype(str)
+    numbered = labels.str.extract(NUMBERED_LABEL)
+    kinds = numbered[0].dropna().unique()
+    if len(kinds) == 1 and numbered[0].notna().sum() > 1:
+        columns[0] = kinds[0]
+        df = df.assign(**{df.columns[0]: numbered[1].fillna(labels)})
+
+    lines = [",".join(columns)]
+    lines += [",".join(format_number(v) for v in row) for row in df.itertuples(index=False)]
+    return "\n".join(lines + [f"# {note}" for note in notes]) + "\n"
+
+
+def _merge_labels(first, last):
+    if first == last:
+        return first
+    windows = re.match(r"^Window (\d+)", first), re.match(r"^Window (?:\d+-)?(\d+)$", last)
+    if all(windows):
+        return f"Window {windows[0].group(1)}-{windows[1].group(1)}"
+    times = re.match(r"^(-?[\d.]+)-", first), re.search(r"-([\d.]+)sec$", last)
+    if all(times):
+        return f"{times[0].group(1)}-{times[1].group(1)}sec"
+    return f"{first}..{last}"
+
+
+def _merge_rows(df, groups):
+    """
+    Averages the numeric columns over consecutive row groups (given as group ids).
+    """
+    label = df.columns[0]
+    numeric = df.select_dtypes("number").columns
+    merged = df.groupby(groups, sort=False).agg(
+        {c: ("mean" if c in numeric else "first") for c in df.columns})
+    merged[label] = [_merge_labels(g[label].iloc[0], g[label].iloc[-1]) for _, g in df.groupby(groups, sort=False)]
+    return merged.reset_index(drop=True)
+
+
+def _run_lengths(df):
+    """
+    Merges consecutive rows whose values are identical once formatted.
+    """
+    values = df.iloc[:, 1:].map(format_number).agg(",".join, axis=1)
+    groups = (values != values.shift()).cumsum().to_numpy()
+    return _merge_rows(df, groups)
+
+
+def _stable_runs(df, tolerance=STABLE_TOLERANCE):
+    """
+    Merges runs of consecutive rows that stay within tolerance × the column range of
+    the run's first row in every numeric column.
+    """
+    values = df.select_dtypes("number").to_numpy(dtype=float)
+    scale = np.nanmax(values, axis=0) - np.nanmin(values, axis=0) if len(values) else np.zeros(0)
+    limit = tolerance * np.where(scale > 0, scale, 1)
+    groups = np.zeros(len(df), dtype=int)
+    start = 0
+    for i in range(1, len(df)):
+        if np.any(np.abs(values[i] - values[start]) > limit):
+            start = i
+        groups[i] = start
+    return _merge_rows(df, groups)
+
+
+def _halve_rows(df):
+    return _merge_rows(df, np.arange(len(df)) // 2)
+
+
+def _halve_columns(df):
+    """
+    Sums adjacent frequency-bin columns ("lo-hiHz", optionally channel-prefixed as "L:lo-hiHz").
+    """
+    merged = {df.columns[0]: df.iloc[:, 0]}
+    columns = list(df.columns[1:])
+    i = 0
+    while i < len(columns):
+        first, second = columns[i], columns[i + 1] if i + 1 < len(columns) else None
+        a, b = BIN_LABEL.match(first), second and BIN_LABEL.match(second)
+        if a and b and a.group(1) == b.group(1):
+            merged[f"{a.group(1)}{a.group(2)}-{b.group(3)}Hz"] = df[first] + df[second]
+            i += 2
+        else:
+            merged[first] = df[first]
+            i += 1
+    return pd.DataFrame(merged)
+
+
+def encode_table(text, layout="series", budget=TOOL_TOKEN_BUDGET, rank_column=None):
+    """
+    Re-encodes a CSV tool result to fit a token budget. Numbers are always rounded to
+    SIGNIFICANT_DIGITS; if the table is still too large it is shrunk according to its
+    layout: identical consecutive rows are merged, then "series" and "grid" tables
+    average adjacent windows (and a grid sums adjacent frequency bins) and "ranked"
+    tables keep their highest rows by rank_column. Summary rows are always kept, and
+    every reduction is described in a trailing "# ..." line, so the format stays CSV
+    with the same columns.
+
+    Args:
+        text: Tool result; anything that is not a CSV table is only truncated.
+        layout: "grid", "series" or "ranked".
+        budget: Token budget of the result.
+        rank_column: Column ranking the rows of a "ranked" table.
+
+    Returns:
+        The encoded result.
+    """
+    try:
+        df = pd.read_csv(io.StringIO(text))
+    except (ValueError, pd.errors.ParserError):
+        df = None
+    if df is None or df.shape[1] < 2 or len(df) == 0 or not isinstance(df.columns[0], str):
+        if estimate_tokens(text) <= budget:
+            return text
+        return text[:budget * CHARS_PER_TOKEN] + f"\n# truncated from ~{estimate_tokens(text)} tokens\n"
+
+    label = df.columns[0]
+    df[label] = df[label].astype(str)
+    n_columns = df.shape[1] - 1
+    encoded = _render(df, [])
+    if estimate_tokens(encoded) <= budget:
+        return encoded
+
+    if layout == "ranked" and rank_column in df.columns:
+        # Keep the top rows in their original order, plus rows without a score
+        scores = pd.to_numeric(df[rank_column], errors="coerce")
+        summary, ranked = df[scores.isna()], df[scores.notna()]
+        order = scores[scores.notna()].sort_values(ascending=False).index
+        for keep in range(len(ranked), 0, -1):
+            top = ranked.loc[sorted(order[:keep])]
+            encoded = _render(pd.concat([top, summary]),
+                              [f"top {keep} of {len(ranked)} rows by {rank_column}"] if keep < len(ranked) else [])
+            if estimate_tokens(encoded) <= budget:
+                return encoded
+        return encoded
+
+    summary_rows = ~df[label].str.match(WINDOW_LABEL)
+    summary, windows = df[summary_rows], df[~summary_rows].reset_index(drop=True)
+    if windows.empty:
+        return encoded
+
+    n_windows = len(windows)
+    windows = _run_lengths(windows)
+    notes = [f"{n_windows} windows merged to {len(windows)} (identical values)"] if len(windows) < n_windows else []
+    if estimate_tokens(_render(pd.concat([windows, summary]) if len(summary) else windows, notes)) > budget:
+        windows = _stable_runs(windows)
+        notes = [f"{n_windows} windows merged to {len(windows)} (runs where every value stays within "
+                 f"{STABLE_TOLERANCE:.0%} of its column's range)"] if len(windows) < n_windows else []
+    while True:
+        encoded = _render(pd.concat([windows, summary]) if len(summary) else windows, notes)
+        if estimate_tokens(encoded) <= budget:
+            return encoded
+        # Grids shrink along their larger dimension; other tables only merge windows
+        if layout == "grid" and windows.shape[1] - 1 > max(len(windows), 2):
+            narrower = _halve_columns(windows)
+            if narrower.shape[1] == windows.shape[1]:
+                return encoded
+            windows = narrower
+        elif len(windows) > 1:
+            windows = _halve_rows(windows)
+        else:
+            return encoded
+        notes = []
+        if len(windows) < n_windows:
+            notes.append(f"{n_windows} windows averaged down to {len(windows)}")
+        if windows.shape[1] - 1 < n_columns:
+            notes.append(f"{n_columns} frequency bins summed down to {windows.shape[1] - 1}")
+
+
+def compact_tool(fn, layout=None):
+    """
+    Wraps a tool so its result is re-encoded with encode_table. The wrapper keeps the
+    tool's name and docstring and adds a token_budget parameter, so the agent can ask
+    for more detail when it needs it.
+
+    Args:
+        fn: Tool function returning a CSV string.
+        layout: Table layout (default: TOOL_LAYOUTS entry of the tool, or "series").
+
+    Returns:
+        The encoding wrapper.
+    """
+    name = fn.__name__
+    layout = layout or TOOL_LAYOUTS.get(name, "series")
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, token_budget: int = TOOL_TOKEN_BUDGET, **kwargs):
+        return encode_table(fn(*args, **kwargs), layout, token_budget, RANK_COLUMNS.get(name))
+
+    wrapper.__signature__ = signature.replace(parameters=list(signature.parameters.values()) + [
+        inspect.Parameter("token_budget", inspect.Parameter.KEYWORD_ONLY, default=TOOL_TOKEN_BUDGET,
+                          annotation=int)])
+    wrapper.__doc__ = (fn.__doc__ or "").rstrip() + (
+        f"\n\n    The result is compact CSV of at most about token_budget tokens (default: {TOOL_TOKEN_BUDGET});"
+        "\n    larger tables are merged or ranked as described in trailing lines starting with #.\n")
+    return wrapper
+
+
+def main(*file_paths):
+    """
+    Compares the context size of a typical set of tool calls on each file before and
+    after encoding: the pre-analysis sweep plus one default call of every analysis tool.
+    """
+    import functions
+    from preanalysis import pre_analysis
+
+    calls = [
+        ("fft", (0, 2000), {}),
+        ("fft", (0, 2000), {"time_bins": 20, "freq_bins": 30}),
+        ("zero_crossing_rate", (), {}),
+        ("envelope_decay", (), {}),
+        ("spectral_flatness", (), {}),
+        ("fractal_dimension", (), {}),
+        ("shannon_entropy", (), {}),
+        ("analyze_features", (), {}),
+        ("autocorrelation", (), {}),
+        ("spectral_peaks", (), {"max_peaks": 30}),
+    ]
+    totals = [0, 0]
+    for file_path in file_paths:
+        raw = [getattr(functions, name)(file_path, *args, **kwargs) for name, args, kwargs in calls]
+        encoded = [encode_table(text, TOOL_LAYOUTS[name], TOOL_TOKEN_BUDGET, RANK_COLUMNS.get(name))
+                   for text, (name, _, _) in zip(raw, calls)]
+        sizes = [sum(estimate_tokens(t) for t in raw) + estimate_tokens(pre_analysis(file_path, encode=False)),
+                 sum(estimate_tokens(t) for t in encoded) + estimate_tokens(pre_analysis(file_path))]
+        print(f"{file_path}: ~{sizes[0]} tokens raw, ~{sizes[1]} encoded")
+        totals = [t + s for t, s in zip(totals, sizes)]
+    if file_paths:
+        print(f"Total: ~{totals[0]} tokens raw, ~{totals[1]} encoded ({totals[1] / totals[0]:.0%})")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
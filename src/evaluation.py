@@ -333,7 +333,11 @@
 #     main()
 
 import os
+import re
 import json
+import time
+import asyncio
+import hashlib
 from dotenv import load_dotenv
 from llama_index.llms.openai import OpenAI
 
@@ -362,25 +366,193 @@ Predicted label: {pred_labels}
 Result:
 """
 
+batch_eval_prompt="""
+You are a grading assistant for an audio classification task.
+
+Instructions: 
+- You are given numbered pairs of a ground truth label and a predicted label.
+- For each pair, decide whether the predicted label is a literal or semantic match to the ground truth label
+  (e.g. "human" and "person speaking", "nature" and "natural sound").
+- Return ONLY a JSON list with one entry per pair, in the same order, each either "PASS" or "FAIL" — nothing else.
+
+Now evaluate:
+
+{pairs}
+
+Result:
+"""
+
+# Maximum number of grading requests in flight (override with GRADING_CONCURRENCY)
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "8"))
+
+# Label pairs graded per batch prompt
+GRADING_BATCH_SIZE = int(os.getenv("GRADING_BATCH_SIZE", "20"))
+
+# On-disk cache of label-pair judgments, shared across evaluation runs
+GRADING_CACHE_FILE = os.getenv("GRADING_CACHE_FILE", os.path.join("tmp", "grading_cache.json"))
+
+# Set GRADING_PREFILTER=0 to send every unseen pair to the LLM, even obvious matches
+GRADING_PREFILTER = os.getenv("GRADING_PREFILTER", "1") != "0"
+
+# Identifies the grading prompts, so editing them invalidates cached judgments
+PROMPT_HASH = hashlib.sha256((source_eval_prompt + batch_eval_prompt).encode()).hexdigest()[:16]
+
+# Labels that are the same word spelled differently, used by the local pre-filter. Plurals
+# are handled by singular(); anything that needs judgment (e.g. "car" and "traffic") is left
+# to the LLM
+SYNONYMS = [
+    {"hvac", "h v a c"},
+    {"birdsong", "bird song"},
+    {"seagull", "sea gull"},
+    {"fireplace", "fire place"},
+    {"videogame", "video game"},
+    {"synthesized", "synthesised"},
+    {"synthesized speech", "synthesised speech"},
+    {"air conditioner", "airconditioner"},
+]
+
+# Running totals of grading calls and tokens, reported at the end of main()
+usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+def record_usage(response):
+    """Add the token usage of an LLM response to the running totals."""
+    raw_usage = getattr(response.raw, "usage", None)
+    if raw_usage is None and isinstance(response.raw, dict):
+        raw_usage = response.raw.get("usage")
+    usage["calls"] += 1
+    if raw_usage is None:
+        return
+    get = raw_usage.get if isinstance(raw_usage, dict) else lambda key: getattr(raw_usage, key, 0)
+    usage["prompt_tokens"] += get("prompt_tokens") or 0
+    usage["completion_tokens"] += get("completion_tokens") or 0
+
+async def grade(prompt, semaphore):
+    """Send one grading prompt, bounded by the semaphore, and return the response text."""
+    async with semaphore:
+        response = await llm.acomplete(prompt)
+    record_usage(response)
+    return response.text.strip()
+
+def normalize_label(label):
+    """Lowercase a label and strip punctuation and extra whitespace."""
+    words = re.sub(r"[^a-z0-9 ]+", " ", str(label).lower()).split()
+    return " ".join(words)
+
+def singular(word):
+    """Strip a single plural suffix from a word ("bodies" -> "body", "waves" -> "wave")."""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def prefilter_match(label, pred):
+    """Cheap local check for obvious matches: equal after normalization, equal
+    ignoring plurals and word order, or listed together in SYNONYMS. Never fails a pair.
+    """
+    label, pred = normalize_label(label), normalize_label(pred)
+    if label == pred:
+        return True
+    if {singular(w) for w in label.split()} == {singular(w) for w in pred.split()}:
+        return True
+    return any(label in group and pred in group for group in SYNONYMS)
+
+def cache_key(label, pred):
+    """Key of a label-pair judgment: grader model, prompt hash, true label, predicted label."""
+    return json.dumps([llm.model, PROMPT_HASH, label, pred])
+
+def load_grading_cache():
+    if not os.path.exists(GRADING_CACHE_FILE):
+        return {}
+    with open(GRADING_CACHE_FILE, "r") as f:
+        return json.load(f)
+
+def save_grading_cache(cache):
+    """Write the cache atomically so an interrupted run never leaves it half written."""
+    os.makedirs(os.path.dirname(GRADING_CACHE_FILE) or ".", exist_ok=True)
+    tmp_path = f"{GRADING_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, GRADING_CACHE_FILE)
+
+async def grade_pair(label, pred, semaphore):
+    """Grade a single (ground truth label, predicted label) pair.
+
+    Returns:
+        True for PASS, False for FAIL, or None if the LLM call failed.
+    """
+    prompt = source_eval_prompt.format(true_labels=[label], pred_labels=[pred])
+    try:
+        return "PASS" in (await grade(prompt, semaphore)).upper()
+    except Exception as e:
+        print(f"LLM individual label grading failed: {e}")
+        return None
+
+async def grade_batch(pairs, semaphore):
+    """Grade several (ground truth label, predicted label) pairs in one prompt,
+    falling back to one prompt per pair if the response cannot be parsed.
+
+    Returns:
+        list with one result per pair: True, False, or None where grading failed.
+    """
+    numbered = "\n".join(f"{i+1}. Ground truth label: {label} | Predicted label: {pred}"
+                         for i, (label, pred) in enumerate(pairs))
+    try:
+        text = await grade(batch_eval_prompt.format(pairs=numbered), semaphore)
+        grades = json.loads(text[text.index("["):text.rindex("]") + 1])
+        if len(grades) == len(pairs):
+            return ["PASS" in str(g).upper() for g in grades]
+        print(f"LLM batch label grading returned {len(grades)} results for {len(pairs)} pairs, grading individually")
+    except Exception as e:
+        print(f"LLM batch label grading failed, grading pairs individually: {e}")
+    return await asyncio.gather(*(grade_pair(label, pred, semaphore) for label, pred in pairs))
+
+async def grade_pairs(pairs, semaphore, cache, prefilter=GRADING_PREFILTER):
+    """Judge every (ground truth label, predicted label) pair, answering from the
+    pre-filter and the cache first and sending only unseen pairs to the LLM in
+    concurrent batches. New LLM judgments are added to the cache.
+
+    Returns:
+        dict mapping each pair to True (PASS) or False (FAIL), and a dict of how
+        many pairs were answered by "prefilter", "cache" and "llm".
+    """
+    judgments = {}
+    sources = {"prefilter": 0, "cache": 0, "llm": 0}
+    unseen = []
+    for label, pred in dict.fromkeys(pairs):
+        if prefilter and prefilter_match(label, pred):
+            judgments[(label, pred)] = True
+            sources["prefilter"] += 1
+        elif cache_key(label, pred) in cache:
+            judgments[(label, pred)] = cache[cache_key(label, pred)] == "PASS"
+            sources["cache"] += 1
+        else:
+            unseen.append((label, pred))
+
+    batches = [unseen[i:i + GRADING_BATCH_SIZE] for i in range(0, len(unseen), GRADING_BATCH_SIZE)]
+    results = await asyncio.gather(*(grade_batch(batch, semaphore) for batch in batches))
+    for batch, grades in zip(batches, results):
+        for pair, passed in zip(batch, grades):
+            judgments[pair] = bool(passed)
+            # Failed calls count as FAIL for this run but are not cached
+            if passed is not None:
+                cache[cache_key(*pair)] = "PASS" if passed else "FAIL"
+    sources["llm"] = len(unseen)
+    return judgments, sources
+
 # This function evaluates individual labels against the ground truth.
-def individual_label_score(true_labels, pred_labels):
+def individual_label_score(true_labels, pred_labels, judgments):
     passes = 0
     total = 0
-    
+
     for label in true_labels:
         total += 1
-        for pred in pred_labels:
-            prompt = source_eval_prompt.format(true_labels=[label], pred_labels=[pred])
-            try:
-                response = llm.complete(prompt)
-                if "PASS" in response.text.strip().upper():
-                    passes += 1
-                    break  # Stop checking this true label once we find a match
-            except Exception as e:
-                print(f"LLM individual label grading failed: {e}")
+        # A ground truth label passes if any prediction matches it
+        if any(judgments[(label, pred)] for pred in pred_labels):
+            passes += 1
     return passes, total
 
-def main():
+async def main(prefilter=GRADING_PREFILTER):
     if not os.path.exists(GROUND_TRUTH_FILE):
         print(f"Cannot find {GROUND_TRUTH_FILE}. Make sure it exists.")
         return
@@ -388,9 +560,12 @@ def main():
     with open(GROUND_TRUTH_FILE, "r") as f:
         ground_truth = json.load(f)
 
-    label_passes = 0
-    label_total = 0
+    start = time.monotonic()
+    semaphore = asyncio.Semaphore(GRADING_CONCURRENCY)
+    usage.update(calls=0, prompt_tokens=0, completion_tokens=0)
+    cache = load_grading_cache()
 
+    files = []
     for fname, truth in ground_truth.items():
         pred_path = os.path.join(OUTPUT_DIR, fname.replace(".m4a", ".json").replace(".mp3", ".json"))
         if not os.path.exists(pred_path):
@@ -402,8 +577,19 @@ def main():
 
         true_sources = truth["structured"]["source_type"]
         pred_sources = pred.get("structured", {}).get("source_type", [])
+        files.append((fname, true_sources, pred_sources))
+
+    # Judge every label pair across all files at once, then score in ground truth order
+    pairs = [(label, pred) for _, true_sources, pred_sources in files
+             for label in true_sources for pred in pred_sources]
+    judgments, sources = await grade_pairs(pairs, semaphore, cache, prefilter=prefilter)
+    save_grading_cache(cache)
+
+    label_passes = 0
+    label_total = 0
 
-        indiv_pass, indiv_total = individual_label_score(true_sources, pred_sources)
+    for fname, true_sources, pred_sources in files:
+        indiv_pass, indiv_total = individual_label_score(true_sources, pred_sources, judgments)
         label_passes += indiv_pass
         label_total += indiv_total
 
@@ -413,6 +599,9 @@ def main():
 
     label_score = label_passes / label_total if label_total else 0
     print(f"Final Label Accuracy Score: {label_score:.2f} ({label_passes}/{label_total})")
+    print(f"Label pairs: {sources['prefilter']} pre-filtered, {sources['cache']} cached, {sources['llm']} graded by LLM")
+    print(f"Grading took {time.monotonic() - start:.1f}s wall clock, {usage['calls']} LLM calls, "
+          f"{usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
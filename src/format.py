@@ -31,7 +31,8 @@ def format_fft_output_as_rich_table(
         csv_file = io.StringIO(csv_string)
         reader = csv.reader(csv_file)
         header = next(reader)
-        data_rows = list(reader)
+        # Skip the trailing "# ..." notes of compactly encoded results
+        data_rows = [row for row in reader if row and not row[0].startswith("#")]
 
         if not data_rows:
             console.print(Panel(
@@ -0,0 +1,106 @@
+import numpy as np
+from audio_io import load_audio, load_window
+
+# Number of equal windows the time-windowed tools split a file into by default
+DEFAULT_WINDOWS = 30
+
+
+def window_bounds(n_samples, windows):
+    """
+    Computes window edges matching np.array_split(signal, windows).
+
+    Args:
+        n_samples: Signal length.
+        windows: Number of windows.
+
+    Returns:
+        Integer array of windows + 1 edges.
+    """
+    size, extra = divmod(n_samples, windows)
+    index = np.arange(windows + 1)
+    return index * size + np.minimum(index, extra)
+
+
+def frame_bounds(n_samples, sample_rate, windows=DEFAULT_WINDOWS, window_sec=None, hop_sec=None):
+    """
+    Computes the sample ranges of the analysis windows: either `windows` equal parts
+    (as np.array_split), or fixed-length frames of window_sec every hop_sec.
+
+    Args:
+        n_samples: Signal length.
+        sample_rate: Sample rate in Hz.
+        windows: Number of equal windows, used when window_sec is not given.
+        window_sec: Frame length in seconds.
+        hop_sec: Step between frame starts in seconds (default: window_sec, no overlap).
+
+    Returns:
+        Tuple of (starts, ends) integer arrays.
+    """
+    if window_sec:
+        length = max(int(round(window_sec * sample_rate)), 1)
+        hop = max(int(round((hop_sec or window_sec) * sample_rate)), 1)
+        starts = np.arange(0, max(n_samples - length, 0) + 1, hop)
+        return starts, np.minimum(starts + length, n_samples)
+
+    edges = window_bounds(n_samples, max(int(windows), 1))
+    return edges[:-1], edges[1:]
+
+
+def frames(signal, bounds):
+    """
+    Slices a signal into its analysis windows. Every window is a view of the
+    signal, so overlapping frames do not copy samples.
+
+    Args:
+        signal: 1-D signal.
+        bounds: Tuple of (starts, ends) from frame_bounds.
+
+    Returns:
+        List of 1-D views.
+    """
+    return [signal[lo:hi] for lo, hi in zip(*bounds)]
+
+
+def is_whole_file(start_sec=0, end_sec=None, window_sec=None):
+    """
+    True when a call asks for the default framing: equal windows over the whole file.
+    """
+    return not start_sec and not end_sec and not window_sec
+
+
+def load_frames(file_path, start_sec=0, end_sec=None, windows=DEFAULT_WINDOWS, window_sec=None, hop_sec=None):
+    """
+    Loads the mono signal of a time range and computes its analysis windows. Only the
+    requested range is read when one is given.
+
+    Args:
+        file_path: Path to the input audio file.
+        start_sec: Start time in seconds.
+        end_sec: End time in seconds (None = end of file).
+        windows: Number of equal windows, used when window_sec is not given.
+        window_sec: Frame length in seconds.
+        hop_sec: Step between frame starts in seconds (default: window_sec).
+
+    Returns:
+        Tuple of (signal, sample_rate, bounds, labels). Labels are "Window i" for the
+        default whole-file windows and "start-endsec" time ranges otherwise.
+    """
+    if is_whole_file(start_sec, end_sec, window_sec):
+        signal, sample_rate = load_audio(file_path, mono=True)
+    else:
+        signal, sample_rate, _ = load_window(file_path, start_sec, end_sec, mono=True)
+
+    bounds = frame_bounds(len(signal), sample_rate, windows, window_sec, hop_sec)
+    return signal, sample_rate, bounds, frame_labels(bounds, sample_rate, start_sec, end_sec, window_sec)
+
+
+def frame_labels(bounds, sample_rate, start_sec=0, end_sec=None, window_sec=None):
+    """
+    Row labels for the analysis windows, in the same format as fft's time column
+    unless the default whole-file windows are used.
+    """
+    starts, ends = bounds
+    if is_whole_file(start_sec, end_sec, window_sec):
+        return [f"Window {i+1}" for i in range(len(starts))]
+    return [f"{start_sec + lo / sample_rate:.2f}-{start_sec + hi / sample_rate:.2f}sec"
+            for lo, hi in zip(starts, ends)]
@@ -3,12 +3,16 @@ from dotenv import load_dotenv
 import os
 import subprocess
 import pandas as pd
-from pathlib import Path
-from audio2numpy import open_audio
+from audio_io import load_audio, load_window, probe_duration
+import dsp
+from dsp import binned_spectrogram, autocorrelation_fft, top_peaks
+from streaming import should_stream, stream_features, stream_spectrogram
+from pyramid import pyramid_spectrogram
+from parallel import map_windows, fft_workers
+from framing import load_frames, frames, frame_bounds, is_whole_file
+from monitor import Recorder
 import numpy as np
 import pyaudio
-import wave
-import uuid
 import time
 import json
 from scipy.signal import hilbert
@@ -17,6 +21,13 @@ import base64
 
 load_dotenv()
 
+# Longest signal (in samples) used for the whole-file fractal dimension; longer ones are
+# estimated on an evenly strided subset. 0 keeps every sample.
+FRACTAL_MAX_SAMPLES = int(os.getenv("SIGNAL_FRACTAL_MAX_SAMPLES", "0")) or None
+
+# Welch segment length of spectral_peaks (~5 Hz resolution at 44.1 kHz)
+PEAK_NPERSEG = 8192
+
 pplx_system_prompt = "You are a helpful assistant. All answers should be in English regardless of the language of the question. " \
 
 def search_perplexity(
@@ -115,10 +126,23 @@ def file_meta_data(file_path: str) -> str:
         - 'Value': Corresponding value of the property
     """
     # Use ffprobe to extract metadata
-    result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration,bit_rate,size', '-of', 'default=noprint_wrappers=1:nokey=1', file_path], capture_output=True, text=True)
-    
+    result = subprocess.run(meta_data_command(file_path), capture_output=True, text=True)
+    return meta_data_csv(result.stdout)
+
+
+def meta_data_command(file_path):
+    """
+    ffprobe command used by file_meta_data.
+    """
+    return ['ffprobe', '-v', 'error', '-show_entries', 'format=duration,bit_rate,size', '-of', 'default=noprint_wrappers=1:nokey=1', str(file_path)]
+
+
+def meta_data_csv(ffprobe_output):
+    """
+    Formats the output of meta_data_command as the CSV returned by file_meta_data.
+    """
     # Parse the output
-    lines = result.stdout.strip().split('\n')
+    lines = ffprobe_output.strip().split('\n')
     properties = ['Duration (seconds)', 'Bit Rate (kbps)', 'Size (bytes)']
     
     # Create a DataFrame and return as CSV
@@ -171,85 +195,38 @@ def fft(file_path, cutoff_lo, cutoff_hi, start_sec=0, end_sec=None, time_bins=5,
         - Uses power spectrum magnitude (|FFT|²) as the measure of spectral energy.
     """
 
-    # Load the audio file
-    input_file_path = Path(file_path)
-    
-    # If the file is already WAV, skip conversion
-    if input_file_path.suffix.lower() == '.wav':
-        wav_file = input_file_path
-    else:
-        wav_file = input_file_path.with_suffix('.wav')
-        if not verbose:
-            stdout = subprocess.DEVNULL
-            stderr = subprocess.DEVNULL
-        else:
-            stdout = None
-            stderr = None
-            
-        # Convert to WAV format
-        subprocess.run(['ffmpeg', '-y', '-i', str(input_file_path), str(wav_file)], 
-                      stdout=stdout,
-                      stderr=stderr,
-                      check=True)
-
-    signal, sample_rate = open_audio(str(wav_file))
-
-    # Convert to mono if stereo
-    if signal.ndim == 2:
-        signal = np.mean(signal, axis=1)
-
-    # Trim the signal to the specified time range
-    start_sample = int(start_sec * sample_rate)
-    
-    if not end_sec:
-        end_sec = len(signal) / sample_rate
-        
-    end_sample = int(end_sec * sample_rate)
-    signal = signal[start_sample:end_sample]
-
-    #Time binning setup
-    total_samples = len(signal)
-    window_size = int(total_samples / time_bins)
-
     #Frequency bin setup
     bin_edges = np.linspace(cutoff_lo, cutoff_hi, freq_bins + 1)
     bin_labels = [f"{int(bin_edges[i])}-{int(bin_edges[i+1])}Hz" for i in range(freq_bins)]
 
-    spectrogram = []
-
-    #Slide window over signal
-    for w in range(time_bins):
-        start = w * window_size
-        end = start + window_size
-        windowed_signal = signal[start:end]
-
-        # Perform FFT on the windowed signal
-        fft_result = np.fft.fft(windowed_signal)
-        frequency = np.fft.fftfreq(len(windowed_signal), d=1/sample_rate)
-        power = np.abs(fft_result)**2
-
-        #only keep the frequencies within the cutoff range
-        mask = (frequency >= cutoff_lo) & (frequency <= cutoff_hi)
-        frequency = frequency[mask]
-        power = power[mask]
-
-        #bin the frequencies and power
-        indices = np.digitize(frequency, bin_edges) - 1
-        binned_power = np.zeros(freq_bins)
+    if should_stream(file_path):
+        # Long recording: read it from disk block by block instead of decoding it whole
+        binned_power, end_sec = stream_spectrogram(file_path, cutoff_lo, cutoff_hi, start_sec, end_sec,
+                                                   time_bins, freq_bins)
+    elif (cached := pyramid_spectrogram(file_path, cutoff_lo, cutoff_hi, start_sec, end_sec,
+                                        time_bins, freq_bins)) is not None:
+        # Aggregate the closest precomputed STFT level instead of recomputing FFTs
+        binned_power, end_sec = cached
+    else:
+        # Load only the requested time range (memory-mapped WAV or cached decode)
+        signal, sample_rate, end_sec = load_window(file_path, start_sec, end_sec, mono=True, verbose=verbose)
 
-        for i in range(len(frequency)):
-            if 0 <= indices[i] < freq_bins:
-                binned_power[indices[i]] += power[i]
+        # FFT every time window at once and bin the power
+        binned_power = binned_spectrogram(signal, sample_rate, cutoff_lo, cutoff_hi, time_bins, freq_bins,
+                                          workers=fft_workers())
 
-        #Normalize the binned power
-        if freq_bins > 1:
-            binned_power /= np.sum(binned_power) if np.sum(binned_power) > 0 else 1
+    #Normalize the binned power
+    if freq_bins > 1:
+        totals = binned_power.sum(axis=1, keepdims=True)
+        binned_power /= np.where(totals > 0, totals, 1)
 
+    spectrogram = []
+    for w in range(time_bins):
         # Append time range label
         start_time = round(start_sec + w * ((end_sec - start_sec) / time_bins), 2)
         end_time = round(start_time + ((end_sec - start_sec) / time_bins), 2)
         time_label = f"{start_time:.2f}-{end_time:.2f}sec"
-        spectrogram.append([time_label] + list(binned_power))
+        spectrogram.append([time_label] + list(binned_power[w]))
 
     # Create DataFrame and convert to CSV string
     df = pd.DataFrame(spectrogram, columns=["Time"] + bin_labels)
@@ -272,19 +249,8 @@ def stereo_fft(file_path, cutoff_lo, cutoff_hi, start_sec=0, end_sec=None, time_
     Returns:
         CSV string with columns: Time, L:bin1, ..., L:binN, R:bin1, ..., R:binN
     """
-    input_file_path = Path(file_path)
-
-    # Convert to .wav if needed
-    if input_file_path.suffix.lower() != '.wav':
-        wav_file = input_file_path.with_suffix('.wav')
-        stdout = subprocess.DEVNULL if not verbose else None
-        stderr = subprocess.DEVNULL if not verbose else None
-        subprocess.run(['ffmpeg', '-y', '-i', str(input_file_path), str(wav_file)],
-                       stdout=stdout, stderr=stderr, check=True)
-    else:
-        wav_file = input_file_path
-
-    signal, sample_rate = open_audio(str(wav_file))
+    # Load only the selected segment
+    signal, sample_rate, end_sec = load_window(file_path, start_sec, end_sec, verbose=verbose)
 
     if signal.ndim != 2:
         raise ValueError("Input file must be stereo (2 channels).")
@@ -293,70 +259,29 @@ def stereo_fft(file_path, cutoff_lo, cutoff_hi, start_sec=0, end_sec=None, time_
     left = signal[:, 0]
     right = signal[:, 1]
 
-    # Trim both to the selected segment
-    start_sample = int(start_sec * sample_rate)
-    if not end_sec:
-        end_sec = len(left) / sample_rate
-    end_sample = int(end_sec * sample_rate)
-
-    left = left[start_sample:end_sample]
-    right = right[start_sample:end_sample]
-
-    # Time segmentation
-    total_samples = len(left)
-    window_size = int(total_samples / time_bins)
-
     # Frequency bins
     bin_edges = np.linspace(cutoff_lo, cutoff_hi, freq_bins + 1)
     bin_labels = [f"{int(bin_edges[i])}-{int(bin_edges[i+1])}Hz" for i in range(freq_bins)]
 
+    # FFT and bin all time windows of each channel at once
+    binned_l = binned_spectrogram(left, sample_rate, cutoff_lo, cutoff_hi, time_bins, freq_bins, workers=fft_workers())
+    binned_r = binned_spectrogram(right, sample_rate, cutoff_lo, cutoff_hi, time_bins, freq_bins, workers=fft_workers())
+
+    # Normalize
+    for binned in (binned_l, binned_r):
+        totals = binned.sum(axis=1, keepdims=True)
+        binned /= np.where(totals > 0, totals, 1)
+
     spectrogram = []
 
     for w in range(time_bins):
-        start = w * window_size
-        end = start + window_size
-
-        # Left and Right segments
-        seg_l = left[start:end]
-        seg_r = right[start:end]
-
-        # FFT
-        fft_l = np.fft.fft(seg_l)
-        fft_r = np.fft.fft(seg_r)
-        freq = np.fft.fftfreq(len(seg_l), d=1/sample_rate)
-
-        power_l = np.abs(fft_l)**2
-        power_r = np.abs(fft_r)**2
-
-        # Mask frequencies within cutoff
-        mask = (freq >= cutoff_lo) & (freq <= cutoff_hi)
-        freq = freq[mask]
-        power_l = power_l[mask]
-        power_r = power_r[mask]
-
-        # Bin
-        indices = np.digitize(freq, bin_edges) - 1
-        binned_l = np.zeros(freq_bins)
-        binned_r = np.zeros(freq_bins)
-
-        for i in range(len(freq)):
-            if 0 <= indices[i] < freq_bins:
-                binned_l[indices[i]] += power_l[i]
-                binned_r[indices[i]] += power_r[i]
-
-        # Normalize
-        if np.sum(binned_l) > 0:
-            binned_l /= np.sum(binned_l)
-        if np.sum(binned_r) > 0:
-            binned_r /= np.sum(binned_r)
-
         # Time label
         start_time = round(start_sec + w * ((end_sec - start_sec) / time_bins), 2)
         end_time = round(start_time + ((end_sec - start_sec) / time_bins), 2)
         time_label = f"{start_time:.2f}-{end_time:.2f}sec"
 
         # Append both channels
-        spectrogram.append([time_label] + list(binned_l) + list(binned_r))
+        spectrogram.append([time_label] + list(binned_l[w]) + list(binned_r[w]))
 
     # Build final DataFrame
     df = pd.DataFrame(spectrogram, columns=["Time"] + [f"L:{b}" for b in bin_labels] + [f"R:{b}" for b in bin_labels])
@@ -365,48 +290,33 @@ def stereo_fft(file_path, cutoff_lo, cutoff_hi, start_sec=0, end_sec=None, time_
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def zero_crossing_rate(file_path: str) -> str:
+def zero_crossing_rate(file_path: str, start_sec: float = 0, end_sec: float = None, windows: int = 30,
+                       window_sec: float = None, hop_sec: float = None) -> str:
     """
     Computes the zero-crossing rate (ZCR) of a mono audio signal.
     
     Args:
         file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        windows: Number of equal time windows over the range (default: 30).
+        window_sec: Window length in seconds; overrides windows when given.
+        hop_sec: Step between window starts in seconds (default: window_sec, no overlap).
     
     Returns:
         CSV string with 'Time Window' and 'ZCR' columns for each time segment.
     """
 
-    input_file_path = Path(file_path)
-
-    # Convert to WAV if necessary
-    if input_file_path.suffix.lower() != ".wav":
-        wav_path = input_file_path.with_suffix(".wav")
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', str(input_file_path), str(wav_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
+    if is_whole_file(start_sec, end_sec, window_sec) and should_stream(file_path):
+        zcrs = [(f"Window {i+1}", zcr) for i, zcr in enumerate(stream_features(file_path, ["zcr"], windows)["zcr"])]
     else:
-        wav_path = input_file_path
-
-    signal, sample_rate = open_audio(str(wav_path))
-
-    if signal.ndim == 2:
-        signal = signal.mean(axis=1)
-
-    # Divide into 10 time windows
-    segments = np.array_split(signal, 30)
-    zcrs = []
-    for i, segment in enumerate(segments):
-        zero_crossings = np.sum(np.diff(np.sign(segment)) != 0)
-        zcr = zero_crossings / len(segment)
-        zcrs.append((f"Window {i+1}", zcr))
+        signal, sample_rate, bounds, labels = load_frames(file_path, start_sec, end_sec, windows, window_sec, hop_sec)
+        zcrs = list(zip(labels, [dsp.zero_crossing_rate(segment) for segment in frames(signal, bounds)]))
 
     df = pd.DataFrame(zcrs, columns=["Time Window", "ZCR"])
     return df.to_csv(index=False, float_format="%.5f")
 
-def autocorrelation(file_path: str, top_n: int = 5, segments: int = 10) -> str:
+def autocorrelation(file_path: str, top_n: int = 5, segments: int = 10, max_lag_sec: float = 1.0) -> str:
     """
     Computes normalized autocorrelation on segmented audio to identify repeating patterns.
 
@@ -414,99 +324,71 @@ def autocorrelation(file_path: str, top_n: int = 5, segments: int = 10) -> str:
         file_path: Path to the input audio file (.mp3/.m4a/.wav)
         top_n: Number of top peaks to return per segment
         segments: Number of segments to divide the signal into
+        max_lag_sec: Longest lag to search for periodicity, in seconds (default: 1.0)
 
     Returns:
-        CSV string: segment label, top lag (samples), strength
+        CSV string: segment label, peak lag (samples), strength. Peaks are the most prominent
+        local maxima of the autocorrelation, so neighbouring lags of the same peak are not repeated.
     """
 
-    input_file_path = Path(file_path)
+    signal, sample_rate = load_audio(file_path, mono=True)
 
-    # Convert to WAV if needed
-    if input_file_path.suffix.lower() != ".wav":
-        wav_path = input_file_path.with_suffix(".wav")
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', str(input_file_path), str(wav_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
-    else:
-        wav_path = input_file_path
-
-    signal, _ = open_audio(str(wav_path))
-    if signal.ndim == 2:
-        signal = signal.mean(axis=1)
-
-    signal -= np.mean(signal)
+    signal = signal - np.mean(signal)
     parts = np.array_split(signal, segments)
+    max_lag = int(max_lag_sec * sample_rate)
 
     results = []
     for i, part in enumerate(parts):
-        corr = np.correlate(part, part, mode='full')
-        mid = len(corr) // 2
-        norm_corr = corr[mid:] / np.max(corr)
+        # FFT-based autocorrelation up to max_lag
+        norm_corr = autocorrelation_fft(part, max_lag=max_lag)
 
-        lags = np.arange(1, len(norm_corr))
-        strengths = norm_corr[1:]
+        # Find top N local maxima beyond lag=0, reported in lag order
+        top_lags = np.sort(top_peaks(norm_corr, top_n))
 
-        # Find top N peaks beyond lag=0
-        top_indices = np.argpartition(strengths, -top_n)[-top_n:]
-        top_lags = lags[top_indices]
-        top_strengths = strengths[top_indices]
-
-        sorted_indices = np.argsort(top_lags)
-        top_lags = top_lags[sorted_indices]
-        top_strengths = top_strengths[sorted_indices]
-
-        for lag, strength in zip(top_lags, top_strengths):
-            results.append((f"Segment {i+1}", lag, strength))
+        for lag in top_lags:
+            results.append((f"Segment {i+1}", lag, norm_corr[lag]))
 
     df = pd.DataFrame(results, columns=["Segment", "Lag (samples)", "Autocorrelation"])
     return df.to_csv(index=False, float_format="%.5f")
 
-def envelope_decay(file_path: str) -> str:
+def envelope_decay(file_path: str, start_sec: float = 0, end_sec: float = None, windows: int = 30,
+                   window_sec: float = None, hop_sec: float = None) -> str:
     """
     Computes the amplitude envelope and decay rate of a mono audio signal using the Hilbert transform.
 
     Args:
         file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        windows: Number of equal time windows over the range (default: 30).
+        window_sec: Window length in seconds; overrides windows when given.
+        hop_sec: Step between window starts in seconds (default: window_sec, no overlap).
 
     Returns:
-        CSV string with envelope peak values in 10 segments and the overall decay rate.
+        CSV string with the mean envelope amplitude per window and the overall decay rate.
     """
 
-    input_file_path = Path(file_path)
-
-    # Convert to WAV if needed
-    if input_file_path.suffix.lower() != ".wav":
-        wav_path = input_file_path.with_suffix(".wav")
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', str(input_file_path), str(wav_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
+    if is_whole_file(start_sec, end_sec, window_sec) and should_stream(file_path):
+        # Block-wise Hilbert transform keeps memory bounded on long recordings
+        streamed = stream_features(file_path, ["envelope"], windows)
+        segment_means = list(streamed["envelope"])
+        decay_rate = streamed["decay_rate"]
+        labels = [f"Window {i+1}" for i in range(windows)]
     else:
-        wav_path = input_file_path
+        signal, sample_rate, bounds, labels = load_frames(file_path, start_sec, end_sec, windows, window_sec, hop_sec)
 
-    signal, sample_rate = open_audio(str(wav_path))
+        # Compute analytic signal and envelope
+        analytic_signal = hilbert(signal)
+        envelope = np.abs(analytic_signal)
 
-    if signal.ndim == 2:
-        signal = signal.mean(axis=1)
+        # Mean amplitude per window
+        segment_means = [np.mean(seg) for seg in frames(envelope, bounds)]
 
-    # Compute analytic signal and envelope
-    analytic_signal = hilbert(signal)
-    envelope = np.abs(analytic_signal)
-
-    # Break envelope into 10 windows, calculate mean amplitude per window
-    segments = np.array_split(envelope, 30)
-    segment_means = [np.mean(seg) for seg in segments]
-
-    # Estimate decay rate: (start - end) / num_samples
-    decay_rate = (segment_means[0] - segment_means[-1]) / len(signal)
+        # Estimate decay rate: (start - end) / num_samples
+        decay_rate = (segment_means[0] - segment_means[-1]) / len(signal)
 
     df = pd.DataFrame({
-        "Segment": [f"Window {i+1}" for i in range(30)],
+        "Segment": labels,
         "Mean Amplitude": segment_means
     })
 
@@ -514,7 +396,8 @@ def envelope_decay(file_path: str) -> str:
 
     return df.to_csv(index=False, float_format="%.5f")
 
-def spectral_flatness(file_path: str) -> str:
+def spectral_flatness(file_path: str, start_sec: float = 0, end_sec: float = None, windows: int = 30,
+                      window_sec: float = None, hop_sec: float = None) -> str:
     """
     Computes the spectral flatness of the audio signal across multiple time windows.
 
@@ -522,149 +405,276 @@ def spectral_flatness(file_path: str) -> str:
 
     Args:
         file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        windows: Number of equal time windows over the range (default: 30).
+        window_sec: Window length in seconds; overrides windows when given.
+        hop_sec: Step between window starts in seconds (default: window_sec, no overlap).
 
     Returns:
         CSV string with one row per time segment, containing flatness values.
     """
 
-    input_file_path = Path(file_path)
-
-    # Convert to WAV if needed
-    if input_file_path.suffix.lower() != ".wav":
-        wav_path = input_file_path.with_suffix(".wav")
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', str(input_file_path), str(wav_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
+    if is_whole_file(start_sec, end_sec, window_sec) and should_stream(file_path):
+        # Long recording: read from disk one window at a time
+        flatness = stream_features(file_path, ["flatness"], windows)["flatness"]
+        flatness_scores = [(f"Window {i+1}", value) for i, value in enumerate(flatness)]
     else:
-        wav_path = input_file_path
-
-    signal, sample_rate = open_audio(str(wav_path))
-
-    if signal.ndim == 2:
-        signal = signal.mean(axis=1)
-
-    # Split into 10 segments
-    segments = np.array_split(signal, 30)
-    flatness_scores = []
-
-    for i, segment in enumerate(segments):
-        spectrum = np.fft.fft(segment)
-        power = np.abs(spectrum) ** 2 + 1e-12  # avoid log(0)
-        geom_mean = np.exp(np.mean(np.log(power)))
-        arith_mean = np.mean(power)
-        flatness = geom_mean / arith_mean
-        flatness_scores.append((f"Window {i+1}", flatness))
+        signal, sample_rate, bounds, labels = load_frames(file_path, start_sec, end_sec, windows, window_sec, hop_sec)
+        flatness_scores = list(zip(labels, map_windows(dsp.spectral_flatness, signal, bounds)))
 
     df = pd.DataFrame(flatness_scores, columns=["Segment", "Spectral Flatness"])
     return df.to_csv(index=False, float_format="%.5f")
 
-def fractal_dimension(file_path: str) -> str:
+def fractal_dimension(file_path: str, start_sec: float = 0, end_sec: float = None, windows: int = 30,
+                      window_sec: float = None, hop_sec: float = None) -> str:
     """
     Estimates the fractal dimension of an audio waveform using the Higuchi method.
 
     Args:
         file_path: Path to the input audio file (e.g., .m4a or .mp3)
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        windows: Number of equal time windows over the range (default: 30).
+        window_sec: Window length in seconds; overrides windows when given.
+        hop_sec: Step between window starts in seconds (default: window_sec, no overlap).
 
     Returns:
-        CSV string with estimated fractal dimension for the full waveform and for each of 10 windows.
-    """
-
-    def higuchi_fd(x, kmax):
-        L = []
-        x = np.asarray(x)
-        N = len(x)
-
-        for k in range(1, kmax+1):
-            Lk = []
-            for m in range(k):
-                idxs = np.arange(1, int(np.floor((N - m) / k)), dtype=int)
-                Lmk = np.sum(np.abs(x[m + idxs * k] - x[m + (idxs - 1) * k]))
-                Lmk *= (N - 1) / (len(idxs) * k)
-                Lk.append(Lmk)
-            L.append(np.mean(Lk))
-
-        lnL = np.log(L)
-        lnk = np.log(1.0 / np.arange(1, kmax+1))
-        coeffs = np.polyfit(lnk, lnL, 1)
-        return coeffs[0]  # slope = fractal dimension estimate
-
-    input_file_path = Path(file_path)
-
-    # Convert to WAV if needed
-    if input_file_path.suffix.lower() != ".wav":
-        wav_path = input_file_path.with_suffix(".wav")
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', str(input_file_path), str(wav_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
-    else:
-        wav_path = input_file_path
-
-    signal, _ = open_audio(str(wav_path))
-    if signal.ndim == 2:
-        signal = signal.mean(axis=1)
+        CSV string with estimated fractal dimension for each window and for the whole range.
+    """
 
-    segments = np.array_split(signal, 30)
-    dimensions = [higuchi_fd(seg, kmax=10) for seg in segments]
-    overall = higuchi_fd(signal, kmax=30)
+    if is_whole_file(start_sec, end_sec, window_sec) and should_stream(file_path):
+        # Long recording: read from disk one window at a time
+        streamed = stream_features(file_path, ["fractal"], windows, fractal_max_samples=FRACTAL_MAX_SAMPLES)
+        labels = [f"Window {i+1}" for i in range(windows)]
+        dimensions, overall = list(streamed["fractal"]), streamed["fractal_overall"]
+    else:
+        signal, _, bounds, labels = load_frames(file_path, start_sec, end_sec, windows, window_sec, hop_sec)
+        dimensions = map_windows(dsp.higuchi_fd, signal, bounds, kmax=10)
+        overall = dsp.higuchi_fd(signal, kmax=30, max_samples=FRACTAL_MAX_SAMPLES)
 
     df = pd.DataFrame({
-        "Segment": [f"Window {i+1}" for i in range(30)] + ["Overall"], 
+        "Segment": labels + ["Overall"], 
         "Fractal Dimension": dimensions + [overall]
     })
 
     return df.to_csv(index=False, float_format="%.5f")
 
-def shannon_entropy(file_path: str) -> str:
+def shannon_entropy(file_path: str, start_sec: float = 0, end_sec: float = None, windows: int = 30,
+                    window_sec: float = None, hop_sec: float = None) -> str:
     """
-    Computes Shannon entropy of the audio waveform over 10 segments.
+    Computes Shannon entropy of the audio waveform per time window.
 
     Args:
         file_path: Path to the input audio file (e.g., .m4a or .mp3)
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        windows: Number of equal time windows over the range (default: 30).
+        window_sec: Window length in seconds; overrides windows when given.
+        hop_sec: Step between window starts in seconds (default: window_sec, no overlap).
 
     Returns:
         CSV string with Shannon entropy per segment and overall.
     """
 
-    def compute_entropy(segment, bins=64):
-        hist, _ = np.histogram(segment, bins=bins, density=True)
-        hist = hist[hist > 0]  # Remove zero entries to avoid log(0)
-        return -np.sum(hist * np.log2(hist))
-
-    input_file_path = Path(file_path)
-
-    if input_file_path.suffix.lower() != ".wav":
-        wav_path = input_file_path.with_suffix(".wav")
-        subprocess.run(
-            ['ffmpeg', '-y', '-i', str(input_file_path), str(wav_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
+    if is_whole_file(start_sec, end_sec, window_sec) and should_stream(file_path):
+        streamed = stream_features(file_path, ["entropy"], windows)
+        entropies = list(streamed["entropy"])
+        overall = streamed["entropy_overall"]
+        labels = [f"Window {i+1}" for i in range(windows)]
     else:
-        wav_path = input_file_path
-
-    signal, _ = open_audio(str(wav_path))
-    if signal.ndim == 2:
-        signal = signal.mean(axis=1)
+        signal, _, bounds, labels = load_frames(file_path, start_sec, end_sec, windows, window_sec, hop_sec)
 
-    segments = np.array_split(signal, 30)
-    entropies = [compute_entropy(seg) for seg in segments]
-    overall = compute_entropy(signal)
+        entropies = map_windows(dsp.shannon_entropy, signal, bounds)
+        overall = dsp.shannon_entropy(signal)
 
     df = pd.DataFrame({
-        "Segment": [f"Window {i+1}" for i in range(30)] + ["Overall"],
+        "Segment": labels + ["Overall"],
         "Shannon Entropy": entropies + [overall]
     })
 
     return df.to_csv(index=False, float_format="%.5f")
 
 
+# Descriptors available to analyze_features, in column order
+FEATURE_COLUMNS = {
+    "zcr": "ZCR",
+    "envelope": "Mean Amplitude",
+    "flatness": "Spectral Flatness",
+    "fractal": "Fractal Dimension",
+    "entropy": "Shannon Entropy",
+}
+
+def analyze_features(file_path: str, features: str = "all", start_sec: float = 0, end_sec: float = None,
+                     windows: int = 30, window_sec: float = None, hop_sec: float = None) -> str:
+    """
+    Computes several waveform descriptors in one pass over the audio: the file is decoded
+    once and split into the same windows used by the individual tools, so this is much
+    cheaper than calling zero_crossing_rate, envelope_decay, spectral_flatness,
+    fractal_dimension and shannon_entropy one after another.
+
+    Args:
+        file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        features: Comma-separated subset of "zcr", "envelope", "flatness", "fractal" and
+            "entropy", or "all" (default: "all").
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        windows: Number of equal time windows over the range (default: 30).
+        window_sec: Window length in seconds; overrides windows when given.
+        hop_sec: Step between window starts in seconds (default: window_sec, no overlap).
+
+    Returns:
+        CSV string with one row per time window and one column per descriptor, followed by
+        an "Overall" row (fractal dimension and entropy of the whole range) and a
+        "Decay Rate" row (envelope decay rate).
+    """
+
+    if features.strip().lower() == "all":
+        selected = list(FEATURE_COLUMNS)
+    else:
+        selected = [name.strip().lower() for name in features.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in FEATURE_COLUMNS]
+        if unknown or not selected:
+            return f"Unknown features: {', '.join(unknown) or features}. Choose from: {', '.join(FEATURE_COLUMNS)}, all."
+        selected = [name for name in FEATURE_COLUMNS if name in selected]
+
+    columns = {}
+    overall = {}
+    decay_rate = None
+
+    if is_whole_file(start_sec, end_sec, window_sec) and should_stream(file_path):
+        # Long recording: one streaming run reading the file from disk
+        streamed = stream_features(file_path, selected, windows, fractal_max_samples=FRACTAL_MAX_SAMPLES)
+        labels = [f"Window {i+1}" for i in range(windows)]
+        for name in selected:
+            columns[name] = list(streamed[name])
+        if "fractal" in selected:
+            overall["fractal"] = streamed["fractal_overall"]
+        if "entropy" in selected:
+            overall["entropy"] = streamed["entropy_overall"]
+        if "envelope" in selected:
+            decay_rate = streamed["decay_rate"]
+    else:
+        signal, _, bounds, labels = load_frames(file_path, start_sec, end_sec, windows, window_sec, hop_sec)
+
+        if "zcr" in selected:
+            columns["zcr"] = [dsp.zero_crossing_rate(seg) for seg in frames(signal, bounds)]
+        if "envelope" in selected:
+            envelope = np.abs(hilbert(signal))
+            columns["envelope"] = [np.mean(seg) for seg in frames(envelope, bounds)]
+            decay_rate = (columns["envelope"][0] - columns["envelope"][-1]) / len(signal)
+        if "flatness" in selected:
+            columns["flatness"] = map_windows(dsp.spectral_flatness, signal, bounds)
+        if "fractal" in selected:
+            columns["fractal"] = map_windows(dsp.higuchi_fd, signal, bounds, kmax=10)
+            overall["fractal"] = dsp.higuchi_fd(signal, kmax=30, max_samples=FRACTAL_MAX_SAMPLES)
+        if "entropy" in selected:
+            columns["entropy"] = map_windows(dsp.shannon_entropy, signal, bounds)
+            overall["entropy"] = dsp.shannon_entropy(signal)
+
+    df = pd.DataFrame({"Segment": labels})
+    for name in selected:
+        df[FEATURE_COLUMNS[name]] = columns[name]
+
+    if overall:
+        df.loc[len(df.index)] = ["Overall"] + [overall.get(name, np.nan) for name in selected]
+    if decay_rate is not None:
+        df.loc[len(df.index)] = ["Decay Rate"] + [decay_rate if name == "envelope" else np.nan
+                                                  for name in selected]
+
+    return df.to_csv(index=False, float_format="%.5f")
+
+
+def spectral_peaks(file_path: str, cutoff_lo: float = 0, cutoff_hi: float = None, start_sec: float = 0,
+                   end_sec: float = None, max_peaks: int = 12, min_prominence_db: float = 6.0,
+                   windows: int = 10) -> str:
+    """
+    Finds the prominent spectral peaks of an audio file and groups them into harmonic
+    series, in one call. Uses a high-resolution averaged (Welch) spectrum of the range,
+    so peaks are located to a few Hz, and checks in which of `windows` equal time windows
+    each peak is present. Use this instead of many zoomed fft calls to locate tones and
+    harmonic ladders (e.g. motors, hum, alarms, birdsong).
+
+    Args:
+        file_path: Path to the input audio file (e.g., .m4a or .mp3).
+        cutoff_lo: Lowest peak frequency reported (in Hz, default: 0).
+        cutoff_hi: Highest peak frequency reported (in Hz, None = Nyquist).
+        start_sec: Start time of the range to analyze (in seconds, default: 0).
+        end_sec: End time of the range to analyze (in seconds, None = end of file).
+        max_peaks: Maximum number of peaks, most prominent first (default: 12).
+        min_prominence_db: Smallest rise of a peak above its surroundings (in dB, default: 6).
+        windows: Number of equal time windows used to measure persistence (default: 10).
+
+    Returns:
+        CSV string with one row per peak, in frequency order: frequency, level (dB),
+        prominence (dB), bandwidth (Hz, width at half the prominence), persistence
+        (fraction of time windows in which the peak is present), the time range
+        between its first and last window, and its harmonic series, e.g. "S1 x3" for the
+        3rd harmonic of series S1. Followed by one "Series" row per harmonic series with
+        its fundamental (which may itself be missing from the peaks).
+    """
+    if is_whole_file(start_sec, end_sec) and should_stream(file_path):
+        # Long recording: one window at a time from the memory-mapped WAV
+        duration = probe_duration(file_path)
+        edges = np.linspace(0, duration, windows + 1)
+        spectra = []
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            window, sample_rate, _ = load_window(file_path, lo, hi, mono=True)
+            frequency, psd, _ = dsp.welch_spectrogram(window, sample_rate, ([0], [len(window)]),
+                                                      nperseg=PEAK_NPERSEG, workers=fft_workers())
+            spectra.append(psd[0])
+        psd = np.array(spectra)
+        end_sec = duration
+    else:
+        signal, sample_rate, end_sec = load_window(file_path, start_sec, end_sec, mono=True)
+        bounds = frame_bounds(len(signal), sample_rate, windows)
+        frequency, psd, _ = dsp.welch_spectrogram(signal, sample_rate, bounds, nperseg=PEAK_NPERSEG,
+                                                  workers=fft_workers())
+
+    # The averaged spectrum of the whole range is the mean of the equal windows
+    average = psd.mean(axis=0)
+    freq_range = (cutoff_lo, cutoff_hi if cutoff_hi is not None else frequency[-1])
+    peaks, prominence, bandwidth = dsp.spectral_peaks(frequency, average, max_peaks, min_prominence_db, freq_range)
+    if len(peaks) == 0:
+        return "No spectral peaks found."
+
+    present = dsp.peak_persistence(psd, peaks, threshold_db=min_prominence_db / 2)
+    edges = np.linspace(start_sec, end_sec, len(psd) + 1)
+    resolution = frequency[1] - frequency[0]
+    series = dsp.harmonic_series(frequency[peaks], resolution=resolution)
+
+    harmonic_of = [""] * len(peaks)
+    for s, (_, numbers, matched) in enumerate(series):
+        for n, i in zip(numbers, matched):
+            harmonic_of[i] = f"S{s+1} x{n}"
+
+    rows = []
+    for i, peak in enumerate(peaks):
+        seen = np.flatnonzero(present[:, i])
+        time_range = f"{edges[seen[0]]:.2f}-{edges[seen[-1] + 1]:.2f}sec" if len(seen) else ""
+        rows.append([f"{frequency[peak]:.1f}", f"{10 * np.log10(average[peak] + 1e-20):.1f}",
+                     f"{prominence[i]:.1f}", f"{bandwidth[i]:.1f}", f"{present[:, i].mean():.2f}",
+                     time_range, harmonic_of[i]])
+    for s, (fundamental, numbers, _) in enumerate(series):
+        rows.append([f"{fundamental:.1f}", "", "", "", "", "", f"S{s+1} fundamental ({len(numbers)} harmonics)"])
+
+    df = pd.DataFrame(rows, columns=["Frequency (Hz)", "Level (dB)", "Prominence (dB)", "Bandwidth (Hz)",
+                                     "Persistence", "Time Range", "Harmonic"])
+    return df.to_csv(index=False)
+
+
+def agent_output_path(file_name):
+    """
+    Path of the JSON prediction saved for an input audio file.
+
+    Args:
+        file_name (str): Path to the input audio file (e.g. data/audio1.mp3)
+
+    Returns: output_path (str)
+    """
+    base_name = os.path.basename(file_name).replace(".m4a", ".json").replace(".mp3", ".json")
+    return os.path.join("outputs", base_name)
+
 def save_agent_output(file_name, source_types):
     """
     Save agent output in the required JSON format for evaluation.
@@ -684,8 +694,7 @@ def save_agent_output(file_name, source_types):
 
     os.makedirs("outputs", exist_ok=True)
 
-    base_name = os.path.basename(file_name).replace(".m4a", ".json").replace(".mp3", ".json")
-    out_path = os.path.join("outputs", base_name)
+    out_path = agent_output_path(file_name)
 
     with open(out_path, "w") as f:
         json.dump(output, f, indent=2)
@@ -707,47 +716,35 @@ def record_audio(duration=10, sample_rate=44100, channels=1, format=pyaudio.paIn
     Returns:
         Path to the recorded audio file
     """
-    # Create a unique filename
-    filename = f"recording_{uuid.uuid4().hex[0:6]}.wav"
-    filepath = os.path.join("tmp", filename)
-    
-    # Initialize PyAudio
-    p = pyaudio.PyAudio()
-    
-    # Open stream
-    stream = p.open(
-        format=format,
-        channels=channels,
-        rate=sample_rate,
-        input=True,
-        frames_per_buffer=chunk
-    )
-    
+    recorder = Recorder(duration, sample_rate=sample_rate, channels=channels, chunk=chunk, format=format)
+
     print(f"Recording for {duration} seconds...")
-    
-    # Record audio
-    frames = []
-    for i in range(0, int(sample_rate / chunk * duration)):
-        data = stream.read(chunk)
-        frames.append(data)
-    
+    filepath = recorder.record()
     print("Recording finished.")
-    
-    # Stop and close the stream
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-    
-    # Save the recorded audio to a WAV file
-    wf = wave.open(filepath, 'wb')
-    wf.setnchannels(channels)
-    wf.setsampwidth(p.get_sample_size(format))
-    wf.setframerate(sample_rate)
-    wf.writeframes(b''.join(frames))
-    wf.close()
-    
+
     return filepath
 
+async def record_audio_async(duration=10, sample_rate=44100, channels=1, format=pyaudio.paInt16, chunk=1024,
+                             source=None):
+    """
+    Awaitable version of record_audio: the microphone callback fills a preallocated buffer
+    that is appended to the WAV file as it arrives, so other tasks keep running meanwhile.
+
+    Args:
+        duration: Recording duration in seconds (default: 10)
+        sample_rate: Sample rate in Hz (default: 44100)
+        channels: Number of audio channels (default: 1 for mono)
+        format: Audio format (default: 16-bit PCM)
+        chunk: Number of frames per buffer (default: 1024)
+        source: Optional WAV file to play in real time instead of the microphone
+
+    Returns:
+        Path to the recorded audio file
+    """
+    recorder = Recorder(duration, sample_rate=sample_rate, channels=channels, chunk=chunk, format=format,
+                        source=source)
+    return await recorder.record_async()
+
 if __name__ == "__main__":
     # Example usage
     csv_str = fft("data/hamilton_ave.m4a", cutoff_lo=0, cutoff_hi=2000, start_sec=0, end_sec=20, time_bins=10, freq_bins=20)
@@ -0,0 +1,366 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+import wave
+import numpy as np
+from audio_io import map_wav, pcm_to_float
+from detection import OFF_RATIO, ON_RATIO, EventDetector, band_energies, band_layout
+
+# Samples per microphone callback; detection latency is one block (~46 ms at 44.1 kHz)
+MONITOR_BLOCK_SIZE = int(os.getenv("MONITOR_BLOCK_SIZE", "2048"))
+
+# Seconds of audio before a trigger that are included in the captured clip
+MONITOR_PREROLL_SEC = float(os.getenv("MONITOR_PREROLL_SEC", "5"))
+
+
+class RingBuffer:
+    """
+    Fixed-size float32 buffer holding the most recent samples of a stream. Positions
+    are absolute sample counts since the stream started.
+    """
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.written = 0
+        self._lock = threading.Lock()
+
+    def write(self, block):
+        """
+        Appends a block, overwriting the oldest samples once the buffer is full.
+        """
+        skipped = max(len(block) - self.capacity, 0)
+        block = block[skipped:]
+        with self._lock:
+            start = (self.written + skipped) % self.capacity
+            first = min(len(block), self.capacity - start)
+            self.data[start:start + first] = block[:first]
+            self.data[:len(block) - first] = block[first:]
+            self.written += skipped + len(block)
+
+    def read(self, start, end):
+        """
+        Copies the samples between two absolute positions.
+
+        Args:
+            start: First position to read.
+            end: Position to stop before.
+
+        Returns:
+            float32 array of the samples.
+
+        Raises:
+            ValueError: If part of the range has not been written yet or was already overwritten.
+        """
+        with self._lock:
+            if start < self.written - self.capacity or end > self.written or start > end:
+                raise ValueError(f"Samples {start}-{end} are not in the buffer "
+                                 f"(holds {max(self.written - self.capacity, 0)}-{self.written})")
+            index = np.arange(start, end) % self.capacity
+            return self.data[index]
+
+
+class SpectralMonitor:
+    """
+    Tracks the band energies of a live audio stream block by block and flags event
+    onsets with an EventDetector (adaptive per-band noise floor, spectral flux and
+    hysteresis). Every sample is kept in a ring buffer, so there are no gaps between
+    checks and triggered clips can be cut from memory.
+    """
+
+    def __init__(self, sample_rate=44100, block_size=MONITOR_BLOCK_SIZE, freq_range=(0, 2000), bands=8,
+                 threshold=ON_RATIO, release=OFF_RATIO, floor_sec=10, buffer_sec=60):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.bands = bands
+        self.buffer = RingBuffer(int(buffer_sec * sample_rate))
+
+        self._layout = band_layout(sample_rate, block_size, freq_range, bands)
+        self.detector = EventDetector(block_size / sample_rate, floor_sec=floor_sec, on_ratio=threshold,
+                                      off_ratio=release)
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples):
+        """
+        Feeds new samples to the monitor. They are buffered and analyzed in complete blocks.
+
+        Args:
+            samples: 1-D float32 mono samples.
+
+        Returns:
+            List of onset events, each a dict with position, time_sec, energy, ratio
+            (level relative to the noise floor) and flux.
+        """
+        self.buffer.write(samples)
+        pending = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        position = self.buffer.written - len(pending)
+
+        events = []
+        usable = len(pending) // self.block_size * self.block_size
+        for start in range(0, usable, self.block_size):
+            event = self._process_block(pending[start:start + self.block_size], position + start)
+            if event:
+                events.append(event)
+        self._pending = pending[usable:].copy()
+        return events
+
+    def _process_block(self, block, position):
+        energies = band_energies(block, self._layout, self.bands)
+
+        # Only the first block of an event is reported
+        if self.detector.update(energies) == "onset":
+            return {"position": position, "time_sec": position / self.sample_rate,
+                    "energy": float(energies.sum()), "ratio": self.detector.level,
+                    "flux": self.detector.flux}
+        return None
+
+    def callback(self, on_event, channels=1):
+        """
+        Builds an input-stream callback that decodes 16-bit PCM bytes and feeds them
+        to the monitor. It runs on the audio thread, so on_event must be thread-safe
+        (e.g. loop.call_soon_threadsafe).
+
+        Args:
+            on_event: Called with each onset event.
+            channels: Interleaved channels in the input (downmixed to mono).
+
+        Returns:
+            Function taking the raw bytes of one callback buffer.
+        """
+        def feed(in_data):
+            samples = np.frombuffer(in_data, dtype=np.int16).astype(np.float32) / 2 ** 15
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            for event in self.process(samples):
+                on_event(event)
+        return feed
+
+    def capture(self, event, duration_sec, preroll_sec=MONITOR_PREROLL_SEC):
+        """
+        Assembles a triggered clip from the ring buffer: up to preroll_sec seconds
+        before the onset (less if the stream started more recently) followed by
+        duration_sec seconds after it, or as much of that as has arrived.
+
+        Args:
+            event: Onset event from process().
+            duration_sec: Seconds to keep after the onset.
+            preroll_sec: Seconds to keep before the onset.
+
+        Returns:
+            Tuple of (clip, trigger_offset) where trigger_offset is the onset's sample index in the clip.
+
+        Raises:
+            ValueError: If the onset is no longer in the buffer.
+        """
+        position = event["position"]
+        start = max(position - int(preroll_sec * self.sample_rate), self.buffer.written - self.buffer.capacity, 0)
+        end = min(position + int(duration_sec * self.sample_rate), self.buffer.written)
+        return self.buffer.read(min(start, position), end), position - min(start, position)
+
+
+class FileInputStream:
+    """
+    Stand-in for a PyAudio input stream that plays a WAV file into a callback, block
+    by block, as 16-bit PCM bytes. Used to exercise the monitor without a microphone.
+    """
+
+    def __init__(self, wav_path, callback, block_size=MONITOR_BLOCK_SIZE, realtime=False):
+        frames, self.sample_rate = map_wav(wav_path)
+        self.channels = frames.shape[1]
+        self.sample_width = 2
+        self._frames = frames
+        self._callback = callback
+        self._block_size = block_size
+        self._realtime = realtime
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        started = time.monotonic()
+        for position in range(0, len(self._frames), self._block_size):
+            if self._stop.is_set():
+                return
+            block = pcm_to_float(self._frames[position:position + self._block_size])
+            pcm = np.clip(block * 2 ** 15, -2 ** 15, 2 ** 15 - 1).astype(np.int16)
+            self._callback(pcm.tobytes())
+            if self._realtime:
+                # Pace delivery like a live device
+                delay = started + (position + len(block)) / self.sample_rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start_stream(self):
+        self._thread.start()
+
+    def is_active(self):
+        return self._thread.is_alive()
+
+    def stop_stream(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+
+class MicrophoneStream:
+    """
+    Callback-driven PyAudio input stream from the default microphone, with the same
+    interface as FileInputStream.
+    """
+
+    def __init__(self, callback, sample_rate=44100, channels=1, block_size=MONITOR_BLOCK_SIZE, format=None):
+        import pyaudio
+
+        format = format or pyaudio.paInt16
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = pyaudio.get_sample_size(format)
+        self._audio = pyaudio.PyAudio()
+
+        def stream_callback(in_data, frame_count, time_info, status):
+            callback(in_data)
+            return None, pyaudio.paContinue
+
+        self._stream = self._audio.open(format=format, channels=channels, rate=sample_rate,
+                                        input=True, frames_per_buffer=block_size,
+                                        stream_callback=stream_callback, start=False)
+
+    def start_stream(self):
+        self._stream.start_stream()
+
+    def is_active(self):
+        return self._stream.is_active()
+
+    def stop_stream(self):
+        self._stream.stop_stream()
+
+    def close(self):
+        self._stream.close()
+        self._audio.terminate()
+
+
+def open_input_stream(callback, sample_rate=44100, channels=1, block_size=MONITOR_BLOCK_SIZE, source=None,
+                      format=None):
+    """
+    Opens a callback-driven input stream: the default microphone, or a WAV file
+    played in real time through FileInputStream when source is given.
+
+    Args:
+        callback: Function taking the raw PCM bytes of each block.
+        sample_rate: Microphone sample rate in Hz (ignored for file sources).
+        channels: Microphone channels (ignored for file sources).
+        block_size: Frames per callback.
+        source: Optional WAV file to read instead of the microphone.
+        format: PyAudio sample format of the microphone (default: 16-bit PCM). File
+            sources are always delivered as 16-bit PCM.
+
+    Returns:
+        MicrophoneStream or FileInputStream; both expose sample_rate, channels and sample_width.
+    """
+    if source:
+        return FileInputStream(source, callback, block_size=block_size, realtime=True)
+    return MicrophoneStream(callback, sample_rate, channels, block_size, format)
+
+
+class Recorder:
+    """
+    Records a fixed duration from an input stream without blocking: the stream's
+    callback copies each block into a preallocated buffer, and the filled part is
+    appended to the WAV file while waiting, so the recording reaches disk
+    incrementally and no list of chunks is kept.
+    """
+
+    def __init__(self, duration, filepath=None, sample_rate=44100, channels=1, chunk=1024, format=None,
+                 source=None, flush_interval=0.5):
+        self.stream = open_input_stream(self._on_data, sample_rate, channels, chunk, source=source, format=format)
+        self.sample_rate = self.stream.sample_rate
+        self.channels = self.stream.channels
+        self.sample_width = self.stream.sample_width
+        self.flush_interval = flush_interval
+
+        self.buffer = np.empty(int(duration * self.sample_rate) * self.channels * self.sample_width, dtype=np.uint8)
+        self.filled = 0
+        self.done = threading.Event()
+        self._flushed = 0
+
+        self.filepath = filepath or os.path.join("tmp", f"recording_{uuid.uuid4().hex[0:6]}.wav")
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        self._wav = wave.open(self.filepath, 'wb')
+        self._wav.setnchannels(self.channels)
+        self._wav.setsampwidth(self.sample_width)
+        self._wav.setframerate(self.sample_rate)
+
+    def _on_data(self, in_data):
+        # Runs on the audio thread: copy into the buffer and return
+        data = np.frombuffer(in_data, dtype=np.uint8)[:len(self.buffer) - self.filled]
+        self.buffer[self.filled:self.filled + len(data)] = data
+        self.filled += len(data)
+        if self.filled >= len(self.buffer):
+            self.done.set()
+
+    def _finished(self):
+        return self.done.is_set() or not self.stream.is_active()
+
+    def flush(self):
+        """
+        Appends the samples received since the last flush to the WAV file.
+        """
+        filled = self.filled
+        self._wav.writeframes(self.buffer[self._flushed:filled].tobytes())
+        self._flushed = filled
+
+    def _finish(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.flush()
+        self._wav.close()
+        return self.filepath
+
+    def record(self):
+        """
+        Records until the buffer is full, blocking the calling thread.
+
+        Returns:
+            Path to the WAV file.
+        """
+        self.stream.start_stream()
+        while not self._finished():
+            self.done.wait(self.flush_interval)
+            self.flush()
+        return self._finish()
+
+    async def record_async(self):
+        """
+        Records until the buffer is full while letting the event loop run other tasks.
+
+        Returns:
+            Path to the WAV file.
+        """
+        self.stream.start_stream()
+        while not self._finished():
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+        return self._finish()
+
+
+def save_wav(signal, sample_rate, filepath=None):
+    """
+    Writes a mono float signal to a 16-bit WAV file (in tmp/ by default).
+
+    Returns:
+        Path to the written file.
+    """
+    if filepath is None:
+        filepath = os.path.join("tmp", f"recording_{uuid.uuid4().hex[0:6]}.wav")
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    pcm = np.clip(np.asarray(signal) * 2 ** 15, -2 ** 15, 2 ** 15 - 1).astype(np.int16)
+    with wave.open(filepath, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+    return filepath
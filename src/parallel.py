@@ -0,0 +1,102 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+# Worker count for per-window feature computation; 0 or 1 keeps it serial (the default)
+WORKERS = int(os.getenv("SIGNAL_WORKERS", "0"))
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _get_pool(kind):
+    """
+    Returns the shared thread or process pool, creating it on first use. Process
+    workers are spawned rather than forked, since the agent runs threads.
+    """
+    with _lock:
+        if kind not in _pools:
+            if kind == "process":
+                _pools[kind] = ProcessPoolExecutor(max_workers=WORKERS,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pools[kind] = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="signal-window")
+        return _pools[kind]
+
+
+def shutdown_pools():
+    """
+    Shuts down any worker pools started by map_windows.
+    """
+    with _lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+
+
+atexit.register(shutdown_pools)
+
+
+def fft_workers():
+    """
+    Returns the worker count to pass to batched scipy.fft calls.
+    """
+    return max(WORKERS, 1)
+
+
+def _run_shared(job):
+    """
+    Process-pool task: attaches to the shared signal and runs func on one window of it.
+    """
+    name, shape, dtype, lo, hi, func, kwargs = job
+    shm = shared_memory.SharedMemory(name=name)
+    signal = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        return func(signal[lo:hi], **kwargs)
+    finally:
+        del signal
+        shm.close()
+
+
+def map_windows(func, signal, bounds, kind="thread", **kwargs):
+    """
+    Applies func to each analysis window of a signal, in parallel when
+    SIGNAL_WORKERS is above 1. Threads suit NumPy-heavy functions that release the
+    GIL, which covers every per-window feature in dsp. Processes only pay off for
+    long Python-level loops: spawning the pool takes seconds and re-imports the
+    caller's __main__. They read the signal from one shared memory block instead of
+    receiving a pickled copy of each window.
+
+    Args:
+        func: Module-level function taking a 1-D segment (plus kwargs) and returning a value.
+        signal: 1-D signal.
+        bounds: Tuple of (starts, ends) from framing.frame_bounds.
+        kind: "thread" or "process".
+        **kwargs: Extra keyword arguments for func.
+
+    Returns:
+        List of func results in window order.
+    """
+    spans = list(zip(*bounds))
+
+    if WORKERS <= 1 or len(spans) < 2:
+        return [func(signal[lo:hi], **kwargs) for lo, hi in spans]
+
+    if kind == "thread":
+        return list(_get_pool("thread").map(lambda span: func(signal[span[0]:span[1]], **kwargs), spans))
+
+    signal = np.ascontiguousarray(signal)
+    shm = shared_memory.SharedMemory(create=True, size=max(signal.nbytes, 1))
+    shared = np.ndarray(signal.shape, dtype=signal.dtype, buffer=shm.buf)
+    try:
+        shared[:] = signal
+        jobs = [(shm.name, signal.shape, signal.dtype.str, lo, hi, func, kwargs) for lo, hi in spans]
+        return list(_get_pool("process").map(_run_shared, jobs))
+    finally:
+        del shared
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+from async_tools import analysis_tool, file_meta_data_async
+from audio_io import to_wav_async
+from functions import (
+    fft,
+    stereo_fft,
+    zero_crossing_rate,
+    autocorrelation,
+    envelope_decay,
+    spectral_flatness,
+    fractal_dimension,
+    shannon_entropy,
+    analyze_features,
+    spectral_peaks
+)
+
+# Largest number of steps accepted in one plan (override with MAX_PLAN_STEPS)
+MAX_PLAN_STEPS = int(os.getenv("MAX_PLAN_STEPS", "24"))
+
+# Tools a plan can run, prepared like the individual agent tools (they share one cache)
+PLAN_TOOLS = {fn.__name__: analysis_tool(fn) for fn in (
+    fft, stereo_fft, zero_crossing_rate, autocorrelation, envelope_decay, spectral_flatness,
+    fractal_dimension, shannon_entropy, analyze_features, spectral_peaks,
+)}
+PLAN_TOOLS["file_meta_data"] = file_meta_data_async
+
+
+async def _run_step(file_path, step):
+    """
+    Runs one plan step, returning its heading and result. Errors are reported in the
+    result so one bad step does not lose the rest of the plan.
+    """
+    step = dict(step)
+    name = step.pop("tool", None)
+    step.pop("file_path", None)
+    heading = f"{name}({', '.join(f'{k}={v}' for k, v in step.items())})"
+    if name not in PLAN_TOOLS:
+        return heading, f"Error: unknown tool. Use one of {', '.join(PLAN_TOOLS)}"
+    try:
+        return heading, await PLAN_TOOLS[name](file_path=file_path, **step)
+    except Exception as e:
+        return heading, f"Error: {type(e).__name__}: {e}"
+
+
+async def analysis_plan(file_path: str, steps: str) -> str:
+    """
+    Runs a batch of analysis steps on one audio file in a single call. The steps run
+    concurrently and their results are returned together, so use this instead of
+    separate calls whenever you already know which scans you want (e.g. broad fft
+    scans, several zoomed fft windows, and feature tools).
+
+    Args:
+        file_path: Path to the input audio file.
+        steps: JSON list of steps. Each step is an object with "tool" (fft, stereo_fft,
+            file_meta_data, zero_crossing_rate, autocorrelation, envelope_decay,
+            spectral_flatness, fractal_dimension, shannon_entropy, analyze_features or
+            spectral_peaks) and that tool's other arguments, e.g.
+            [{"tool": "fft", "cutoff_lo": 0, "cutoff_hi": 2000, "time_bins": 10},
+             {"tool": "fft", "cutoff_lo": 50, "cutoff_hi": 200, "start_sec": 5, "end_sec": 8},
+             {"tool": "analyze_features", "features": "zcr,flatness"}]
+
+    Returns:
+        The result of every step under a "### tool(arguments)" heading, in plan order.
+    """
+    try:
+        requests = json.loads(steps) if isinstance(steps, str) else steps
+    except json.JSONDecodeError as e:
+        return f"Error: steps is not valid JSON ({e})"
+    if isinstance(requests, dict):
+        requests = [requests]
+    if not isinstance(requests, list) or not all(isinstance(step, dict) for step in requests):
+        return "Error: steps must be a JSON list of objects"
+    if len(requests) > MAX_PLAN_STEPS:
+        return f"Error: a plan can have at most {MAX_PLAN_STEPS} steps"
+
+    # Decode once up front instead of in every step
+    await to_wav_async(file_path)
+    results = await asyncio.gather(*(_run_step(file_path, step) for step in requests))
+    return "\n\n".join(f"### {heading}\n{result}" for heading, result in results)
@@ -0,0 +1,48 @@
+import os
+from audio_io import to_wav
+from functions import fft, spectral_peaks, analyze_features
+from streaming import wav_info
+from tool_cache import cached_tool
+from encoding import compact_tool
+
+# Set PRE_ANALYSIS=0 to let the agent start from scratch instead of from the sweep
+PRE_ANALYSIS = os.getenv("PRE_ANALYSIS", "1") != "0"
+
+# The sweep goes through the same cache as the agent's tools, so repeating one of its
+# scans later is free
+_tools = {fn.__name__: cached_tool(fn) for fn in (fft, spectral_peaks, analyze_features)}
+_compact_tools = {name: compact_tool(tool) for name, tool in _tools.items()}
+
+
+def pre_analysis(file_path, encode=True):
+    """
+    Runs the deterministic first pass every analysis starts with, without the LLM:
+    file properties, a broad and a full-band spectrogram, the energy envelope,
+    spectral peaks with harmonic series, and the waveform feature summary.
+
+    Args:
+        file_path: Path to the input audio file.
+        encode: Re-encode the tables compactly, as the agent's tools do.
+
+    Returns:
+        Text with one titled section per result, to be added to the agent's query.
+    """
+    tools = _compact_tools if encode else _tools
+    n_frames, sample_rate, channels = wav_info(to_wav(file_path))
+    duration = n_frames / sample_rate
+    nyquist = sample_rate / 2
+
+    sections = [
+        ("File properties",
+         f"Duration: {duration:.2f} s, sample rate: {sample_rate} Hz, channels: {channels}, "
+         f"size: {os.path.getsize(file_path)} bytes"),
+        ("Broad spectrogram: fft(cutoff_lo=0, cutoff_hi=2000)",
+         tools["fft"](file_path, 0, min(2000, nyquist))),
+        (f"Full-band spectrogram: fft(cutoff_lo=0, cutoff_hi={nyquist:g}, freq_bins=10)",
+         tools["fft"](file_path, 0, nyquist, freq_bins=10)),
+        (f"Energy envelope: fft(cutoff_lo=0, cutoff_hi={nyquist:g}, time_bins=20, freq_bins=1)",
+         tools["fft"](file_path, 0, nyquist, time_bins=20, freq_bins=1)),
+        ("Spectral peaks and harmonic series: spectral_peaks()", tools["spectral_peaks"](file_path)),
+        ("Feature summary: analyze_features(windows=5)", tools["analyze_features"](file_path, windows=5)),
+    ]
+    return "\n\n".join(f"### {title}\n{body.strip()}" for title, body in sections)
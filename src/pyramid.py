@@ -0,0 +1,170 @@
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import audio_io
+from audio_io import content_hash, evict_decoded, map_wav, to_wav
+from streaming import BLOCK_SIZE, iter_blocks
+
+# STFT window sizes (in samples) of the pyramid levels, finest first
+PYRAMID_WINDOWS = tuple(int(w) for w in os.getenv("SIGNAL_PYRAMID_WINDOWS", "2048,16384,131072").split(","))
+
+# Set SIGNAL_PYRAMID=1 to answer fft from the pyramid. Its normalized bins are approximate
+# (within about 0.1 of the exact path), so fft computes from raw samples by default.
+# Each level takes 2 bytes of disk per mono sample of the clip (float32 power of half
+# the frame's bins), about 29 MB per level for 5 minutes at 48 kHz
+PYRAMID_ENABLED = os.getenv("SIGNAL_PYRAMID", "0") == "1"
+
+# A level is only used if every time window spans at least this many of its frames
+MIN_FRAMES_PER_WINDOW = 8
+
+# Target number of level frequency bins per requested frequency bin
+MIN_COLUMNS_PER_BIN = 2
+
+
+def _level_path(file_path, window):
+    return Path(audio_io.DECODE_CACHE_DIR) / f"{content_hash(file_path)[:32]}.stft{window}.f32.npy"
+
+
+@lru_cache(maxsize=16)
+def _open_level(path):
+    return np.load(path, mmap_mode='r')
+
+
+def build_level(file_path, window):
+    """
+    Computes one pyramid level: the float32 power spectra of consecutive non-overlapping
+    `window`-sample frames. The frames are read block by block from the memory-mapped
+    WAV and written straight to a memory-mapped .npy file, so building a level never
+    holds the clip or the level in memory. The file is written atomically next to the
+    decoded WAVs and shares their disk budget.
+
+    Args:
+        file_path: Path to the input audio file.
+        window: Frame length in samples (even).
+
+    Returns:
+        Path to the saved level.
+    """
+    path = _level_path(file_path, window)
+    wav_path = to_wav(file_path)
+    n_frames = len(map_wav(wav_path)[0]) // window
+    frames_per_block = max(BLOCK_SIZE // window, 1)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.parent / f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        # Drop the Nyquist bin, as fft() does for even-length windows
+        level = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(n_frames, window // 2))
+        blocks = iter_blocks(wav_path, block_size=frames_per_block * window, end_frame=n_frames * window)
+        for offset, block in blocks:
+            first = offset // window
+            frames = block.reshape(-1, window)
+            level[first:first + len(frames)] = np.abs(np.fft.rfft(frames, axis=1)[:, :window // 2]) ** 2
+        level.flush()
+        del level
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    evict_decoded(keep=path)
+    return path
+
+
+def _group_sums(values, edges, axis):
+    """
+    Sums `values` over the index ranges [edges[i], edges[i+1]) along one axis in float64;
+    empty ranges sum to 0.
+    """
+    values = np.moveaxis(values, axis, 0)
+    sums = np.zeros((len(edges) - 1,) + values.shape[1:])
+    nonempty = edges[:-1] < edges[1:]
+    if nonempty.any():
+        # Non-empty ranges are contiguous, so reduceat's "from each start to the next" matches them
+        sums[nonempty] = np.add.reduceat(values[:edges[-1]], edges[:-1][nonempty], axis=0, dtype=np.float64)
+    return np.moveaxis(sums, 0, axis)
+
+
+def choose_window(sample_rate, window_size, bin_width):
+    """
+    Picks the pyramid level for a query: the finest level that fits MIN_FRAMES_PER_WINDOW
+    frames into each time window and whose frequency resolution gives
+    MIN_COLUMNS_PER_BIN columns per requested bin.
+
+    Args:
+        sample_rate: Sample rate in Hz.
+        window_size: Samples per requested time window.
+        bin_width: Width of each requested frequency bin in Hz.
+
+    Returns:
+        Window size of the chosen level, or None if no level fits both resolutions.
+    """
+    candidates = sorted(w for w in PYRAMID_WINDOWS if w * MIN_FRAMES_PER_WINDOW <= window_size)
+    for window in candidates:
+        if sample_rate / window * MIN_COLUMNS_PER_BIN <= bin_width:
+            return window
+    return None
+
+
+def pyramid_spectrogram(file_path, cutoff_lo, cutoff_hi, start_sec=0, end_sec=None, time_bins=5,
+                        freq_bins=15):
+    """
+    Answers an fft() query from the closest precomputed pyramid level, building it
+    once if needed. Each cell sums the level's frame powers over the frames starting
+    in its time window and the columns in its frequency bin, rescaled by window
+    length so totals stay on the scale of a single full-window FFT. Only the part of
+    the memory-mapped level inside the query is read.
+
+    Args:
+        file_path: Path to the input audio file.
+        cutoff_lo: Lower bound of the frequency range (in Hz).
+        cutoff_hi: Upper bound of the frequency range (in Hz).
+        start_sec: Start time in seconds.
+        end_sec: End time in seconds (None = full duration).
+        time_bins: Number of equal-width time windows.
+        freq_bins: Number of equal-width frequency bins.
+
+    Returns:
+        Tuple of (binned_power, end_sec) with binned_power of shape (time_bins, freq_bins),
+        or None if the pyramid is disabled or no level is fine enough for the query.
+    """
+    if not PYRAMID_ENABLED:
+        return None
+
+    frames, sample_rate = map_wav(to_wav(file_path))
+    n_samples = len(frames)
+    if not end_sec:
+        end_sec = n_samples / sample_rate
+
+    start_sample = int(start_sec * sample_rate)
+    end_sample = min(int(end_sec * sample_rate), n_samples)
+    window_size = int(max(end_sample - start_sample, 0) / time_bins)
+    window = choose_window(sample_rate, window_size, (cutoff_hi - cutoff_lo) / freq_bins)
+    if window is None:
+        return None
+
+    path = _level_path(file_path, window)
+    if not path.exists():
+        build_level(file_path, window)
+    table = _open_level(str(path))
+
+    # Frames whose start falls inside each time window
+    edges = start_sample + np.arange(time_bins + 1) * window_size
+    rows = np.clip(np.ceil(edges / window).astype(int), 0, table.shape[0])
+
+    # Level columns whose frequency falls in [edge_i, edge_i+1), as np.digitize does
+    bin_edges = np.linspace(cutoff_lo, cutoff_hi, freq_bins + 1)
+    cols = np.clip(np.ceil(bin_edges * window / sample_rate).astype(int), 0, table.shape[1])
+
+    region = table[rows[0]:rows[-1], cols[0]:cols[-1]]
+    binned = _group_sums(_group_sums(region, rows - rows[0], axis=0), cols - cols[0], axis=1)
+
+    r0, r1 = rows[:-1], rows[1:]
+
+    # Rescale from summed frame power to the power of one window_size-sample FFT (Parseval):
+    # each frame's power scales with its length, and the frames cover `covered` samples
+    covered = np.maximum(r1 - r0, 1) * window
+    binned *= (window_size / window * window_size / covered)[:, None]
+    return np.maximum(binned, 0), end_sec
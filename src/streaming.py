@@ -0,0 +1,292 @@
+import os
+import numpy as np
+from scipy.signal import hilbert
+from audio_io import to_wav, probe_duration, is_cached, map_wav, pcm_to_float
+import dsp
+from dsp import binned_spectrogram
+from framing import window_bounds
+
+# Samples read from disk per block; peak memory scales with this, not the file length
+BLOCK_SIZE = int(os.getenv("SIGNAL_STREAM_BLOCK_SIZE", str(2 ** 20)))
+
+# Files longer than this (in seconds) are analyzed by streaming instead of decoding into memory
+STREAM_ABOVE_SEC = float(os.getenv("SIGNAL_STREAM_ABOVE_SEC", "600"))
+
+# Context samples on each side of a block when computing its Hilbert envelope
+ENVELOPE_MARGIN = 4096
+
+
+def should_stream(file_path):
+    """
+    Decides whether a tool should use the streaming engine for this file: only when
+    it is longer than STREAM_ABOVE_SEC and not already decoded in memory.
+
+    Args:
+        file_path: Path to the input audio file.
+
+    Returns:
+        True if the file should be streamed.
+    """
+    if is_cached(file_path):
+        return False
+    return probe_duration(file_path) > STREAM_ABOVE_SEC
+
+
+def wav_info(wav_path):
+    """
+    Reads the header of a WAV file.
+
+    Args:
+        wav_path: Path to the WAV file.
+
+    Returns:
+        Tuple of (n_frames, sample_rate, channels).
+    """
+    frames, sample_rate = map_wav(wav_path)
+    return frames.shape[0], sample_rate, frames.shape[1]
+
+
+def iter_blocks(wav_path, block_size=None, start_frame=0, end_frame=None):
+    """
+    Reads a WAV file as consecutive mono float32 blocks through its memory map.
+
+    Args:
+        wav_path: Path to the WAV file.
+        block_size: Frames per block (default: BLOCK_SIZE).
+        start_frame: First frame to read.
+        end_frame: Frame to stop before (None = end of file).
+
+    Yields:
+        Tuple of (offset, block) where offset is the block's first frame relative to start_frame.
+    """
+    block_size = block_size or BLOCK_SIZE
+    frames, _ = map_wav(wav_path)
+    end_frame = len(frames) if end_frame is None else min(end_frame, len(frames))
+
+    for position in range(start_frame, end_frame, block_size):
+        block = pcm_to_float(frames[position:min(position + block_size, end_frame)])
+        yield position - start_frame, block.mean(axis=1, dtype=np.float32)
+
+
+def iter_windows(wav_path, bounds):
+    """
+    Reads the analysis windows of a WAV file one at a time as mono float32, for
+    descriptors that need a whole window at once (spectral flatness, fractal dimension).
+
+    Args:
+        wav_path: Path to the WAV file.
+        bounds: Window edges (see framing.window_bounds).
+
+    Yields:
+        One 1-D array per window.
+    """
+    frames, _ = map_wav(wav_path)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        yield pcm_to_float(frames[lo:hi]).mean(axis=1, dtype=np.float32)
+
+
+def strided_mono(wav_path, max_samples=None):
+    """
+    Reads a WAV file as mono float32, keeping only every n-th frame so at most
+    max_samples remain (the same subset dsp.higuchi_fd would take). Only the kept
+    frames are read and converted.
+
+    Args:
+        wav_path: Path to the WAV file.
+        max_samples: Largest number of samples to keep (None = every sample).
+
+    Returns:
+        1-D float32 array.
+    """
+    frames, _ = map_wav(wav_path)
+    step = -(-len(frames) // max_samples) if max_samples and len(frames) > max_samples else 1
+    return pcm_to_float(frames[::step]).mean(axis=1, dtype=np.float32)
+
+
+def _iter_pieces(blocks, bounds):
+    """
+    Splits streamed blocks at window edges.
+
+    Yields:
+        Tuple of (window_index, piece) for every part of a block inside one window.
+    """
+    for offset, block in blocks:
+        start = offset
+        end = offset + len(block)
+        first = np.searchsorted(bounds, start, side='right') - 1
+        for w in range(max(first, 0), len(bounds) - 1):
+            lo = max(start, bounds[w])
+            hi = min(end, bounds[w + 1])
+            if lo >= end:
+                break
+            if hi > lo:
+                yield w, block[lo - offset:hi - offset]
+
+
+def _iter_envelope(blocks):
+    """
+    Computes the Hilbert amplitude envelope block by block, padding each block
+    with ENVELOPE_MARGIN samples of its neighbours to suppress edge artifacts.
+
+    Yields:
+        Tuple of (offset, envelope) aligned with the input blocks.
+    """
+    previous = None
+    previous_tail = np.zeros(0, dtype=np.float32)
+    for offset, block in blocks:
+        if previous is not None:
+            prev_offset, prev_block = previous
+            padded = np.concatenate([previous_tail, prev_block, block[:ENVELOPE_MARGIN]])
+            envelope = np.abs(hilbert(padded))
+            yield prev_offset, envelope[len(previous_tail):len(previous_tail) + len(prev_block)]
+            previous_tail = prev_block[-ENVELOPE_MARGIN:]
+        previous = (offset, block)
+
+    if previous is not None:
+        prev_offset, prev_block = previous
+        padded = np.concatenate([previous_tail, prev_block])
+        yield prev_offset, np.abs(hilbert(padded))[len(previous_tail):]
+
+
+def _entropy_from_counts(counts, lo, hi):
+    """
+    Shannon entropy of a density histogram, matching np.histogram(..., density=True).
+    """
+    total = counts.sum()
+    width = (hi - lo) / len(counts) if hi > lo else 1.0 / len(counts)
+    density = counts[counts > 0] / (total * width)
+    return -np.sum(density * np.log2(density))
+
+
+def stream_features(file_path, features=("zcr", "flatness", "entropy", "envelope"), windows=30,
+                    entropy_bins=64, block_size=None, fractal_max_samples=None):
+    """
+    Computes per-window descriptors from the decoded WAV without loading it whole.
+    ZCR, entropy and the envelope are streamed in fixed-size blocks; spectral flatness
+    and fractal dimension need a whole window, so they read one window at a time.
+    Peak memory is bounded by the block size or the window length.
+
+    Window edges match np.array_split(signal, windows). ZCR, entropy, flatness and
+    fractal dimension are exact; the envelope comes from block-wise Hilbert transforms
+    with overlapping margins.
+
+    Args:
+        file_path: Path to the input audio file.
+        features: Subset of "zcr", "flatness", "entropy", "envelope" and "fractal" to compute.
+        windows: Number of equal windows over the file.
+        entropy_bins: Histogram bins for Shannon entropy.
+        block_size: Frames per block (default: BLOCK_SIZE).
+        fractal_max_samples: Samples used for the whole-file fractal dimension, as the
+            max_samples of dsp.higuchi_fd (None = every sample).
+
+    Returns:
+        Dict mapping each requested feature to a per-window array. Entropy also sets
+        "entropy_overall", fractal "fractal_overall" and envelope "decay_rate", as in
+        the in-memory tools. "n_samples" and "sample_rate" are always included.
+    """
+    wav_path = to_wav(file_path)
+    n_samples, sample_rate, _ = wav_info(wav_path)
+    bounds = window_bounds(n_samples, windows)
+    lengths = np.diff(bounds)
+    results = {"n_samples": n_samples, "sample_rate": sample_rate}
+
+    def blocks():
+        return iter_blocks(wav_path, block_size=block_size)
+
+    if "zcr" in features:
+        crossings = np.zeros(windows)
+        last_sign = {}
+        for w, piece in _iter_pieces(blocks(), bounds):
+            signs = np.sign(piece)
+            crossings[w] += np.sum(np.diff(signs) != 0)
+            # Carry the crossing between the previous block's last sample and this one
+            if w in last_sign and last_sign[w] != signs[0]:
+                crossings[w] += 1
+            last_sign[w] = signs[-1]
+        results["zcr"] = crossings / np.maximum(lengths, 1)
+
+    if "flatness" in features:
+        results["flatness"] = np.array([dsp.spectral_flatness(window) for window in iter_windows(wav_path, bounds)])
+
+    if "fractal" in features:
+        results["fractal"] = np.array([dsp.higuchi_fd(window, kmax=10) for window in iter_windows(wav_path, bounds)])
+        results["fractal_overall"] = dsp.higuchi_fd(strided_mono(wav_path, fractal_max_samples), kmax=30)
+
+    if "entropy" in features:
+        # First pass finds each window's range so the histograms match np.histogram
+        lows = np.full(windows, np.inf)
+        highs = np.full(windows, -np.inf)
+        for w, piece in _iter_pieces(blocks(), bounds):
+            lows[w] = min(lows[w], piece.min())
+            highs[w] = max(highs[w], piece.max())
+        low, high = lows.min(), highs.max()
+
+        counts = np.zeros((windows, entropy_bins))
+        overall = np.zeros(entropy_bins)
+        for w, piece in _iter_pieces(blocks(), bounds):
+            counts[w] += _histogram_counts(piece, entropy_bins, lows[w], highs[w])
+            overall += _histogram_counts(piece, entropy_bins, low, high)
+        results["entropy"] = np.array([_entropy_from_counts(counts[w], lows[w], highs[w])
+                                       for w in range(windows)])
+        results["entropy_overall"] = _entropy_from_counts(overall, low, high)
+
+    if "envelope" in features:
+        sums = np.zeros(windows)
+        for w, piece in _iter_pieces(_iter_envelope(blocks()), bounds):
+            sums[w] += piece.sum()
+        means = sums / np.maximum(lengths, 1)
+        results["envelope"] = means
+        results["decay_rate"] = (means[0] - means[-1]) / n_samples
+
+    return results
+
+
+def _histogram_counts(values, bins, lo, hi):
+    """
+    Histogram counts with the same edges np.histogram(values, bins) would use for range (lo, hi).
+    """
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    counts, _ = np.histogram(values, bins=bins, range=(lo, hi))
+    return counts
+
+
+def stream_spectrogram(file_path, cutoff_lo, cutoff_hi, start_sec=0, end_sec=None, time_bins=5,
+                       freq_bins=15, block_size=None):
+    """
+    Computes the binned time-frequency power of fft() by streaming the decoded WAV.
+    Each part of a block that falls in one time window is transformed on its own and
+    its binned power, rescaled by window length / part length (Parseval), is summed
+    into that window, so totals stay on the scale of a single full-window FFT.
+
+    Args:
+        file_path: Path to the input audio file.
+        cutoff_lo: Lower bound of the frequency range (in Hz).
+        cutoff_hi: Upper bound of the frequency range (in Hz).
+        start_sec: Start time in seconds.
+        end_sec: End time in seconds (None = full duration).
+        time_bins: Number of equal-width time windows.
+        freq_bins: Number of equal-width frequency bins.
+        block_size: Frames per block (default: BLOCK_SIZE).
+
+    Returns:
+        Tuple of (binned_power, end_sec) where binned_power has shape (time_bins, freq_bins).
+    """
+    wav_path = to_wav(file_path)
+    n_frames, sample_rate, _ = wav_info(wav_path)
+    if not end_sec:
+        end_sec = n_frames / sample_rate
+
+    start_frame = int(start_sec * sample_rate)
+    end_frame = min(int(end_sec * sample_rate), n_frames)
+    window_size = int(max(end_frame - start_frame, 0) / time_bins)
+    bounds = np.arange(time_bins + 1) * window_size
+
+    binned = np.zeros((time_bins, freq_bins))
+    blocks = iter_blocks(wav_path, block_size=block_size, start_frame=start_frame,
+                         end_frame=start_frame + window_size * time_bins)
+    for w, piece in _iter_pieces(blocks, bounds):
+        power = binned_spectrogram(piece, sample_rate, cutoff_lo, cutoff_hi, 1, freq_bins)[0]
+        binned[w] += power * (window_size / len(piece))
+
+    return binned, end_sec
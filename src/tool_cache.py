@@ -0,0 +1,177 @@
+import functools
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import audio_io
+from audio_io import evict_decoded, file_fingerprint
+
+# Results kept in memory (override with TOOL_CACHE_MAX_ENTRIES); older ones fall back to disk
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "256"))
+
+# Set TOOL_CACHE_DISK=0 to keep tool results in memory only
+TOOL_CACHE_DISK = os.getenv("TOOL_CACHE_DISK", "1") != "0"
+
+# Bump to invalidate every cached result after changing how the tools compute them outside
+# the modules below (e.g. a library upgrade); edits to those modules invalidate automatically
+TOOL_CACHE_VERSION = 1
+
+# Helper modules whose source, with the tool's own module, determines tool results
+RESULT_MODULES = ("audio_io", "dsp", "framing", "pyramid", "streaming")
+
+# Module settings that change tool results, as (module, attribute) pairs
+RESULT_SETTINGS = (
+    ("pyramid", "PYRAMID_ENABLED"),
+    ("pyramid", "PYRAMID_WINDOWS"),
+    ("streaming", "STREAM_ABOVE_SEC"),
+    ("streaming", "BLOCK_SIZE"),
+    ("functions", "FRACTAL_MAX_SAMPLES"),
+)
+
+_results = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def _normalize(value):
+    """
+    Makes an argument value comparable across calls: numbers are compared by value
+    (so 2000 and 2000.0 match) and paths to existing files by their fingerprint, so
+    an edited file never returns a stale result.
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return repr(round(float(value), 6))
+    if isinstance(value, (str, Path)) and os.path.isfile(value):
+        return list(file_fingerprint(value))
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return str(value)
+
+
+def _source_hash(module_names):
+    """
+    Hashes the source files of the given modules, so editing any of them changes
+    the cache keys of the tools that depend on them.
+    """
+    digest = hashlib.sha256()
+    for name in module_names:
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            continue  # e.g. __main__ run as a script
+        if spec is not None and spec.origin and os.path.isfile(spec.origin):
+            with open(spec.origin, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def _settings():
+    """
+    Current values of RESULT_SETTINGS. Modules that are not loaded cannot affect a
+    result, so they are left out.
+    """
+    return {f"{module}.{name}": _normalize(getattr(sys.modules[module], name, None))
+            for module, name in RESULT_SETTINGS if module in sys.modules}
+
+
+def _disk_path(key):
+    return Path(audio_io.DECODE_CACHE_DIR) / f"{key}.tool.json"
+
+
+def cached_tool(fn):
+    """
+    Wraps a deterministic analysis tool so identical calls on an unchanged file are
+    answered from a cache instead of being recomputed. Results are kept in an
+    in-memory LRU and written to the decode cache directory, so they are reused
+    across runs and share its disk budget. The key covers the arguments, the source
+    of the tool's module and RESULT_MODULES, and the RESULT_SETTINGS in effect. The wrapper keeps the tool's name,
+    signature and docstring, so it can be registered with the agent unchanged.
+
+    Args:
+        fn: Tool function returning a string.
+
+    Returns:
+        The caching wrapper.
+    """
+    signature = inspect.signature(fn)
+    code_hash = _source_hash((fn.__module__,) + RESULT_MODULES)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        normalized = {name: _normalize(value) for name, value in bound.arguments.items()}
+        raw_key = json.dumps([TOOL_CACHE_VERSION, fn.__name__, code_hash, _settings(), normalized],
+                             sort_keys=True)
+        key = hashlib.sha256(raw_key.encode()).hexdigest()[:32]
+
+        with _lock:
+            if key in _results:
+                _results.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return _results[key]
+
+        path = _disk_path(key)
+        if TOOL_CACHE_DISK and path.exists():
+            try:
+                with open(path, "r") as f:
+                    result = json.load(f)["result"]
+                os.utime(path)
+                with _lock:
+                    _stats["disk_hits"] += 1
+                _remember(key, result)
+                return result
+            except (OSError, ValueError, KeyError):
+                pass  # Evicted or partially written by another process; recompute
+
+        result = fn(*args, **kwargs)
+        with _lock:
+            _stats["misses"] += 1
+        _remember(key, result)
+
+        if TOOL_CACHE_DISK and isinstance(result, str):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.parent / f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"tool": fn.__name__, "result": result}, f)
+            os.replace(tmp_path, path)
+            evict_decoded(keep=path)
+        return result
+
+    return wrapper
+
+
+def _remember(key, result):
+    with _lock:
+        _results[key] = result
+        _results.move_to_end(key)
+        while len(_results) > TOOL_CACHE_MAX_ENTRIES:
+            _results.popitem(last=False)
+
+
+def tool_cache_info():
+    """
+    Reports tool-result cache usage.
+
+    Returns:
+        Dict with entries, memory_hits, disk_hits and misses.
+    """
+    with _lock:
+        return {"entries": len(_results), **_stats}
+
+
+def clear_tool_cache():
+    """
+    Drops in-memory tool results and resets the counters (the disk tier is kept).
+    """
+    with _lock:
+        _results.clear()
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,348 @@
+import json
+import os
+import sys
+import threading
+import numpy as np
+from scipy.signal import welch
+import dsp
+from audio_io import load_audio
+from framing import frame_bounds, frames
+
+# Trained triage model written by `python src/triage.py`
+TRIAGE_MODEL_FILE = os.getenv("TRIAGE_MODEL_FILE", os.path.join("tmp", "triage_model.json"))
+
+# Probabilities at or below TRIAGE_LOW are dismissed locally, at or above TRIAGE_HIGH are
+# escalated to the full agent locally; anything in between goes to the LLM check. Training
+# replaces them with thresholds calibrated on leave-one-out probabilities, stored in the model
+TRIAGE_LOW = float(os.getenv("TRIAGE_LOW", "0.2"))
+TRIAGE_HIGH = float(os.getenv("TRIAGE_HIGH", "0.8"))
+
+# Local decisions must be right at least this often in leave-one-out; training picks the
+# widest thresholds that reach it and does not save a model if no threshold does
+TRIAGE_MIN_PRECISION = float(os.getenv("TRIAGE_MIN_PRECISION", "0.9"))
+
+# A model is only saved or used if it was trained on at least this many clips, of both labels
+TRIAGE_MIN_CLIPS = int(os.getenv("TRIAGE_MIN_CLIPS", "10"))
+
+# L2 penalty of the logistic regression; a strong penalty keeps a model fitted on a few
+# dozen clips from becoming overconfident in its 14 features
+TRIAGE_L2 = float(os.getenv("TRIAGE_L2", "10"))
+
+# Extensions tried when an eval.json clip is stored in data/ under another format
+AUDIO_EXTENSIONS = (".m4a", ".mp3", ".wav")
+
+# eval.json source types that count as plain ambience; a clip with any other source is worth analyzing
+AMBIENT_SOURCES = {
+    "natural", "creek", "water", "bird", "forest", "beach", "waves", "rain", "thunder",
+    "fireplace", "crackling", "wood", "seagulls",
+}
+
+# Edges of the log-spaced bands whose share of the total energy is used as features (Hz)
+BAND_EDGES = (50, 100, 200, 400, 800, 1600, 3200, 6400, 12800)
+
+FEATURE_NAMES = (
+    ["zcr_mean", "zcr_std", "flatness_mean", "flatness_std", "entropy", "level_variation"]
+    + [f"band_{lo}_{hi}" for lo, hi in zip(BAND_EDGES[:-1], BAND_EDGES[1:])]
+)
+
+_model = None
+_model_loaded = False
+_stats = {"local_yes": 0, "local_no": 0, "escalated": 0}
+_lock = threading.Lock()
+
+
+def triage_features(signal, sample_rate, windows=30):
+    """
+    Computes the triage feature vector of a mono clip: ZCR and spectral flatness
+    statistics over equal windows, the amplitude entropy, the variation of the window
+    levels and the share of energy in each of the BAND_EDGES bands. The clip is
+    normalized to unit RMS first, so the features do not depend on recording gain.
+
+    Args:
+        signal: 1-D signal.
+        sample_rate: Sample rate in Hz.
+        windows: Number of equal windows for the per-window statistics.
+
+    Returns:
+        float array ordered as FEATURE_NAMES.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    signal = signal / (np.sqrt(np.mean(signal ** 2)) + 1e-12)
+    segments = frames(signal, frame_bounds(len(signal), sample_rate, windows))
+
+    zcr = [dsp.zero_crossing_rate(seg) for seg in segments]
+    flatness = [dsp.spectral_flatness(seg) for seg in segments]
+    levels = np.array([np.sqrt(np.mean(seg ** 2)) for seg in segments])
+
+    frequency, power = welch(signal, sample_rate, nperseg=min(4096, len(signal)))
+    band_energy = np.array([power[(frequency >= lo) & (frequency < hi)].sum()
+                            for lo, hi in zip(BAND_EDGES[:-1], BAND_EDGES[1:])])
+    band_share = band_energy / (band_energy.sum() + 1e-12)
+
+    return np.concatenate([
+        [np.mean(zcr), np.std(zcr), np.mean(flatness), np.std(flatness),
+         dsp.shannon_entropy(signal), np.std(levels) / (np.mean(levels) + 1e-12)],
+        band_share,
+    ])
+
+
+class LogisticModel:
+    """
+    L2-regularized logistic regression on standardized features, fitted with Newton's
+    method, with its decision thresholds (TRIAGE_LOW and TRIAGE_HIGH until calibrated).
+    Any object with the same predict_proba(X) method can be plugged in with set_model()
+    instead.
+    """
+
+    def __init__(self, mean=None, scale=None, weights=None, bias=0.0, n_train=0, low=None, high=None):
+        self.mean = None if mean is None else np.asarray(mean, dtype=float)
+        self.scale = None if scale is None else np.asarray(scale, dtype=float)
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        self.bias = float(bias)
+        self.n_train = int(n_train)
+        self.low = TRIAGE_LOW if low is None else float(low)
+        self.high = TRIAGE_HIGH if high is None else float(high)
+
+    def fit(self, X, y, l2=TRIAGE_L2, iterations=50):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.mean = X.mean(axis=0)
+        self.scale = X.std(axis=0) + 1e-9
+        Z = np.hstack([(X - self.mean) / self.scale, np.ones((len(X), 1))])
+
+        theta = np.zeros(Z.shape[1])
+        penalty = np.full(Z.shape[1], l2)
+        penalty[-1] = 0  # Do not shrink the bias
+        for _ in range(iterations):
+            p = 1 / (1 + np.exp(-Z @ theta))
+            gradient = Z.T @ (p - y) + penalty * theta
+            hessian = (Z.T * (p * (1 - p))) @ Z + np.diag(penalty) + 1e-9 * np.eye(len(theta))
+            step = np.linalg.solve(hessian, gradient)
+            theta -= step
+            if np.max(np.abs(step)) < 1e-8:
+                break
+
+        self.weights, self.bias = theta[:-1], float(theta[-1])
+        self.n_train = len(y)
+        return self
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        return 1 / (1 + np.exp(-(((X - self.mean) / self.scale) @ self.weights + self.bias)))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"features": FEATURE_NAMES, "mean": self.mean.tolist(), "scale": self.scale.tolist(),
+                       "weights": self.weights.tolist(), "bias": self.bias, "n_train": self.n_train,
+                       "low": self.low, "high": self.high}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("features") != FEATURE_NAMES:
+            raise ValueError(f"{path} was trained on different features; retrain it with `python src/triage.py`")
+        if data.get("n_train", 0) < TRIAGE_MIN_CLIPS:
+            raise ValueError(f"{path} was trained on fewer than {TRIAGE_MIN_CLIPS} clips; "
+                             f"retrain it on more labelled clips or delete it")
+        return cls(data["mean"], data["scale"], data["weights"], data["bias"], data["n_train"],
+                   data.get("low"), data.get("high"))
+
+
+def set_model(model):
+    """
+    Plugs in the triage model. It needs a predict_proba(X) method returning the
+    probability that each row is worth analyzing (a 1-D array, or a scikit-learn
+    style (n, 2) array). None disables local triage.
+    """
+    global _model, _model_loaded
+    with _lock:
+        _model = model
+        _model_loaded = True
+
+
+def get_model():
+    """
+    Returns the plugged-in model, loading TRIAGE_MODEL_FILE on first use (None if it does
+    not exist or cannot be used, so every clip is escalated).
+    """
+    global _model, _model_loaded
+    with _lock:
+        if not _model_loaded:
+            _model = None
+            if os.path.exists(TRIAGE_MODEL_FILE):
+                try:
+                    _model = LogisticModel.load(TRIAGE_MODEL_FILE)
+                except ValueError as e:
+                    print(f"Local triage disabled: {e}")
+            _model_loaded = True
+        return _model
+
+
+def decision_thresholds(model):
+    """
+    Returns the (low, high) thresholds for a model: its calibrated ones if it has them,
+    otherwise TRIAGE_LOW and TRIAGE_HIGH.
+    """
+    return getattr(model, "low", TRIAGE_LOW), getattr(model, "high", TRIAGE_HIGH)
+
+
+def calibrate_thresholds(probabilities, y, min_precision=TRIAGE_MIN_PRECISION, min_support=3):
+    """
+    Picks the widest thresholds whose local decisions reach min_precision on held-out
+    probabilities: high is the lowest probability above 0.5 such that the clips at or
+    above it are worth analyzing at least min_precision of the time, and low likewise
+    for ambient clips below 0.5. A side with no such threshold, or one that decides
+    fewer than min_support clips, is never decided locally.
+
+    Args:
+        probabilities: Leave-one-out probabilities of the labelled clips.
+        y: Labels (1 = worth analyzing).
+        min_precision: Required fraction of correct local decisions on each side.
+        min_support: Fewest clips a threshold must decide to be trusted.
+
+    Returns:
+        Tuple of (low, high); -inf or inf for a side that is never decided.
+    """
+    probabilities, y = np.asarray(probabilities, dtype=float), np.asarray(y)
+    low, high = -np.inf, np.inf
+    for threshold in np.unique(probabilities[probabilities > 0.5])[::-1]:
+        selected = probabilities >= threshold
+        if selected.sum() >= min_support and np.mean(y[selected]) >= min_precision:
+            high = float(threshold)
+    for threshold in np.unique(probabilities[probabilities < 0.5]):
+        selected = probabilities <= threshold
+        if selected.sum() >= min_support and np.mean(1 - y[selected]) >= min_precision:
+            low = float(threshold)
+    return low, high
+
+
+def interest_probability(signal, sample_rate):
+    """
+    Probability that a clip is worth a full analysis according to the triage model.
+
+    Returns:
+        Probability in [0, 1], or None if no model is available.
+    """
+    model = get_model()
+    if model is None:
+        return None
+    proba = np.asarray(model.predict_proba(triage_features(signal, sample_rate)[None, :]))
+    return float(proba[0, -1] if proba.ndim == 2 else proba[0])
+
+
+def triage(signal, sample_rate):
+    """
+    Decides locally whether a clip should get the full agent analysis. Only confident
+    predictions are answered; uncertain clips (or a missing model) are left for the
+    LLM check, and every outcome is counted.
+
+    Args:
+        signal: 1-D clip samples.
+        sample_rate: Sample rate in Hz.
+
+    Returns:
+        True or False when the model is confident, None when the LLM should decide.
+    """
+    probability = interest_probability(signal, sample_rate)
+    low, high = decision_thresholds(get_model())
+    if probability is not None and probability >= high:
+        outcome, decision = "local_yes", True
+    elif probability is not None and probability <= low:
+        outcome, decision = "local_no", False
+    else:
+        outcome, decision = "escalated", None
+    with _lock:
+        _stats[outcome] += 1
+    return decision
+
+
+def triage_info():
+    """
+    Reports triage outcomes.
+
+    Returns:
+        Dict with local_yes, local_no, escalated and llm_calls_avoided counts.
+    """
+    with _lock:
+        return {**_stats, "llm_calls_avoided": _stats["local_yes"] + _stats["local_no"]}
+
+
+def _find_clip(data_dir, name):
+    """
+    Path of the clip called `name` in data_dir, trying AUDIO_EXTENSIONS if that exact
+    file does not exist (None if there is none).
+    """
+    stem = os.path.splitext(name)[0]
+    for candidate in (name,) + tuple(stem + extension for extension in AUDIO_EXTENSIONS):
+        path = os.path.join(data_dir, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def training_set(ground_truth_file="eval.json", data_dir="data"):
+    """
+    Builds triage training data from the eval.json labels: a clip is labelled worth
+    analyzing when any of its source types is outside AMBIENT_SOURCES. Clips are
+    matched by name regardless of extension (e.g. audio4.mp3 is found as audio4.m4a).
+
+    Returns:
+        Tuple of (X, y, names) for the clips found in data_dir.
+    """
+    with open(ground_truth_file, "r") as f:
+        ground_truth = json.load(f)
+
+    X, y, names = [], [], []
+    for name, entry in ground_truth.items():
+        path = _find_clip(data_dir, name)
+        if path is None:
+            continue
+        signal, sample_rate = load_audio(path, mono=True)
+        sources = {label.lower() for label in entry["structured"]["source_type"]}
+        X.append(triage_features(signal, sample_rate))
+        y.append(int(bool(sources - AMBIENT_SOURCES)))
+        names.append(name)
+    return np.array(X), np.array(y), names
+
+
+def main(ground_truth_file="eval.json", data_dir="data", model_file=TRIAGE_MODEL_FILE):
+    """
+    Trains the triage model on the labelled clips, calibrates its thresholds on
+    leave-one-out probabilities, reports the leave-one-out results and saves it. The
+    model is not saved if there are fewer than TRIAGE_MIN_CLIPS clips, only one label,
+    or no threshold whose local decisions reach TRIAGE_MIN_PRECISION.
+    """
+    X, y, names = training_set(ground_truth_file, data_dir)
+    print(f"{len(y)} clips, {int(y.sum())} worth analyzing")
+    if len(y) < TRIAGE_MIN_CLIPS or len(set(y)) < 2:
+        print(f"Not saving the triage model: it needs at least {TRIAGE_MIN_CLIPS} clips with both labels "
+              f"(TRIAGE_MIN_CLIPS); every clip will be escalated to the LLM check")
+        return
+
+    # Leave-one-out: each clip is scored by a model that never saw it
+    probabilities = np.empty(len(y))
+    for i in range(len(y)):
+        keep = np.arange(len(y)) != i
+        probabilities[i] = LogisticModel().fit(X[keep], y[keep]).predict_proba(X[i])[0]
+        print(f"{names[i]}: label={y[i]} p={probabilities[i]:.2f}")
+
+    low, high = calibrate_thresholds(probabilities, y)
+    decided = (probabilities <= low) | (probabilities >= high)
+    correct = int(np.sum(decided & ((probabilities >= high) == y.astype(bool))))
+    print(f"Leave-one-out thresholds: low={low:.2f} high={high:.2f}, "
+          f"decided {int(decided.sum())}/{len(y)} locally, {correct}/{int(decided.sum())} correct")
+
+    if not decided.any():
+        print(f"Not saving the triage model: no threshold is right {TRIAGE_MIN_PRECISION:.0%} of the time "
+              f"(TRIAGE_MIN_PRECISION); every clip will be escalated to the LLM check")
+        return
+    model = LogisticModel().fit(X, y)
+    model.low, model.high = low, high
+    model.save(model_file)
+    print(f"Saved triage model to {model_file}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
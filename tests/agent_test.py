@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import httpx
+import openai
+from rich.console import Console
+import agent
+from agent import run_all_files, run_file
+from functions import agent_output_path, save_agent_output
+
+def _clip(tmp_path, name):
+    os.makedirs(tmp_path / "data", exist_ok=True)
+    path = f"./data/{name}"
+    (tmp_path / path).write_bytes(b"")
+    # Old enough that any prediction saved during the test is newer
+    os.utime(tmp_path / path, (0, 0))
+    return path
+
+def _stub_run_agent(monkeypatch, outcomes):
+    """Replace run_agent with a stub that, per call, raises, hangs or saves a prediction."""
+    calls = []
+
+    async def run_agent(query, console=None, file_path=None, **kwargs):
+        calls.append(file_path)
+        outcome = outcomes.pop(0) if outcomes else "save"
+        if outcome == "hang":
+            await asyncio.Event().wait()
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome == "save":
+            save_agent_output(file_path, ["speech"])
+        return {"llm_turns": 1, "tool_calls": 1, "prompt_tokens": 10}
+    monkeypatch.setattr(agent, "run_agent", run_agent)
+    return calls
+
+def _no_backoff(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return delays
+
+# Test that a transient LLM error is retried after a backoff and the retry's result is recorded
+def test_run_file_retries_transient_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio_file = _clip(tmp_path, "clip.mp3")
+    error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+    calls = _stub_run_agent(monkeypatch, [error, "save"])
+    delays = _no_backoff(monkeypatch)
+
+    entry = asyncio.run(run_file(audio_file, asyncio.Semaphore(1), retries=2))
+
+    assert entry["status"] == "done" and entry["attempts"] == 2 and entry["llm_turns"] == 1
+    assert calls == [audio_file, audio_file]
+    assert delays == [2]
+
+# Test that an attempt exceeding the timeout is recorded as a timeout and not retried
+def test_run_file_timeout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio_file = _clip(tmp_path, "clip.mp3")
+    calls = _stub_run_agent(monkeypatch, ["hang"])
+
+    entry = asyncio.run(run_file(audio_file, asyncio.Semaphore(1), timeout=0.05, retries=2))
+
+    assert entry["status"] == "timeout" and entry["attempts"] == 1
+    assert len(calls) == 1
+
+# Test that a prediction left over from an earlier run does not count when the agent saves nothing
+def test_run_file_ignores_previous_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio_file = _clip(tmp_path, "clip.mp3")
+    save_agent_output(audio_file, ["speech"])
+    _stub_run_agent(monkeypatch, ["nothing"])
+
+    entry = asyncio.run(run_file(audio_file, asyncio.Semaphore(1)))
+
+    assert entry["status"] == "failed" and "save_agent_output" in entry["error"]
+
+# Test that outputs newer than their source are skipped and a re-run only analyzes unfinished files
+def test_run_all_files_skips_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    finished, failing, fresh = (_clip(tmp_path, name) for name in ("a.mp3", "b.mp3", "c.m4a"))
+    save_agent_output(finished, ["speech"])
+    calls = _stub_run_agent(monkeypatch, [ValueError("bad response"), "save"])
+
+    manifest = asyncio.run(run_all_files(concurrency=1))
+
+    assert calls == [failing, fresh]
+    assert manifest[failing]["status"] == "failed" and manifest[fresh]["status"] == "done"
+    assert finished not in manifest
+
+    calls.clear()
+    manifest = asyncio.run(run_all_files(concurrency=1))
+
+    assert calls == [failing]
+    with open(os.path.join("outputs", "manifest.json")) as f:
+        assert {entry["status"] for entry in json.load(f).values()} == {"done"}
+    assert os.path.exists(agent_output_path(failing))
+
+class _FakeHandler:
+    """Agent run with no streamed events."""
+
+    async def stream_events(self):
+        return
+        yield
+
+    def __await__(self):
+        return asyncio.sleep(0, result="answer").__await__()
+
+class _FakeReActAgent:
+    queries = []
+
+    def __init__(self, tools, llm):
+        pass
+
+    def update_prompts(self, prompts):
+        pass
+
+    def run(self, query, ctx):
+        self.queries.append(query)
+        return _FakeHandler()
+
+# Test that run_agent adds the pre-analysis of the file to the query unless it is switched off
+def test_run_agent_pre_analysis(monkeypatch):
+    monkeypatch.setattr(agent, "ReActAgent", _FakeReActAgent)
+    monkeypatch.setattr(agent, "OpenAI", lambda **kwargs: None)
+    monkeypatch.setattr(agent, "Context", lambda agent: None)
+    sweeps = []
+    monkeypatch.setattr(agent, "pre_analysis", lambda file_path: sweeps.append(file_path) or "### SWEEP")
+    console = Console(quiet=True)
+
+    asyncio.run(agent.run_agent("Analyze", console, mode="react", file_path="clip.wav", pre_analyze=True))
+    asyncio.run(agent.run_agent("Analyze", console, mode="react", file_path="clip.wav", pre_analyze=False))
+
+    with_sweep, without_sweep = _FakeReActAgent.queries[-2:]
+    assert with_sweep.startswith("Analyze") and with_sweep.rstrip().endswith("### SWEEP")
+    assert "pre-analysis of clip.wav" in with_sweep
+    assert without_sweep == "Analyze"
+    assert sweeps == ["clip.wav"]
@@ -0,0 +1,52 @@
+import asyncio
+import inspect
+import subprocess
+import sys
+import pytest
+import async_tools
+from async_tools import async_tool, run_subprocess
+
+def _failing_tool(file_path: str, windows: int = 5) -> str:
+    """Raises for every file."""
+    raise ValueError(f"cannot analyze {file_path}")
+
+# Test that a failing command raises with its exit status and stderr, and a missing one is reported
+def test_run_subprocess_errors():
+    command = [sys.executable, "-c", "import sys; sys.stderr.write('bad input'); sys.exit(3)"]
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        asyncio.run(run_subprocess(command))
+    assert error.value.returncode == 3 and error.value.stderr == "bad input"
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(run_subprocess(["no-such-command-for-signals-agent"]))
+
+    assert asyncio.run(run_subprocess([sys.executable, "-c", "print('ok')"])).strip() == "ok"
+
+# Test that an exception raised by the tool reaches the caller and the wrapper keeps the tool's signature
+def test_async_tool_propagates_tool_errors(tmp_path):
+    tool = async_tool(_failing_tool)
+    missing = str(tmp_path / "missing.wav")
+
+    with pytest.raises(ValueError, match="cannot analyze"):
+        asyncio.run(tool(missing, windows=3))
+    assert tool.__name__ == "_failing_tool"
+    assert inspect.signature(tool) == inspect.signature(_failing_tool)
+
+# Test that a failed decode stops the tool from running, and a path that is not a file is not decoded
+def test_async_tool_decode_errors(tmp_path, monkeypatch):
+    calls, decoded = [], []
+
+    async def failing_decode(file_path):
+        decoded.append(file_path)
+        raise subprocess.CalledProcessError(1, ["ffmpeg", "-i", file_path])
+    monkeypatch.setattr(async_tools, "to_wav_async", failing_decode)
+    tool = async_tool(lambda file_path: calls.append(file_path) or "done")
+    audio_file = tmp_path / "clip.mp3"
+    audio_file.write_bytes(b"not audio")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(tool(str(audio_file)))
+    assert calls == []
+
+    assert asyncio.run(tool(str(tmp_path / "missing.mp3"))) == "done"
+    assert decoded == [str(audio_file)]
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import subprocess
+import time
+from pathlib import Path
+import numpy as np
+import pytest
+import audio_io
+from audio_io import load_audio, load_window, clear_cache, cache_info, to_wav_async, probe_duration
+
+# Test that repeated loads are served from the decoded-signal cache
+def test_load_audio_cached():
+    clear_cache()
+    test_file = "data/hamilton_ave.wav" # Already WAV, no ffmpeg needed
+    signal, sample_rate = load_audio(test_file, mono=True)
+    again, _ = load_audio(test_file, mono=True)
+
+    assert signal.ndim == 1
+    assert sample_rate > 0
+    assert again is signal
+    assert not signal.flags.writeable
+    assert cache_info()["misses"] == 1
+
+# Test that a memory-mapped window matches the same slice of the full decode
+def test_load_window_matches_full_decode():
+    test_file = "data/hamilton_ave.wav"
+    window, sample_rate, end_sec = load_window(test_file, start_sec=2, end_sec=3, mono=True)
+    signal, _ = load_audio(test_file, mono=True)
+
+    assert end_sec == 3
+    assert np.array_equal(window, signal[2 * sample_rate:3 * sample_rate])
+
+# Test that the async decoder passes WAV files through without running ffmpeg
+def test_to_wav_async_passes_wav_through():
+    test_file = "data/hamilton_ave.wav"
+    assert asyncio.run(to_wav_async(test_file)) == Path(test_file)
+
+# Test that mono and stereo loads of a file share one cached decode
+def test_mono_derived_from_cached_stereo():
+    clear_cache()
+    test_file = "data/audio1.wav" # Stereo
+    stereo, _ = load_audio(test_file)
+    mono, _ = load_audio(test_file, mono=True)
+    window, sample_rate, _ = load_window(test_file, start_sec=1, end_sec=2, mono=True)
+
+    assert stereo.ndim == 2
+    assert np.allclose(mono, stereo.mean(axis=1))
+    assert np.allclose(window, mono[sample_rate:2 * sample_rate])
+    assert cache_info()["entries"] == 1
+    assert cache_info()["bytes"] == stereo.nbytes
+
+# Test that durations of non-WAV files are probed once, or read from their decoded copy
+def test_probe_duration_memoized(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path / "decoded"))
+    clear_cache()
+    source = tmp_path / "clip.mp3"
+    source.write_bytes(Path("data/hamilton_ave.wav").read_bytes())
+    calls = []
+
+    def fake_ffprobe(command, **kwargs):
+        calls.append(command[0])
+        return subprocess.CompletedProcess(command, 0, stdout="12.5\n")
+    monkeypatch.setattr(subprocess, "run", fake_ffprobe)
+
+    assert probe_duration(source) == 12.5
+    assert probe_duration(source) == 12.5
+    assert calls == ["ffprobe"]
+
+    clear_cache()
+    decoded = audio_io._decoded_path(source)
+    decoded.parent.mkdir(parents=True)
+    decoded.write_bytes(source.read_bytes())
+    assert np.isclose(probe_duration(source), 1796096 / 48000)
+    assert calls == ["ffprobe"]
+
+def _fake_ffmpeg(calls, fail=False):
+    # Stands in for ffmpeg: "decodes" by copying the input to the output path
+    def run(command, **kwargs):
+        calls.append(command)
+        Path(command[-1]).write_bytes(Path(command[3]).read_bytes()[:100 if fail else None])
+        if fail:
+            raise subprocess.CalledProcessError(1, command)
+        return subprocess.CompletedProcess(command, 0)
+    return run
+
+# Test that conversions are cached by content hash, outside the source directory
+def test_to_wav_content_hash_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path / "decoded"))
+    calls = []
+    monkeypatch.setattr(subprocess, "run", _fake_ffmpeg(calls))
+    first, second = tmp_path / "a" / "clip.mp3", tmp_path / "b" / "copy.m4a"
+    for path in (first, second):
+        path.parent.mkdir()
+        path.write_bytes(Path("data/hamilton_ave.wav").read_bytes())
+
+    wav_path = audio_io.to_wav(first)
+    assert audio_io.to_wav(second) == wav_path
+    assert len(calls) == 1
+    assert wav_path.parent == tmp_path / "decoded"
+    assert wav_path.name == f"{audio_io.content_hash(first)[:32]}.wav"
+    assert sorted(p.name for p in first.parent.iterdir()) == ["clip.mp3"]
+
+# Test that a failed conversion leaves neither a cached WAV nor a partial temporary file
+def test_to_wav_failure_leaves_no_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path / "decoded"))
+    monkeypatch.setattr(subprocess, "run", _fake_ffmpeg([], fail=True))
+    source = tmp_path / "clip.mp3"
+    source.write_bytes(Path("data/hamilton_ave.wav").read_bytes())
+
+    with pytest.raises(subprocess.CalledProcessError):
+        audio_io.to_wav(source)
+    assert list((tmp_path / "decoded").iterdir()) == []
+
+# Test that eviction deletes least recently used files down to the budget, sparing `keep`
+def test_evict_decoded_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_MAX_BYTES", 250)
+    paths = [tmp_path / f"{name}.wav" for name in ("oldest", "older", "newer", "newest")]
+    for age, path in zip((40, 30, 20, 10), paths):
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (time.time() - age, time.time() - age))
+
+    audio_io.evict_decoded(keep=paths[0])
+    assert [path.exists() for path in paths] == [True, False, False, True]
@@ -0,0 +1,12 @@
+import numpy as np
+from detection import EventDetector
+
+# Test that an event starts on a jump above the noise floor and ends only below the release level
+def test_event_detector_hysteresis():
+    detector = EventDetector(block_sec=0.05, floor_sec=1, on_ratio=3, off_ratio=1.5)
+    quiet = np.ones(4)
+    levels = [1] * 40 + [10] * 5 + [2] * 5 + [1] * 5
+    changes = [(i, detector.update(quiet * level)) for i, level in enumerate(levels)]
+    changes = [(i, change) for i, change in changes if change]
+
+    assert changes == [(40, "onset"), (50, "offset")]
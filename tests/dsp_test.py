@@ -0,0 +1,63 @@
+import numpy as np
+from scipy.signal import welch
+from dsp import higuchi_fd, spectral_peaks, harmonic_series, welch_spectrogram, autocorrelation_fft, top_peaks
+
+# Test that the vectorized Higuchi estimate matches the per-offset loop it replaced
+def test_higuchi_fd_matches_loop():
+    x = np.random.default_rng(0).standard_normal(5001).cumsum()
+    kmax = 10
+
+    L = []
+    for k in range(1, kmax + 1):
+        Lk = []
+        for m in range(k):
+            idxs = np.arange(1, int(np.floor((len(x) - m) / k)), dtype=int)
+            Lmk = np.sum(np.abs(x[m + idxs * k] - x[m + (idxs - 1) * k]))
+            Lk.append(Lmk * (len(x) - 1) / (len(idxs) * k))
+        L.append(np.mean(Lk))
+    expected = np.polyfit(np.log(1.0 / np.arange(1, kmax + 1)), np.log(L), 1)[0]
+
+    assert np.isclose(higuchi_fd(x, kmax), expected)
+
+# Test that a harmonic ladder is recovered even when its fundamental is missing
+def test_harmonic_series_missing_fundamental():
+    sample_rate = 44100
+    t = np.arange(5 * sample_rate) / sample_rate
+    x = sum(np.sin(2 * np.pi * 120 * n * t) / n for n in (2, 3, 4, 5)) + 0.5 * np.sin(2 * np.pi * 1033 * t)
+    x += 0.05 * np.random.default_rng(0).standard_normal(len(t))
+
+    frequency, power = welch(x, sample_rate, nperseg=8192)
+    indices, _, _ = spectral_peaks(frequency, power)
+    series = harmonic_series(frequency[indices], resolution=frequency[1] - frequency[0])
+
+    assert len(series) == 1
+    fundamental, numbers, _ = series[0]
+    assert abs(fundamental - 120) < 1
+    assert list(numbers) == [2, 3, 4, 5]
+
+# Test that the batched per-window Welch spectra match scipy's Welch estimate of each window
+def test_welch_spectrogram_matches_scipy():
+    x = np.random.default_rng(1).standard_normal(50000)
+    bounds = (np.array([0, 20000]), np.array([20000, 50000]))
+    frequency, psd, counts = welch_spectrogram(x, 8000, bounds, nperseg=1024)
+
+    for row, (lo, hi) in enumerate(zip(*bounds)):
+        expected_frequency, expected = welch(x[lo:hi], 8000, nperseg=1024)
+        assert np.allclose(frequency, expected_frequency)
+        assert np.allclose(psd[row], expected, rtol=1e-4)
+    assert list(counts) == [38, 57]
+
+# Test that the FFT autocorrelation matches direct correlation and its top peak is the period
+def test_autocorrelation_finds_period():
+    period = 147
+    x = np.tile(np.random.default_rng(2).standard_normal(period), 40)
+    x += 0.3 * np.random.default_rng(3).standard_normal(len(x))
+    x -= x.mean()
+
+    corr = autocorrelation_fft(x, max_lag=1000)
+    direct = np.correlate(x, x, mode="full")[len(x) - 1:len(x) + 1000]
+    assert np.allclose(corr, direct / direct[0])
+
+    peaks = top_peaks(corr, 3)
+    assert peaks[0] == period
+    assert all(lag % period == 0 for lag in peaks)
@@ -0,0 +1,28 @@
+import io
+import numpy as np
+import pandas as pd
+from encoding import encode_table, estimate_tokens
+
+# Test that an over-budget series table is merged to fit while its summary rows are kept
+def test_encode_series_fits_budget():
+    values = np.random.default_rng(0).random(30)
+    df = pd.DataFrame({"Segment": [f"Window {i+1}" for i in range(30)] + ["Overall"],
+                       "Shannon Entropy": list(values) + [0.5]})
+    encoded = encode_table(df.to_csv(index=False, float_format="%.5f"), "series", budget=60)
+
+    assert estimate_tokens(encoded) <= 60
+    assert "Overall,0.5" in encoded
+    assert encoded.rstrip().splitlines()[-1].startswith("# 30 windows")
+
+# Test that merging the frequency bins of a spectrogram keeps each row's total energy
+def test_encode_grid_sums_bins():
+    power = np.random.default_rng(1).random((20, 30))
+    power /= power.sum(axis=1, keepdims=True)
+    df = pd.DataFrame(power, columns=[f"{i * 100}-{(i + 1) * 100}Hz" for i in range(30)])
+    df.insert(0, "Time", [f"{i:.2f}-{i + 1:.2f}sec" for i in range(20)])
+    encoded = encode_table(df.to_csv(index=False, float_format="%.3f"), "grid", budget=150)
+
+    table = pd.read_csv(io.StringIO(encoded), comment="#")
+    assert estimate_tokens(encoded) <= 150
+    assert table.columns[1].startswith("0-") and table.columns[-1].endswith("-3000Hz")
+    assert np.allclose(table.iloc[:, 1:].sum(axis=1), 1, atol=0.02)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+import evaluation
+from evaluation import grade_batch, grade_pairs, prefilter_match
+
+# Test that the local pre-filter only passes plurals and spelling variants
+def test_prefilter_match():
+    assert prefilter_match("Human Conversations", "human conversation")
+    assert prefilter_match("bodies", "body")
+    assert prefilter_match("sea gull", "seagull")
+    assert prefilter_match("synthesised", "Synthesized")
+    assert not prefilter_match("glass", "glas")
+    assert not prefilter_match("nature", "natural sound")
+    assert not prefilter_match("synthesized", "electronic")
+    assert not prefilter_match("car", "traffic")
+    assert not prefilter_match("person", "human voices")
+    assert not prefilter_match("music", "noise")
+
+class _FakeGrader:
+    """Stands in for the grading LLM: a pair passes when its labels share a word."""
+    model = "fake-grader"
+
+    def __init__(self, batch_reply=None):
+        self.prompts = []
+        self.in_flight = self.max_in_flight = 0
+        self.batch_reply = batch_reply
+
+    async def acomplete(self, prompt):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        pairs = re.findall(r"Ground truth label: (.*?) \| Predicted label: (.*)", prompt)
+        if pairs:
+            text = self.batch_reply or json.dumps(["PASS" if set(t.split()) & set(p.split()) else "FAIL"
+                                                   for t, p in pairs])
+        else:
+            true_label, pred_label = re.findall(r"label: \['(.*)'\]", prompt)
+            text = "PASS" if set(true_label.split()) & set(pred_label.split()) else "FAIL"
+        return SimpleNamespace(text=text, raw={"usage": {"prompt_tokens": 10, "completion_tokens": 1}})
+
+PAIRS = [("dog", "dog barking"), ("rain", "thunder"), ("crowd", "crowd cheering"), ("wind", "engine"),
+         ("piano", "piano music")]
+
+# Test that unseen pairs are graded in batches and a second run is answered from the cache
+def test_grade_pairs_batches_and_caches(monkeypatch):
+    grader = _FakeGrader()
+    monkeypatch.setattr(evaluation, "llm", grader)
+    monkeypatch.setattr(evaluation, "GRADING_BATCH_SIZE", 2)
+    cache = {}
+
+    judgments, sources = asyncio.run(grade_pairs(PAIRS, asyncio.Semaphore(8), cache, prefilter=False))
+
+    assert len(grader.prompts) == 3
+    assert judgments == {pair: pair[0] in pair[1] for pair in PAIRS}
+    assert sources == {"prefilter": 0, "cache": 0, "llm": 5}
+    assert len(cache) == 5
+
+    judgments_again, sources = asyncio.run(grade_pairs(PAIRS, asyncio.Semaphore(8), cache, prefilter=False))
+
+    assert len(grader.prompts) == 3
+    assert judgments_again == judgments
+    assert sources == {"prefilter": 0, "cache": 5, "llm": 0}
+
+# Test that the semaphore bounds how many grading requests are in flight
+def test_grade_pairs_bounded_by_semaphore(monkeypatch):
+    grader = _FakeGrader()
+    monkeypatch.setattr(evaluation, "llm", grader)
+    monkeypatch.setattr(evaluation, "GRADING_BATCH_SIZE", 1)
+
+    asyncio.run(grade_pairs(PAIRS, asyncio.Semaphore(2), {}, prefilter=False))
+
+    assert len(grader.prompts) == 5
+    assert grader.max_in_flight == 2
+
+# Test that an unparsable batch reply falls back to grading each pair on its own
+def test_grade_batch_falls_back_to_single_pairs(monkeypatch):
+    grader = _FakeGrader(batch_reply="PASS, FAIL")
+    monkeypatch.setattr(evaluation, "llm", grader)
+
+    grades = asyncio.run(grade_batch(PAIRS[:2], asyncio.Semaphore(8)))
+
+    assert grades == [True, False]
+    assert len(grader.prompts) == 3
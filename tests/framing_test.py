@@ -0,0 +1,15 @@
+import numpy as np
+from framing import frame_bounds, frames
+
+# Test that the default windows match np.array_split and hopped frames are views of the signal
+def test_frame_bounds():
+    signal = np.arange(1003, dtype=np.float32)
+
+    bounds = frame_bounds(len(signal), 100, windows=30)
+    for frame, expected in zip(frames(signal, bounds), np.array_split(signal, 30)):
+        assert np.array_equal(frame, expected)
+
+    starts, ends = frame_bounds(len(signal), 100, window_sec=0.5, hop_sec=0.25)
+    assert list(starts[:3]) == [0, 25, 50] and np.all(ends - starts == 50)
+    assert ends[-1] <= len(signal) and starts[-1] + 25 + 50 > len(signal)
+    assert all(np.shares_memory(frame, signal) for frame in frames(signal, (starts, ends)))
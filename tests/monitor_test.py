@@ -0,0 +1,54 @@
+import asyncio
+import time
+import wave
+import numpy as np
+from monitor import FileInputStream, Recorder, SpectralMonitor, save_wav
+
+# Test that a file-backed stream is monitored without gaps, an onset is flagged within one block
+# and the captured clip includes the pre-roll
+def test_monitor_detects_onset(tmp_path):
+    sample_rate, block_size = 16000, 1024
+    rng = np.random.default_rng(0)
+    signal = 0.01 * rng.standard_normal(sample_rate * 4)
+    onset = int(2.5 * sample_rate)
+    signal[onset:] += 0.5 * np.sin(2 * np.pi * 440 * np.arange(len(signal) - onset) / sample_rate)
+    wav_path = save_wav(signal, sample_rate, str(tmp_path / "onset.wav"))
+
+    monitor = SpectralMonitor(sample_rate, block_size=block_size, floor_sec=1, buffer_sec=5)
+    events = []
+    stream = FileInputStream(wav_path, monitor.callback(events.append), block_size=block_size)
+    stream.start_stream()
+    while stream.is_active():
+        time.sleep(0.01)
+
+    assert monitor.buffer.written == len(signal)
+    assert len(events) == 1
+    assert 0 <= events[0]["position"] + block_size - onset <= block_size
+    assert np.allclose(monitor.buffer.read(0, len(signal)), signal, atol=1e-4)
+
+    # Triggered clips start with the pre-roll and record where the onset falls
+    clip, trigger_offset = monitor.capture(events[0], 1, preroll_sec=0.5)
+    assert trigger_offset == sample_rate // 2 and len(clip) == sample_rate // 2 + sample_rate
+    assert np.allclose(clip, signal[events[0]["position"] - trigger_offset:][:len(clip)], atol=1e-4)
+
+# Test that an awaitable recording fills the WAV file while other tasks keep running
+def test_recorder_async(tmp_path):
+    sample_rate = 8000
+    signal = np.sin(2 * np.pi * 300 * np.arange(sample_rate) / sample_rate) * 0.5
+    source = save_wav(signal, sample_rate, str(tmp_path / "source.wav"))
+    recorder = Recorder(0.5, str(tmp_path / "out.wav"), chunk=400, source=source, flush_interval=0.05)
+
+    async def main():
+        ticks = 0
+        task = asyncio.create_task(recorder.record_async())
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return await task, ticks
+
+    filepath, ticks = asyncio.run(main())
+    assert ticks > 10
+    with wave.open(filepath) as wf:
+        recorded = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    assert len(recorded) == sample_rate // 2
+    assert np.allclose(recorded / 2 ** 15, signal[:sample_rate // 2], atol=1e-4)
@@ -0,0 +1,22 @@
+import numpy as np
+import parallel
+from dsp import higuchi_fd
+from framing import frame_bounds
+from parallel import map_windows, shutdown_pools
+
+# Test that thread and process workers return the serial results in window order
+def test_map_windows_matches_serial(monkeypatch):
+    signal = np.random.default_rng(0).standard_normal(8000).astype(np.float32)
+    bounds = frame_bounds(len(signal), 8000, 6)
+    serial = map_windows(higuchi_fd, signal, bounds, kmax=10)
+
+    monkeypatch.setattr(parallel, "WORKERS", 2)
+    try:
+        threaded = map_windows(higuchi_fd, signal, bounds, kmax=10)
+        processed = map_windows(higuchi_fd, signal, bounds, kind="process", kmax=10)
+    finally:
+        shutdown_pools()
+
+    assert len(serial) == 6
+    assert threaded == serial
+    assert processed == serial
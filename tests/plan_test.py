@@ -0,0 +1,24 @@
+import asyncio
+import json
+from plan import analysis_plan
+
+# Test that a plan runs its valid steps and reports unknown tools and bad arguments per step
+def test_analysis_plan_reports_errors_per_step():
+    steps = [
+        {"tool": "zero_crossing_rate", "windows": 5},
+        {"tool": "spectrogram"},
+        {"tool": "fft", "cutoff_lo": 0, "cutoff_hi": 2000, "resolution": 3},
+    ]
+    result = asyncio.run(analysis_plan("data/hamilton_ave.wav", json.dumps(steps)))
+    sections = result.split("\n\n### ")
+
+    assert len(sections) == 3
+    assert sections[0].startswith("### zero_crossing_rate(windows=5)\n")
+    assert "Error" not in sections[0] and "ZCR" in sections[0]
+    assert sections[1].startswith("spectrogram()\nError: unknown tool")
+    assert "Error: TypeError" in sections[2] and "resolution" in sections[2]
+
+# Test that malformed plans are rejected before anything runs
+def test_analysis_plan_rejects_malformed_steps():
+    assert asyncio.run(analysis_plan("data/hamilton_ave.wav", "[{")).startswith("Error: steps is not valid JSON")
+    assert asyncio.run(analysis_plan("data/hamilton_ave.wav", '["fft"]')).startswith("Error: steps must be")
@@ -0,0 +1,44 @@
+import importlib
+import numpy as np
+from scipy.io import wavfile
+import audio_io
+import preanalysis
+from functions import fft
+from preanalysis import pre_analysis
+from tool_cache import clear_tool_cache
+
+# Test that the sweep has one titled section per scan, in order, with the file properties first
+def test_pre_analysis_sections(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path))
+    clear_tool_cache()
+    sample_rate = 8000
+    t = np.arange(3 * sample_rate) / sample_rate
+    wav_file = str(tmp_path / "synthetic.wav")
+    wavfile.write(wav_file, sample_rate, (np.sin(2 * np.pi * 440 * t) * 20000).astype(np.int16))
+
+    sweep = pre_analysis(wav_file, encode=False)
+    sections = sweep.split("\n\n### ")
+
+    assert [section.split("\n")[0].lstrip("# ") for section in sections] == [
+        "File properties",
+        "Broad spectrogram: fft(cutoff_lo=0, cutoff_hi=2000)",
+        "Full-band spectrogram: fft(cutoff_lo=0, cutoff_hi=4000, freq_bins=10)",
+        "Energy envelope: fft(cutoff_lo=0, cutoff_hi=4000, time_bins=20, freq_bins=1)",
+        "Spectral peaks and harmonic series: spectral_peaks()",
+        "Feature summary: analyze_features(windows=5)",
+    ]
+    assert "Duration: 3.00 s, sample rate: 8000 Hz, channels: 1" in sections[0]
+    assert sections[1].split("\n", 1)[1] == fft(wav_file, 0, 2000).strip()
+    assert "\n440.0," in sections[4]
+    assert pre_analysis(wav_file).startswith("### File properties\nDuration: 3.00 s")
+
+# Test that PRE_ANALYSIS=0 turns the sweep off and anything else leaves it on
+def test_pre_analysis_switch(monkeypatch):
+    try:
+        monkeypatch.setenv("PRE_ANALYSIS", "0")
+        assert importlib.reload(preanalysis).PRE_ANALYSIS is False
+        monkeypatch.setenv("PRE_ANALYSIS", "1")
+        assert importlib.reload(preanalysis).PRE_ANALYSIS is True
+    finally:
+        monkeypatch.undo()
+        importlib.reload(preanalysis)
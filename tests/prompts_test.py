@@ -0,0 +1,13 @@
+from prompts import function_system_prompt, output_format, react_tool_list, reference_values, system_prompt
+
+# Test that the ReAct prompt formats as a template into its sections, and the function prompt
+# keeps the shared sections without the ReAct tool list
+def test_prompts_composed_from_sections():
+    react = system_prompt.format(tool_desc="TOOLS", tool_names="NAMES")
+
+    assert "You have access to the following tools:\nTOOLS" in react
+    assert react.endswith(output_format)
+    assert reference_values in react and reference_values in function_system_prompt
+    assert function_system_prompt.endswith(output_format)
+    assert "{tool_desc}" not in function_system_prompt
+    assert react_tool_list.split("\n")[0] not in function_system_prompt
@@ -0,0 +1,32 @@
+import numpy as np
+import audio_io
+import pyramid
+from audio_io import load_window
+from dsp import binned_spectrogram
+from pyramid import pyramid_spectrogram
+
+def _normalized(power):
+    return power / power.sum(axis=1, keepdims=True)
+
+# Test that queries answered from the pyramid stay within the documented 0.1 of the exact path
+def test_pyramid_matches_exact_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(pyramid, "PYRAMID_ENABLED", True)
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path))
+    test_file = "data/hamilton_ave.wav"
+
+    queries = [(0, 2000, 0, None, 5, 15), (0, 8000, 0, None, 10, 10), (50, 4000, 5, None, 30, 20),
+               (500, 2000, 5, 11, 10, 30)]
+    for cutoff_lo, cutoff_hi, start_sec, end_sec, time_bins, freq_bins in queries:
+        approx, end_sec = pyramid_spectrogram(test_file, cutoff_lo, cutoff_hi, start_sec, end_sec,
+                                              time_bins, freq_bins)
+        signal, sample_rate, _ = load_window(test_file, start_sec, end_sec, mono=True)
+        exact = binned_spectrogram(signal, sample_rate, cutoff_lo, cutoff_hi, time_bins, freq_bins)
+
+        assert np.abs(_normalized(approx) - _normalized(exact)).max() < 0.1
+
+# Test that bins narrower than every level can resolve fall back to the exact path
+def test_pyramid_declines_fine_bins(tmp_path, monkeypatch):
+    monkeypatch.setattr(pyramid, "PYRAMID_ENABLED", True)
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path))
+
+    assert pyramid_spectrogram("data/hamilton_ave.wav", 0, 100, end_sec=10, time_bins=5, freq_bins=10) is None
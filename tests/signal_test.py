@@ -1,5 +1,10 @@
 import csv
 import io
+import numpy as np
+import pandas as pd
+import pytest
+from audio2numpy import open_audio
+from scipy.io import wavfile
 from functions import fft
 
 # Test for FFT function
@@ -22,3 +27,106 @@ def test_fft():
         for val in row[1:]:  # skip "Time"
             float_val = float(val)
             assert float_val >= 0
+
+def _baseline_fft(wav_file, cutoff_lo, cutoff_hi, time_bins, freq_bins):
+    # The per-window loop fft() used before it was vectorized
+    signal, sample_rate = open_audio(str(wav_file))
+    if signal.ndim == 2:
+        signal = np.mean(signal, axis=1)
+    window_size = int(len(signal) / time_bins)
+    bin_edges = np.linspace(cutoff_lo, cutoff_hi, freq_bins + 1)
+
+    rows = []
+    for w in range(time_bins):
+        windowed_signal = signal[w * window_size:(w + 1) * window_size]
+        frequency = np.fft.fftfreq(len(windowed_signal), d=1/sample_rate)
+        power = np.abs(np.fft.fft(windowed_signal))**2
+        mask = (frequency >= cutoff_lo) & (frequency <= cutoff_hi)
+        frequency, power = frequency[mask], power[mask]
+        indices = np.digitize(frequency, bin_edges) - 1
+        binned_power = np.zeros(freq_bins)
+        for i in range(len(frequency)):
+            if 0 <= indices[i] < freq_bins:
+                binned_power[indices[i]] += power[i]
+        if freq_bins > 1:
+            binned_power /= np.sum(binned_power) if np.sum(binned_power) > 0 else 1
+        rows.append(binned_power)
+    return np.array(rows)
+
+# Test that fft output matches the original per-window loop. Samples are now read as float32,
+# so raw powers (freq_bins=1) may differ in the 7th significant digit; normalized bins are
+# printed to 3 decimals and must match to that rounding
+def test_fft_matches_baseline_loop(tmp_path):
+    sample_rate = 8000
+    t = np.arange(3 * sample_rate) / sample_rate
+    rng = np.random.default_rng(0)
+    left = 0.4 * np.sin(2 * np.pi * 440 * t) + 0.1 * rng.standard_normal(len(t))
+    right = 0.3 * np.sin(2 * np.pi * 1250 * t * (1 + t / 10)) + 0.1 * rng.standard_normal(len(t))
+    wav_file = tmp_path / "synthetic.wav"
+    wavfile.write(wav_file, sample_rate, (np.stack([left, right], axis=1) * 20000).astype(np.int16))
+
+    for cutoff_lo, cutoff_hi, time_bins, freq_bins in [(0, 2000, 5, 15), (100, 3000, 7, 11), (0, 4000, 20, 1)]:
+        result = pd.read_csv(io.StringIO(fft(str(wav_file), cutoff_lo, cutoff_hi, time_bins=time_bins,
+                                             freq_bins=freq_bins)))
+        expected = _baseline_fft(wav_file, cutoff_lo, cutoff_hi, time_bins, freq_bins)
+        values = result.iloc[:, 1:].to_numpy()
+        if freq_bins == 1:
+            assert np.allclose(values, np.round(expected, 3), rtol=1e-5)
+        else:
+            assert np.abs(values - expected).max() <= 0.0005 + 1e-9
+
+# Test that analyze_features and fractal_dimension emit the same rows and values when streamed
+def test_streamed_tools_match_in_memory(monkeypatch):
+    import streaming
+    from audio_io import clear_cache
+    from functions import analyze_features, fractal_dimension
+    test_file = "data/audio1.wav"
+
+    clear_cache()
+    monkeypatch.setattr(streaming, "STREAM_ABOVE_SEC", 1)
+    streamed = [pd.read_csv(io.StringIO(tool(test_file, windows=6))) for tool in (analyze_features, fractal_dimension)]
+    monkeypatch.setattr(streaming, "STREAM_ABOVE_SEC", 1e9)
+    in_memory = [pd.read_csv(io.StringIO(tool(test_file, windows=6))) for tool in (analyze_features, fractal_dimension)]
+
+    for a, b in zip(streamed, in_memory):
+        assert list(a["Segment"]) == list(b["Segment"])
+        assert list(a.columns) == list(b.columns)
+        assert np.allclose(a.iloc[:, 1:].to_numpy(float), b.iloc[:, 1:].to_numpy(float), rtol=1e-2, equal_nan=True)
+
+# Test that analyze_features lays out one column per selected feature in a fixed order, one row
+# per window, then "Overall" and "Decay Rate" rows only for the features that have them
+@pytest.mark.parametrize("stream", [True, False])
+def test_analyze_features_layout(tmp_path, monkeypatch, stream):
+    import streaming
+    from audio_io import clear_cache
+    from functions import analyze_features
+    sample_rate = 8000
+    t = np.arange(4 * sample_rate) / sample_rate
+    wav_file = tmp_path / "synthetic.wav"
+    wavfile.write(wav_file, sample_rate, (np.sin(2 * np.pi * 300 * t) * np.exp(-t) * 20000).astype(np.int16))
+
+    clear_cache()
+    monkeypatch.setattr(streaming, "STREAM_ABOVE_SEC", 1 if stream else 1e9)
+    windows = [f"Window {i+1}" for i in range(4)]
+    layouts = [
+        ("all", ["ZCR", "Mean Amplitude", "Spectral Flatness", "Fractal Dimension", "Shannon Entropy"],
+         windows + ["Overall", "Decay Rate"]),
+        ("entropy, zcr", ["ZCR", "Shannon Entropy"], windows + ["Overall"]),
+        ("envelope", ["Mean Amplitude"], windows + ["Decay Rate"]),
+        ("flatness", ["Spectral Flatness"], windows),
+    ]
+    for features, columns, rows in layouts:
+        df = pd.read_csv(io.StringIO(analyze_features(str(wav_file), features, windows=4)))
+
+        assert list(df.columns) == ["Segment"] + columns
+        assert list(df["Segment"]) == rows
+        assert df.iloc[:4, 1:].notna().all().all()
+        summary = df.set_index("Segment")
+        if "Overall" in rows:
+            assert summary.loc["Overall"].notna().to_dict() == {c: c in ("Fractal Dimension", "Shannon Entropy")
+                                                                for c in columns}
+        if "Decay Rate" in rows:
+            assert summary.loc["Decay Rate"].notna().to_dict() == {c: c == "Mean Amplitude" for c in columns}
+            assert summary.loc["Decay Rate", "Mean Amplitude"] > 0
+
+    assert analyze_features(str(wav_file), "zcr, loudness").startswith("Unknown features: loudness")
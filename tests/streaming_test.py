@@ -0,0 +1,37 @@
+import numpy as np
+from scipy.signal import hilbert
+import dsp
+from audio_io import load_audio
+from framing import frame_bounds, frames
+from streaming import stream_features
+
+# Test that streamed ZCR and entropy match the in-memory computation
+def test_stream_features_match_in_memory():
+    test_file = "data/hamilton_ave.wav"
+    streamed = stream_features(test_file, ["zcr", "entropy"], block_size=100000)
+
+    signal, _ = load_audio(test_file, mono=True)
+    segments = np.array_split(signal, 30)
+    zcrs = [np.sum(np.diff(np.sign(seg)) != 0) / len(seg) for seg in segments]
+
+    hist, _ = np.histogram(signal, bins=64, density=True)
+    hist = hist[hist > 0]
+
+    assert np.allclose(streamed["zcr"], zcrs)
+    assert np.isclose(streamed["entropy_overall"], -np.sum(hist * np.log2(hist)))
+
+# Test that every streamed feature matches the in-memory tools' definition, on mono and stereo files
+def test_stream_features_match_every_feature():
+    for test_file in ("data/hamilton_ave.wav", "data/audio1.wav"):
+        streamed = stream_features(test_file, ["zcr", "flatness", "entropy", "envelope", "fractal"],
+                                   windows=12, block_size=100000, fractal_max_samples=200000)
+        signal, sample_rate = load_audio(test_file, mono=True)
+        segments = frames(signal, frame_bounds(len(signal), sample_rate, 12))
+        envelope = [np.mean(seg) for seg in frames(np.abs(hilbert(signal)), frame_bounds(len(signal), sample_rate, 12))]
+
+        assert np.allclose(streamed["zcr"], [dsp.zero_crossing_rate(seg) for seg in segments])
+        assert np.allclose(streamed["flatness"], [dsp.spectral_flatness(seg) for seg in segments], rtol=1e-4)
+        assert np.allclose(streamed["entropy"], [dsp.shannon_entropy(seg) for seg in segments])
+        assert np.allclose(streamed["envelope"], envelope, rtol=1e-2)  # Block-wise Hilbert transforms
+        assert np.allclose(streamed["fractal"], [dsp.higuchi_fd(seg, kmax=10) for seg in segments])
+        assert np.isclose(streamed["fractal_overall"], dsp.higuchi_fd(signal, kmax=30, max_samples=200000))
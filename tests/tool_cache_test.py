@@ -0,0 +1,50 @@
+import audio_io
+import pyramid
+import tool_cache
+from tool_cache import cached_tool, clear_tool_cache, tool_cache_info
+
+def _counting_tool():
+    calls = []
+
+    def tool(file_path, cutoff_hi=2000):
+        calls.append(cutoff_hi)
+        return f"{file_path},{cutoff_hi}"
+    return cached_tool(tool), calls
+
+# Test that repeated calls are answered from memory and then from disk
+def test_cached_tool_memory_and_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path))
+    clear_tool_cache()
+    tool, calls = _counting_tool()
+
+    tool("data/hamilton_ave.wav", 2000)
+    tool("data/hamilton_ave.wav", cutoff_hi=2000.0)
+    clear_tool_cache()
+    tool("data/hamilton_ave.wav")
+
+    assert calls == [2000]
+    assert list(tmp_path.glob("*.tool.json"))
+    assert tool_cache_info()["disk_hits"] == 1
+
+# Test that changing a setting that affects results recomputes instead of reusing the result
+def test_cached_tool_keys_on_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_io, "DECODE_CACHE_DIR", str(tmp_path))
+    clear_tool_cache()
+    tool, calls = _counting_tool()
+
+    monkeypatch.setattr(pyramid, "PYRAMID_ENABLED", False)
+    tool("data/hamilton_ave.wav")
+    monkeypatch.setattr(pyramid, "PYRAMID_ENABLED", True)
+    tool("data/hamilton_ave.wav")
+
+    assert len(calls) == 2
+
+# Test that editing a helper module's source changes the source hash
+def test_source_hash_tracks_module_source(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    helper = tmp_path / "cache_helper_module.py"
+    helper.write_text("SCALE = 1\n")
+    before = tool_cache._source_hash(("cache_helper_module",))
+    helper.write_text("SCALE = 2\n")
+
+    assert tool_cache._source_hash(("cache_helper_module",)) != before
@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+import triage
+
+# Test that confident predictions are decided locally and uncertain ones are escalated and counted
+def test_triage_escalates_uncertain_clips():
+    sample_rate = 8000
+    rng = np.random.default_rng(0)
+    t = np.arange(sample_rate * 2) / sample_rate
+    noise = [0.1 * rng.standard_normal(len(t)) for _ in range(4)]
+    tones = [0.3 * np.sin(2 * np.pi * f * t) * (np.sin(2 * np.pi * 3 * t) > 0) for f in (200, 300, 500, 700)]
+    X = [triage.triage_features(x, sample_rate) for x in noise + tones]
+    triage.set_model(triage.LogisticModel().fit(X, [0] * 4 + [1] * 4))
+    before = triage.triage_info()
+
+    assert triage.triage(tones[0], sample_rate) is True
+    assert triage.triage(noise[0], sample_rate) is False
+
+    triage.set_model(None)
+    assert triage.triage(tones[0], sample_rate) is None
+
+    after = triage.triage_info()
+    assert after["llm_calls_avoided"] - before["llm_calls_avoided"] == 2
+    assert after["escalated"] - before["escalated"] == 1
+
+# Test that eval.json clips are found under another extension, preferring the exact name
+def test_find_clip_ignores_extension():
+    assert triage._find_clip("data", "audio4.mp3") == "data/audio4.m4a"
+    assert triage._find_clip("data", "audio1.mp3") == "data/audio1.mp3"
+    assert triage._find_clip("data", "missing.mp3") is None
+
+# Test that a model trained on too few clips is neither saved nor loaded
+def test_small_model_refused(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    X, y = rng.standard_normal((8, len(triage.FEATURE_NAMES))), np.array([0, 1] * 4)
+    monkeypatch.setattr(triage, "training_set", lambda *args: (X, y, [f"clip{i}" for i in range(8)]))
+    model_file = tmp_path / "triage_model.json"
+
+    triage.main(model_file=str(model_file))
+    assert not model_file.exists()
+
+    triage.LogisticModel().fit(X, y).save(str(model_file))
+    with pytest.raises(ValueError):
+        triage.LogisticModel.load(str(model_file))
+
+    monkeypatch.setattr(triage, "TRIAGE_MODEL_FILE", str(model_file))
+    monkeypatch.setattr(triage, "_model_loaded", False)
+    assert triage.get_model() is None
+
+# Test that thresholds are the widest ones whose held-out decisions reach the precision target
+def test_calibrate_thresholds():
+    probabilities = [0.05, 0.1, 0.3, 0.45, 0.55, 0.6, 0.7, 0.95]
+    y = [0, 0, 1, 0, 0, 1, 1, 1]
+
+    assert triage.calibrate_thresholds(probabilities, y, min_precision=0.9, min_support=1) == (0.1, 0.6)
+    assert triage.calibrate_thresholds(probabilities, y, min_precision=0.75, min_support=1) == (0.45, 0.55)
+    assert triage.calibrate_thresholds(probabilities, y, min_precision=0.9, min_support=3) == (-np.inf, 0.6)
+    assert triage.calibrate_thresholds([0.4, 0.6], [1, 0], min_precision=0.9, min_support=1) == (-np.inf, np.inf)
+
+# Test that a model whose leave-one-out decisions are precise is saved with its thresholds,
+# and one that cannot separate the labels is not
+def test_model_saved_only_when_precise(tmp_path, monkeypatch):
+    rng = np.random.default_rng(2)
+    y = np.array([0, 1] * 8)
+    X = rng.standard_normal((16, len(triage.FEATURE_NAMES)))
+    model_file = tmp_path / "triage_model.json"
+
+    monkeypatch.setattr(triage, "training_set", lambda *args: (X, rng.permutation(y), list(range(16))))
+    triage.main(model_file=str(model_file))
+    assert not model_file.exists()
+
+    X[:, 0] += 4 * y
+    monkeypatch.setattr(triage, "training_set", lambda *args: (X, y, list(range(16))))
+    triage.main(model_file=str(model_file))
+    model = triage.LogisticModel.load(str(model_file))
+
+    assert model.n_train == 16
+    assert model.low < 0.5 < model.high
+    assert np.all((model.predict_proba(X) >= model.high) <= y.astype(bool))